@@ -1,16 +1,47 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import hmac
 import os
+import secrets
+import time
+import uuid
 from dotenv import load_dotenv
+from database import RefreshToken
 
 load_dotenv()
 
 # Secret key for JWT encoding/decoding
 SECRET_KEY = os.getenv("SECRET_KEY", "IFBWEOIFNQPWEF8632798UJHRGNI83hfe4f2") # we load the key from .env anyway
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+# App builds that don't store the refresh token re-login when this runs out, so it
+# stays at 24 hours; lower it once every client renews via /token/refresh
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A refresh token replayed later than this after rotation is treated as stolen;
+# within it, the replay is a client retry and gets a fresh token for the family
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "30"))
+# Rotated/revoked tokens are kept this long so a replay is still recognized as reuse
+REFRESH_TOKEN_REVOKED_RETENTION_DAYS = int(os.getenv("REFRESH_TOKEN_REVOKED_RETENTION_DAYS", "7"))
+
+# bcrypt is deliberately slow; run it on a few dedicated threads and shed load past a bound
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# Signed /static URLs handed out with meal lists
+MEDIA_URL_TTL_SECONDS = int(os.getenv("MEDIA_URL_TTL_SECONDS", str(6 * 3600)))
+# Expiries are rounded up to this bucket so a meal's URL stays the same across
+# list refreshes and the app's image cache keeps hitting
+MEDIA_URL_BUCKET_SECONDS = 3600
+_MEDIA_KEY = hmac.new(SECRET_KEY.encode("utf-8"), b"nutri-ai/media-url/v1", hashlib.sha256).digest()
+_MEDIA_HMAC = hmac.new(_MEDIA_KEY, digestmod=hashlib.sha256)
+_REFRESH_KEY = hmac.new(SECRET_KEY.encode("utf-8"), b"nutri-ai/refresh-token/v1", hashlib.sha256).digest()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -20,6 +51,36 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_pending = 0
+
+async def _run_password_op(fn, *args):
+    global _password_pending
+    if _password_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts, try again shortly",
+            headers={"Retry-After": "2"},
+        )
+    _password_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_pending -= 1
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _run_password_op(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_password_op(get_password_hash, password)
+
+def password_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": _password_pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -38,5 +99,122 @@ def decode_access_token(token: str):
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError as e:
-        logger.error(f"JWT Decode Error: {e}")
+        logger.error("JWT Decode Error: %s", e)
         return None
+
+
+def _media_signature(path: str, user_id: int, expires: int) -> str:
+    # Copying a keyed HMAC skips the key setup; list endpoints sign every media path they return
+    mac = _MEDIA_HMAC.copy()
+    mac.update(f"{path}\n{user_id}\n{expires}".encode("utf-8"))
+    return mac.hexdigest()
+
+def sign_media_path(path: str, user_id: int, now: Optional[float] = None) -> dict:
+    """Query parameters that let ``user_id`` fetch ``/static/{path}`` without a JWT."""
+    now = time.time() if now is None else now
+    expires = (int(now + MEDIA_URL_TTL_SECONDS) // MEDIA_URL_BUCKET_SECONDS + 1) * MEDIA_URL_BUCKET_SECONDS
+    return {"uid": user_id, "exp": expires, "sig": _media_signature(path, user_id, expires)}
+
+def verify_media_signature(path: str, user_id: int, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_media_signature(path, user_id, expires), signature)
+
+
+def _refresh_token_hash(token: str) -> str:
+    return hmac.new(_REFRESH_KEY, token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue_refresh_token(user_id: int, db: Session, family_id: Optional[str] = None) -> str:
+    """Creates and stores (hashed) a new opaque refresh token; the caller commits."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=_refresh_token_hash(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+def rotate_refresh_token(token: str, db: Session) -> Tuple[int, str]:
+    """Exchanges a refresh token for a new one; returns ``(user_id, new_token)``.
+
+    Each token is single use. Presenting one that was already rotated revokes
+    the whole login family, except within REFRESH_TOKEN_REUSE_GRACE_SECONDS:
+    that is a client retrying after a lost response, so the successor it never
+    received is revoked and replaced (only its hash is stored, it can't be
+    returned again). A client still holding that successor gets reuse detection
+    on its next refresh.
+    """
+    now = datetime.utcnow()
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _refresh_token_hash(token)).first()
+    if row is None or row.expires_at <= now:
+        raise _invalid_refresh_token()
+
+    if row.revoked_at is not None:
+        if (now - row.revoked_at).total_seconds() > REFRESH_TOKEN_REUSE_GRACE_SECONDS:
+            logger.warning("[Auth] Refresh token reuse for user %s, revoking family %s", row.user_id, row.family_id)
+            revoke_refresh_family(row.family_id, db)
+            db.commit()
+            raise _invalid_refresh_token()
+        return row.user_id, _reissue_successor(row, now, db)
+
+    # Compare-and-swap so two concurrent refreshes can't both rotate the same token
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == row.id,
+        RefreshToken.revoked_at.is_(None),
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        raise _invalid_refresh_token()
+
+    new_token = issue_refresh_token(row.user_id, db, family_id=row.family_id)
+    db.commit()
+    return row.user_id, new_token
+
+def _reissue_successor(row: RefreshToken, now: datetime, db: Session) -> str:
+    """Revokes the live token(s) issued in or after ``row``'s rotation and issues a new one."""
+    replaced = db.query(RefreshToken).filter(
+        RefreshToken.family_id == row.family_id,
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.created_at >= row.revoked_at,
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    if not replaced:
+        # The family was logged out or revoked for reuse in the meantime
+        db.rollback()
+        raise _invalid_refresh_token()
+    logger.info("[Auth] Refresh retry for user %s within the grace window, reissuing", row.user_id)
+    new_token = issue_refresh_token(row.user_id, db, family_id=row.family_id)
+    db.commit()
+    return new_token
+
+def revoke_refresh_family(family_id: str, db: Session):
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None),
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+
+def revoke_refresh_token(token: str, db: Session):
+    """Logs a device out: revokes the token and every rotation of it."""
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _refresh_token_hash(token)).first()
+    if row is not None:
+        revoke_refresh_family(row.family_id, db)
+        db.commit()
+
+def purge_refresh_tokens(db: Session) -> int:
+    """Deletes expired tokens and ones revoked over REFRESH_TOKEN_REVOKED_RETENTION_DAYS ago."""
+    now = datetime.utcnow()
+    deleted = db.query(RefreshToken).filter(
+        (RefreshToken.expires_at <= now)
+        | (RefreshToken.revoked_at < now - timedelta(days=REFRESH_TOKEN_REVOKED_RETENTION_DAYS))
+    ).delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        logger.info("[Auth] Purged %s refresh tokens", deleted)
+    return deleted
@@ -0,0 +1,130 @@
+"""
+Per-row cost of building the GET /meals response body.
+
+Compares the original path (load Meal entities, build MealResponse models,
+then FastAPI's model_dump -> validate -> jsonable -> json.dumps) with the
+fast path used by the list endpoints (select MEAL_RESPONSE_COLUMNS, build
+dicts with main.meal_payload, encode with fast_json). Both bodies are
+checked to decode to the same JSON.
+
+    python bench_serialization.py [--rows 2000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import JSONResponse
+
+from database import MEAL_RESPONSE_COLUMNS, Base, Meal, User, make_engine
+from fast_json import FastJSONResponse, orjson
+from main import MealQualityModel, MealResponse, NutritionInfoModel, meal_payload, signed_static_url
+
+USER_ID = 1
+
+
+def _seed(Session, rows: int):
+    db = Session()
+    db.add(User(id=USER_ID, email="bench@example.com", password_hash="x"))
+    db.bulk_insert_mappings(Meal, [
+        dict(id=f"meal-{i:06d}", user_id=USER_ID, timestamp=1_700_000_000 + i * 3600, category="lunch",
+             name=f"Meal {i}", image_path=f"blobs/ab/{i:064x}.jpg" if i % 2 else None,
+             audio_path=f"blobs/cd/{i:064x}.m4a" if i % 5 == 0 else None,
+             transcription="two eggs and toast" if i % 5 == 0 else None,
+             calories=400 + i % 300, carbs=50, sugar=8, protein=25, fat=15,
+             calorie_density=1.4, goal_fit_percentage=72.5, meal_quality_score=6.8, version=i + 1)
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def _meal_to_response(m: Meal) -> MealResponse:
+    # main.meal_to_response before the fast path
+    return MealResponse(
+        id=m.id, timestamp=m.timestamp, category=m.category, name=m.name,
+        image=m.image_path, audio=m.audio_path,
+        imageUrl=signed_static_url(m.image_path, USER_ID), audioUrl=signed_static_url(m.audio_path, USER_ID),
+        transcription=m.transcription,
+        nutritionInfo=NutritionInfoModel(calories=m.calories, carbs=m.carbs, sugar=m.sugar, protein=m.protein, fat=m.fat),
+        mealQuality=MealQualityModel(calorieDensity=m.calorie_density, goalFitPercentage=m.goal_fit_percentage,
+                                     mealQualityScore=m.meal_quality_score),
+    )
+
+
+_ADAPTER = TypeAdapter(List[MealResponse])
+
+
+def baseline(db):
+    t0 = time.perf_counter()
+    meals = db.query(Meal).filter(Meal.user_id == USER_ID).order_by(Meal.timestamp.desc(), Meal.id.desc()).all()
+    t1 = time.perf_counter()
+    models = [_meal_to_response(m) for m in meals]
+    t2 = time.perf_counter()
+    # What FastAPI does with a response_model and a returned list of models
+    validated = _ADAPTER.validate_python([m.model_dump() for m in models])
+    body = JSONResponse(_ADAPTER.dump_python(validated, mode="json")).body
+    t3 = time.perf_counter()
+    return body, (t1 - t0, t2 - t1, t3 - t2)
+
+
+def fast(db):
+    t0 = time.perf_counter()
+    rows = db.query(*MEAL_RESPONSE_COLUMNS).filter(Meal.user_id == USER_ID) \
+        .order_by(Meal.timestamp.desc(), Meal.id.desc()).all()
+    t1 = time.perf_counter()
+    payload = [meal_payload(row, USER_ID) for row in rows]
+    t2 = time.perf_counter()
+    body = FastJSONResponse(payload).body
+    t3 = time.perf_counter()
+    return body, (t1 - t0, t2 - t1, t3 - t2)
+
+
+def run(label, fn, Session, rows: int, repeat: int):
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        db = Session()
+        try:
+            body, parts = fn(db)
+        finally:
+            db.close()
+        timings.append(parts)
+    # Best of N: the least noisy estimate of the work itself
+    best = [min(t[i] for t in timings) for i in range(3)]
+    per_row = [value / rows * 1e6 for value in best]
+    print(f"{label:>9}: query {per_row[0]:6.2f}us  build {per_row[1]:6.2f}us  encode {per_row[2]:6.2f}us  "
+          f"total {sum(per_row):6.2f}us/row  ({sum(best) * 1000:7.1f}ms for {rows} rows, {len(body)} bytes)")
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+    try:
+        engine = make_engine(os.path.join(workdir, "bench.db"))
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        _seed(Session, args.rows)
+        print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json'}")
+        old = run("baseline", baseline, Session, args.rows, args.repeat)
+        new = run("fast", fast, Session, args.rows, args.repeat)
+        if json.loads(old) != json.loads(new):
+            raise SystemExit("Response bodies differ")
+        print("bodies match")
+        engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Writer/reader concurrency benchmark for the SQLite engine settings.
+
+Runs concurrent writer threads (meal upserts + analysis-log commits, like
+POST /meals and /api/analyze) and reader threads (per-user meal listings, like
+GET /meals) against a scratch database, once with the original engine
+(rollback journal, default pool, no pragmas) and once with database.make_engine
+(WAL + pragmas + read-only reader pool).
+
+    python bench_sqlite.py [--writers 4] [--readers 8] [--seconds 5] [--mode both|baseline|tuned]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Meal, AnalysisLog, User, make_engine
+
+USERS = 50
+
+
+def _seed(engine):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    for i in range(USERS):
+        db.add(User(id=i + 1, email=f"bench{i}@example.com", password_hash="x"))
+    db.commit()
+    db.close()
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _worker(kind, Session, stop, results):
+    ops, errors, latencies = 0, 0, []
+    rng = random.Random()
+    while not stop.is_set():
+        user_id = rng.randint(1, USERS)
+        start = time.perf_counter()
+        db = Session()
+        try:
+            if kind == "write":
+                db.add(Meal(id=uuid.uuid4().hex, user_id=user_id, timestamp=int(time.time() * 1000),
+                            category="lunch", calories=500, carbs=50, sugar=5, protein=30, fat=20,
+                            calorie_density=1.0, goal_fit_percentage=80.0, meal_quality_score=7.0))
+                db.add(AnalysisLog(id=uuid.uuid4().hex, user_id=user_id, status="SUCCESS"))
+                db.commit()
+            else:
+                db.query(Meal).filter(Meal.user_id == user_id).order_by(Meal.timestamp.desc()).limit(50).all()
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            # "database is locked" and friends
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    results.append((kind, ops, errors, latencies))
+
+
+def run(label, write_engine, read_engine, writers, readers, seconds):
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+    stop = threading.Event()
+    results = []
+    threads = [threading.Thread(target=_worker, args=("write", WriteSession, stop, results)) for _ in range(writers)]
+    threads += [threading.Thread(target=_worker, args=("read", ReadSession, stop, results)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(f"\n== {label} ({writers} writers, {readers} readers, {seconds}s)")
+    for kind in ("write", "read"):
+        ops = sum(r[1] for r in results if r[0] == kind)
+        errors = sum(r[2] for r in results if r[0] == kind)
+        latencies = [l for r in results if r[0] == kind for l in r[3]]
+        print(f"{kind:>6}: {ops / seconds:8.1f} ops/s  errors={errors:<5d} "
+              f"p50={_percentile(latencies, 0.50) * 1000:7.2f}ms  p95={_percentile(latencies, 0.95) * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--mode", choices=("both", "baseline", "tuned"), default="both")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    try:
+        if args.mode in ("both", "baseline"):
+            path = os.path.join(workdir, "baseline.db")
+            # What database.py used to build
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+            _seed(engine)
+            run("baseline", engine, engine, args.writers, args.readers, args.seconds)
+            engine.dispose()
+        if args.mode in ("both", "tuned"):
+            path = os.path.join(workdir, "tuned.db")
+            engine = make_engine(path)
+            _seed(engine)
+            read_engine = make_engine(path, readonly=True, pool_size=args.readers, max_overflow=0)
+            run("tuned (WAL + pragmas + read pool)", engine, read_engine, args.writers, args.readers, args.seconds)
+            read_engine.dispose()
+            engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
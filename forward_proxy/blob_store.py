@@ -0,0 +1,247 @@
+"""
+Content-addressed media blob store.
+
+Uploads are stored once per distinct content under
+
+    data/blobs/<sha[0:2]>/<sha[2:4]>/<sha256>.<ext>
+
+(image derivatives sit next to it as ``<sha256>.<variant>.jpg``) so no directory grows past a few hundred entries and identical bytes are
+kept a single time. Each blob has a row in ``blobs`` whose ``ref_count``
+tracks how many ``Meal`` / ``AnalysisLog`` rows point at it; ``gc`` removes
+blobs nobody references any more.
+
+Command line:
+    python blob_store.py migrate [--dry-run]   move legacy uuid files into the store
+    python blob_store.py refcount              recompute ref counts from the tables
+    python blob_store.py gc [--grace-hours N]  delete unreferenced blobs
+"""
+import argparse
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import Blob, Meal, AnalysisLog, SessionLocal
+from media_ops import IMAGE_DERIVATIVES, derivative_path
+from sync import next_versions
+from uploads import StoredUpload, store_upload, file_sha256
+
+logger = logging.getLogger("forward_proxy")
+
+DATA_ROOT = "data"
+BLOB_DIR = "blobs"
+BLOB_TMP_DIR = os.path.join(DATA_ROOT, BLOB_DIR, "tmp")
+
+
+def blob_relative_path(sha256: str, ext: str) -> str:
+    """Path of a blob relative to ./data (the form stored on Meal rows)."""
+    ext = (ext or "bin").lower().lstrip(".")
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+
+def to_relative(path: Optional[str]) -> Optional[str]:
+    """Normalizes Meal-style (``blobs/..``) and AnalysisLog-style (``data/blobs/..``) paths."""
+    if not path:
+        return None
+    prefix = DATA_ROOT + "/"
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+
+def is_blob_path(path: Optional[str]) -> bool:
+    rel = to_relative(path)
+    return bool(rel) and rel.startswith(BLOB_DIR + "/") and not rel.startswith(BLOB_DIR + "/tmp/")
+
+
+def _commit_blob_file(tmp_path: str, rel_path: str) -> bool:
+    """Moves a fully written temp file into place; returns False if it already existed."""
+    final_path = os.path.join(DATA_ROOT, rel_path)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # Atomic on the same filesystem: readers see either nothing or the full blob
+    os.replace(tmp_path, final_path)
+    return True
+
+
+def register_blob(db: Session, rel_path: str, sha256: str, size: int) -> Blob:
+    # Concurrent uploads of the same bytes both get here; the second insert is a no-op
+    db.execute(
+        sqlite_insert(Blob)
+        .values(path=rel_path, sha256=sha256, size=size, ref_count=0, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[Blob.path])
+    )
+    return db.get(Blob, rel_path)
+
+
+async def store_blob(upload: UploadFile, kind: str, ext: str, db: Session) -> StoredUpload:
+    """Streams an upload into the blob store (deduplicating by content).
+
+    Returns a StoredUpload whose ``path`` is relative to ./data. The caller
+    commits ``db``.
+    """
+    tmp_path = os.path.join(BLOB_TMP_DIR, uuid.uuid4().hex)
+    stored = await store_upload(upload, tmp_path, kind)
+    rel_path = blob_relative_path(stored.sha256, ext)
+    if not _commit_blob_file(tmp_path, rel_path):
+        logger.info("[BlobStore] Deduplicated upload into existing %s", rel_path)
+    register_blob(db, rel_path, stored.sha256, stored.size)
+    return stored._replace(path=rel_path)
+
+
+def _adjust_ref(db: Session, path: Optional[str], delta: int):
+    if not is_blob_path(path):
+        return  # legacy files outside the store aren't ref counted
+    db.query(Blob).filter(Blob.path == to_relative(path)).update(
+        {Blob.ref_count: Blob.ref_count + delta}, synchronize_session=False
+    )
+
+
+def add_ref(db: Session, path: Optional[str]):
+    _adjust_ref(db, path, 1)
+
+
+def drop_ref(db: Session, path: Optional[str]):
+    _adjust_ref(db, path, -1)
+
+
+def apply_ref_deltas(db: Session, deltas: Dict[str, int]):
+    """One UPDATE per blob for a batch of ref changes keyed by path."""
+    merged: Dict[str, int] = {}
+    for path, delta in deltas.items():
+        if is_blob_path(path):
+            merged[to_relative(path)] = merged.get(to_relative(path), 0) + delta
+    for rel_path, delta in merged.items():
+        if delta:
+            _adjust_ref(db, rel_path, delta)
+
+
+def swap_ref(db: Session, old_path: Optional[str], new_path: Optional[str]):
+    if to_relative(old_path) == to_relative(new_path):
+        return
+    drop_ref(db, old_path)
+    add_ref(db, new_path)
+
+
+def rebuild_refcounts(db: Session):
+    counts = {}
+    for (image_path, audio_path) in db.query(Meal.image_path, Meal.audio_path).yield_per(1000):
+        for p in (image_path, audio_path):
+            if is_blob_path(p):
+                counts[to_relative(p)] = counts.get(to_relative(p), 0) + 1
+    for (image_path, audio_path) in db.query(AnalysisLog.image_path, AnalysisLog.audio_path).yield_per(1000):
+        for p in (image_path, audio_path):
+            if is_blob_path(p):
+                counts[to_relative(p)] = counts.get(to_relative(p), 0) + 1
+    for blob in db.query(Blob).all():
+        blob.ref_count = counts.get(blob.path, 0)
+    db.commit()
+    return counts
+
+
+def collect_garbage(db: Session, grace_hours: float = 24) -> int:
+    """Deletes blobs with no references that are older than ``grace_hours``.
+
+    The grace period covers uploads whose Meal hasn't been POSTed yet.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    removed = 0
+    for blob in db.query(Blob).filter(Blob.ref_count <= 0, Blob.created_at < cutoff).all():
+        full_path = os.path.join(DATA_ROOT, blob.path)
+        for path in [full_path] + [derivative_path(full_path, v) for v in IMAGE_DERIVATIVES]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        db.delete(blob)
+        removed += 1
+    db.commit()
+    return removed
+
+
+def _migrate_file(db: Session, old_path: str, moved: dict, dry_run: bool) -> Optional[str]:
+    """Moves one legacy file into the store; returns its new ./data-relative path."""
+    rel_old = to_relative(old_path)
+    if rel_old in moved:
+        return moved[rel_old]
+    full_old = os.path.join(DATA_ROOT, rel_old)
+    if not os.path.exists(full_old):
+        logger.warning("[BlobStore] Missing file for %s, leaving row untouched", old_path)
+        return None
+    sha256 = file_sha256(full_old)
+    rel_new = blob_relative_path(sha256, os.path.splitext(rel_old)[1])
+    if not dry_run:
+        size = os.path.getsize(full_old)
+        tmp_path = os.path.join(BLOB_TMP_DIR, uuid.uuid4().hex)
+        os.makedirs(BLOB_TMP_DIR, exist_ok=True)
+        os.replace(full_old, tmp_path)
+        _commit_blob_file(tmp_path, rel_new)
+        register_blob(db, rel_new, sha256, size)
+    moved[rel_old] = rel_new
+    return rel_new
+
+
+def migrate_legacy_files(db: Session, dry_run: bool = False) -> dict:
+    """Moves meal_images/, meal_audios/ and temp/ files into the store and rewrites the paths."""
+    moved = {}
+    rows = 0
+    rewritten_meals = []
+    for meal in db.query(Meal).filter((Meal.image_path.isnot(None)) | (Meal.audio_path.isnot(None))).all():
+        for attr in ("image_path", "audio_path"):
+            path = getattr(meal, attr)
+            if path and not is_blob_path(path):
+                new_path = _migrate_file(db, path, moved, dry_run)
+                if new_path and not dry_run:
+                    setattr(meal, attr, new_path)
+                    rows += 1
+                    if not rewritten_meals or rewritten_meals[-1] is not meal:
+                        rewritten_meals.append(meal)
+    for log_entry in db.query(AnalysisLog).filter((AnalysisLog.image_path.isnot(None)) | (AnalysisLog.audio_path.isnot(None))).all():
+        for attr in ("image_path", "audio_path"):
+            path = getattr(log_entry, attr)
+            if path and not is_blob_path(path):
+                new_path = _migrate_file(db, path, moved, dry_run)
+                if new_path and not dry_run:
+                    # AnalysisLog keeps paths relative to the app directory
+                    setattr(log_entry, attr, f"{DATA_ROOT}/{new_path}")
+                    rows += 1
+    if rewritten_meals:
+        # Synced clients hold the old paths; new versions make /sync send the rewritten rows
+        for meal, version in zip(rewritten_meals, next_versions(db, len(rewritten_meals))):
+            meal.version = version
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+        rebuild_refcounts(db)
+    return {"files": len(moved), "rows_rewritten": rows, "distinct_blobs": len(set(moved.values()))}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the media blob store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = sub.add_parser("migrate", help="move legacy uuid files into the blob store")
+    migrate_cmd.add_argument("--dry-run", action="store_true")
+    sub.add_parser("refcount", help="recompute ref counts from meals/analysis_logs")
+    gc_cmd = sub.add_parser("gc", help="delete unreferenced blobs")
+    gc_cmd.add_argument("--grace-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.command == "migrate":
+            print(migrate_legacy_files(session, dry_run=args.dry_run))
+        elif args.command == "refcount":
+            print(f"{len(rebuild_refcounts(session))} referenced blobs")
+        elif args.command == "gc":
+            print(f"Removed {collect_garbage(session, args.grace_hours)} unreferenced blobs")
+    finally:
+        session.close()
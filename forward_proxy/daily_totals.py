@@ -0,0 +1,115 @@
+"""
+Per-user daily nutrition totals, kept in step with the meals table.
+
+Every meal write adjusts the ``daily_totals`` row for the meal's day in the
+same transaction: an update subtracts the old values and adds the new ones
+(possibly on another day), a delete subtracts. GET /stats/daily then reads one
+row per day instead of summing every meal in the range.
+
+Days are local calendar days on the server, like the daily quota and the meal
+suggestions. ``rebuild`` recomputes the table from meals (backfill, or repair
+after manual edits):
+
+    python daily_totals.py rebuild [--user-id N]
+"""
+import argparse
+import logging
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import DailyTotal, SessionLocal
+
+logger = logging.getLogger("forward_proxy")
+
+NUTRIENTS = ("calories", "carbs", "sugar", "protein", "fat")
+
+
+def meal_day(timestamp: int) -> date:
+    return date.fromtimestamp(timestamp or 0)
+
+
+class TotalsDelta:
+    """Accumulates changes to daily totals and applies them with one upsert."""
+
+    def __init__(self):
+        self._deltas: Dict[Tuple[int, date], list] = {}
+
+    def _add(self, user_id: int, timestamp: int, values, sign: int):
+        row = self._deltas.setdefault((user_id, meal_day(timestamp)), [0] * (len(NUTRIENTS) + 1))
+        row[0] += sign
+        for i, value in enumerate(values, start=1):
+            row[i] += sign * (value or 0)
+
+    def add_meal(self, meal):
+        """Counts a meal-like object (Meal row or query row with the nutrient columns)."""
+        if getattr(meal, "deleted_at", None) is not None:
+            return  # tombstones are not part of the totals
+        self._add(meal.user_id, meal.timestamp, [getattr(meal, name) for name in NUTRIENTS], 1)
+
+    def remove_meal(self, meal):
+        if getattr(meal, "deleted_at", None) is not None:
+            return
+        self._add(meal.user_id, meal.timestamp, [getattr(meal, name) for name in NUTRIENTS], -1)
+
+    def add_values(self, user_id: int, timestamp: int, values):
+        self._add(user_id, timestamp, values, 1)
+
+    def apply(self, db: Session):
+        """Writes the accumulated changes inside the caller's transaction."""
+        rows = []
+        for (user_id, day), (count, *values) in self._deltas.items():
+            if count == 0 and not any(values):
+                continue
+            rows.append({"user_id": user_id, "day": day, "meal_count": count, **dict(zip(NUTRIENTS, values))})
+        self._deltas.clear()
+        if not rows:
+            return
+        stmt = sqlite_insert(DailyTotal)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyTotal.user_id, DailyTotal.day],
+            set_={
+                name: getattr(DailyTotal, name) + stmt.excluded[name]
+                for name in ("meal_count",) + NUTRIENTS
+            },
+        )
+        db.execute(stmt, rows)
+
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """Recomputes totals from the live meals; returns the number of day rows written."""
+    where = "WHERE deleted_at IS NULL" + (" AND user_id = :user_id" if user_id is not None else "")
+    params = {"user_id": user_id} if user_id is not None else {}
+    db.execute(text("DELETE FROM daily_totals" + (" WHERE user_id = :user_id" if user_id is not None else "")), params)
+    # 'localtime' matches date.fromtimestamp() used for incremental updates
+    result = db.execute(text(
+        "INSERT INTO daily_totals (user_id, day, meal_count, calories, carbs, sugar, protein, fat) "
+        "SELECT user_id, date(timestamp, 'unixepoch', 'localtime'), COUNT(*), "
+        "COALESCE(SUM(calories), 0), COALESCE(SUM(carbs), 0), COALESCE(SUM(sugar), 0), "
+        "COALESCE(SUM(protein), 0), COALESCE(SUM(fat), 0) "
+        f"FROM meals {where} GROUP BY user_id, date(timestamp, 'unixepoch', 'localtime')"
+    ), params)
+    db.commit()
+    logger.info("[DailyTotals] Rebuilt %s day rows (user %s)", result.rowcount, "all" if user_id is None else user_id)
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the per-user daily nutrition totals")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="recompute daily_totals from meals")
+    rebuild_cmd.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"{rebuild(session, args.user_id)} day rows")
+    finally:
+        session.close()
@@ -1,18 +1,92 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, Float, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, Index, Column, Integer, String, Date, ForeignKey, Float, DateTime, Text, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 from datetime import date, datetime
 import enum
 import os
+import time
+
+from metrics import DB_CONNECTION_WAIT
 
 # Ensure data directory exists
 os.makedirs("./data", exist_ok=True)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/users.db"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "./data/users.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_PATH}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Per-connection SQLite tuning. WAL lets readers run alongside the single
+# writer; NORMAL sync is durable across application crashes in WAL mode (only
+# an OS crash can lose the last commits); busy_timeout makes a writer wait for
+# the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") == "1"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+# GET endpoints read through a separate read-only pool so they never queue behind writers
+DB_READ_POOL_ENABLED = os.getenv("DB_READ_POOL_ENABLED", "1") == "1"
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited (DB_CONNECTION_WAIT).
+
+    Sessions check out lazily on their first query, so requests that never
+    touch the database (cache hits, signed /static URLs) are not counted.
+    """
+    wait_label = "write"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_CONNECTION_WAIT.labels(self.wait_label).observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_label = self.wait_label
+        return pool
+
+
+def make_engine(path: str = SQLITE_PATH, readonly: bool = False, tuned: bool = SQLITE_TUNING,
+                pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """SQLAlchemy engine for the SQLite file at ``path`` with SQLITE_PRAGMAS applied on connect."""
+    if readonly:
+        url = f"sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true"
+    else:
+        url = f"sqlite:///{path}"
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    new_engine.pool.wait_label = "read" if readonly else "write"
+    if tuned:
+        @event.listens_for(new_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in SQLITE_PRAGMAS.items():
+                if readonly and name == "journal_mode":
+                    continue  # set by the writer; a read-only connection can't change it
+                cursor.execute(f"PRAGMA {name}={value}")
+            if readonly:
+                cursor.execute("PRAGMA query_only=ON")
+            cursor.close()
+    return new_engine
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -58,6 +132,9 @@ class User(Base):
     # Profile Image
     profile_image_path = Column(String, nullable=True)
 
+    # Change version of the profile fields (see sync.py)
+    sync_version = Column(Integer, default=0)
+
     meals = relationship("Meal", back_populates="user")
 
 class Meal(Base):
@@ -84,8 +161,27 @@ class Meal(Base):
     goal_fit_percentage = Column(Float)
     meal_quality_score = Column(Float)
 
+    # Delta sync (see sync.py): version of the last change, and tombstone marker
+    version = Column(Integer, default=0)
+    deleted_at = Column(Integer, nullable=True)  # unix seconds
+
     user = relationship("User", back_populates="meals")
 
+    # Keep in sync with migrations.py (existing databases get these via a migration)
+    __table_args__ = (
+        Index("ix_meals_user_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_meals_user_image_path", "user_id", "image_path"),
+        Index("ix_meals_user_audio_path", "user_id", "audio_path"),
+        Index("ix_meals_user_version", "user_id", "version"),
+    )
+
+# Columns behind a MealResponse; list endpoints select these instead of whole rows
+MEAL_RESPONSE_COLUMNS = (
+    Meal.id, Meal.timestamp, Meal.category, Meal.name, Meal.image_path, Meal.audio_path, Meal.transcription,
+    Meal.calories, Meal.carbs, Meal.sugar, Meal.protein, Meal.fat,
+    Meal.calorie_density, Meal.goal_fit_percentage, Meal.meal_quality_score,
+)
+
 class AnalysisStatus(str, enum.Enum):
     PENDING = "PENDING"
     SUCCESS = "SUCCESS"
@@ -99,12 +195,20 @@ class AnalysisLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     image_path = Column(String, nullable=True)
     audio_path = Column(String, nullable=True)
+    context_text = Column(Text, nullable=True)
     transcription_text = Column(String, nullable=True)
     transcription_raw_response = Column(Text, nullable=True)
     vlm_request_prompt = Column(Text, nullable=True)
     vlm_raw_response = Column(Text, nullable=True)
+    structured_meal = Column(Text, nullable=True)
     status = Column(String, default=AnalysisStatus.PENDING.value)
     processing_duration_ms = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0)  # bumped when a worker claims the analysis
+
+    __table_args__ = (
+        Index("ix_analysis_logs_user_timestamp", "user_id", "timestamp"),
+        Index("ix_analysis_logs_status_timestamp", "status", "timestamp"),
+    )
 
 class DailyMealSuggestion(Base):
     __tablename__ = "daily_meal_suggestions"
@@ -125,23 +229,92 @@ class DailyMealSuggestion(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("ix_daily_meal_suggestions_user_date", "user_id", "date", "meal_type"),
+    )
+
+
+
+class VlmCacheEntry(Base):
+    __tablename__ = "vlm_cache"
+
+    key = Column(String, primary_key=True)
+    model = Column(String)
+    structured_meal = Column(Text)
+    transcription = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+
+class ImageFingerprint(Base):
+    __tablename__ = "image_fingerprints"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    analysis_id = Column(String, ForeignKey("analysis_logs.id"))
+    dhash = Column(Integer)  # 64-bit difference hash, stored signed
+    context_hash = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    path = Column(String, primary_key=True)  # relative to ./data, e.g. blobs/ab/cd/<sha256>.jpg
+    sha256 = Column(String, index=True)
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0)  # Meal + AnalysisLog rows pointing at this blob
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True)  # HMAC of the opaque token; the token itself is never stored
+    family_id = Column(String, index=True)  # shared by every rotation of one login
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String, primary_key=True)  # "<policy>:<subject>"
+    window_index = Column(Integer, primary_key=True)  # windows since the epoch
+    count = Column(Integer, default=0)
+    expires_at = Column(Integer, index=True)  # unix seconds; row is useless afterwards
+
+
+class SyncCounter(Base):
+    __tablename__ = "sync_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0)
+
+
+class DailyTotal(Base):
+    """Per-user nutrition totals for one local calendar day; maintained by daily_totals.py."""
+    __tablename__ = "daily_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    meal_count = Column(Integer, default=0)
+    calories = Column(Integer, default=0)
+    carbs = Column(Integer, default=0)
+    sugar = Column(Integer, default=0)
+    protein = Column(Integer, default=0)
+    fat = Column(Integer, default=0)
 
 
 def init_db():
     Base.metadata.create_all(bind=engine)
 
-    # Lightweight migrations for sqlite (add new columns when missing)
-    # NOTE: For larger projects, use Alembic.
-    with engine.connect() as conn:
-        try:
-            cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(meals)").fetchall()]
-            if "audio_path" not in cols:
-                conn.exec_driver_sql("ALTER TABLE meals ADD COLUMN audio_path VARCHAR")
-            if "name" not in cols:
-                conn.exec_driver_sql("ALTER TABLE meals ADD COLUMN name VARCHAR")
-        except Exception:
-            # meals table may not exist yet or PRAGMA may fail in edge cases
-            pass
+    # Columns and indexes added after a table was first created (see migrations.py)
+    from migrations import run_migrations
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
@@ -149,3 +322,31 @@ def get_db():
         yield db
     finally:
         db.close()
+
+_read_engine = None
+_ReadSessionLocal = None
+
+def _read_sessionmaker():
+    global _read_engine, _ReadSessionLocal
+    if _ReadSessionLocal is None:
+        # Created lazily: mode=ro can't open a database file that doesn't exist yet
+        _read_engine = make_engine(readonly=True, pool_size=DB_READ_POOL_SIZE, max_overflow=DB_READ_POOL_SIZE)
+        _ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_read_engine)
+    return _ReadSessionLocal
+
+def get_read_db():
+    """Like get_db, but for endpoints that only read; writes raise an error."""
+    if not DB_READ_POOL_ENABLED:
+        yield from get_db()
+        return
+    db = _read_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def pool_stats() -> dict:
+    stats = {"write": engine.pool.status()}
+    if _read_engine is not None:
+        stats["read"] = _read_engine.pool.status()
+    return stats
@@ -0,0 +1,268 @@
+"""
+Columnar export of meals and analysis logs for offline analytics.
+
+Reads the database through a read-only connection in fixed-size keyset
+batches (``rowid > last LIMIT n``). Each batch is its own short read, so the
+export never holds a snapshot that would pin the WAL or delay the writer.
+Batches are written as row groups to Hive-style month partitions:
+
+    <out>/meals/month=2026-10/part-<run>.parquet
+    <out>/analysis_logs/month=2026-10/part-<run>.parquet
+
+``--incremental`` resumes from ``<out>/_export_state.json``:
+  * meals: rows whose ``version`` is newer than the last export, so edits
+    and tombstones (``deleted_at`` set) are included. Keep the highest
+    version per id when reading.
+  * analysis_logs: rows logged since the previous cutoff. Rows younger than
+    ``--settle-minutes`` are left for the next run because they may still
+    be PENDING.
+
+    python export.py --out exports [--format parquet|arrow] [--incremental]
+                     [--tables meals,analysis_logs] [--batch-size 10000] [--with-payloads]
+
+Requires ``pyarrow`` (not needed by the server itself).
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import literal_column, select, text
+
+from database import AnalysisLog, Meal, SQLITE_PATH, make_engine
+
+logger = logging.getLogger("forward_proxy")
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+STATE_FILE = "_export_state.json"
+
+MEAL_COLUMNS = [
+    "id", "user_id", "timestamp", "category", "name", "calories", "carbs", "sugar", "protein", "fat",
+    "calorie_density", "goal_fit_percentage", "meal_quality_score", "version", "deleted_at",
+]
+LOG_COLUMNS = ["id", "user_id", "timestamp", "status", "processing_duration_ms", "attempts"]
+# Prompts and raw model responses; large, so only exported on request
+LOG_PAYLOAD_COLUMNS = [
+    "context_text", "transcription_text", "vlm_request_prompt", "vlm_raw_response", "structured_meal",
+]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("export.py requires the 'pyarrow' package") from e
+    return pyarrow
+
+
+def _schemas(pa, with_payloads: bool):
+    meals = pa.schema([
+        ("id", pa.string()), ("user_id", pa.int64()), ("timestamp", pa.timestamp("s", tz="UTC")),
+        ("category", pa.string()), ("name", pa.string()),
+        ("calories", pa.int32()), ("carbs", pa.int32()), ("sugar", pa.int32()),
+        ("protein", pa.int32()), ("fat", pa.int32()),
+        ("calorie_density", pa.float64()), ("goal_fit_percentage", pa.float64()),
+        ("meal_quality_score", pa.float64()),
+        ("version", pa.int64()), ("deleted_at", pa.timestamp("s", tz="UTC")),
+        ("has_image", pa.bool_()), ("has_audio", pa.bool_()),
+    ])
+    logs = [
+        ("id", pa.string()), ("user_id", pa.int64()), ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("status", pa.dictionary(pa.int8(), pa.string())), ("processing_duration_ms", pa.int32()),
+        ("attempts", pa.int32()), ("has_image", pa.bool_()), ("has_audio", pa.bool_()),
+    ]
+    if with_payloads:
+        logs += [(name, pa.large_string()) for name in LOG_PAYLOAD_COLUMNS]
+    return meals, pa.schema(logs)
+
+
+class PartitionWriters:
+    """One open file per month partition; each write is a row group."""
+
+    def __init__(self, pa, root: str, schema, file_format: str, run_id: str):
+        self.pa = pa
+        self.root = root
+        self.schema = schema
+        self.file_format = file_format
+        self.run_id = run_id
+        self._writers: Dict[str, object] = {}
+        self.rows = 0
+
+    def _writer(self, month: str):
+        writer = self._writers.get(month)
+        if writer is None:
+            directory = os.path.join(self.root, f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            if self.file_format == "parquet":
+                import pyarrow.parquet as pq
+                path = os.path.join(directory, f"part-{self.run_id}.parquet")
+                writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+            else:
+                import pyarrow.ipc as ipc
+                path = os.path.join(directory, f"part-{self.run_id}.arrow")
+                writer = ipc.new_file(path, self.schema)
+            self._writers[month] = writer
+        return writer
+
+    def write(self, month: str, columns: Dict[str, list]):
+        batch = self.pa.RecordBatch.from_pydict(columns, schema=self.schema)
+        writer = self._writer(month)
+        if self.file_format == "parquet":
+            writer.write_batch(batch)
+        else:
+            writer.write(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def _by_month(rows, month_of):
+    groups: Dict[str, list] = {}
+    for row in rows:
+        groups.setdefault(month_of(row), []).append(row)
+    return groups
+
+
+def _columns(rows, names):
+    return {name: [getattr(row, name) for row in rows] for name in names}
+
+
+def _utc(ts: Optional[int]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(ts) if ts is not None else None
+
+
+def _stream(engine, table, columns, batch_size: int, *conditions):
+    """Yields lists of rows in rowid order, one short read transaction per batch."""
+    rowid = literal_column(f"{table.name}.rowid")
+    stmt = select(rowid.label("rowid"), *columns).where(*conditions).order_by(rowid).limit(batch_size)
+    last = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(stmt.where(rowid > last)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1].rowid
+
+
+def export_meals(engine, writers: PartitionWriters, batch_size: int, since_version: int) -> int:
+    """Writes meals with ``version > since_version``; returns the version the export is complete up to."""
+    table = Meal.__table__
+    columns = [table.c[name] for name in MEAL_COLUMNS] + [table.c.image_path, table.c.audio_path]
+    # Rows changed while we scan get a higher version and are left for the next run
+    with engine.connect() as conn:
+        upto = conn.execute(text("SELECT value FROM sync_counters WHERE name = 'changes'")).scalar() or 0
+    # No ORDER BY version: a global index on it would only serve this job
+    for rows in _stream(engine, table, columns, batch_size,
+                         table.c.version > since_version, table.c.version <= upto):
+        for month, group in _by_month(rows, lambda row: _utc(row.timestamp or 0).strftime("%Y-%m")).items():
+            data = _columns(group, MEAL_COLUMNS)
+            data["timestamp"] = [_utc(ts) for ts in data["timestamp"]]
+            data["deleted_at"] = [_utc(ts) for ts in data["deleted_at"]]
+            data["has_image"] = [bool(row.image_path) for row in group]
+            data["has_audio"] = [bool(row.audio_path) for row in group]
+            writers.write(month, data)
+    return max(upto, since_version)
+
+
+def export_analysis_logs(engine, writers: PartitionWriters, batch_size: int, since: Optional[datetime],
+                         until: datetime, with_payloads: bool):
+    """Writes logs with ``since <= timestamp < until``."""
+    table = AnalysisLog.__table__
+    names = LOG_COLUMNS + (LOG_PAYLOAD_COLUMNS if with_payloads else [])
+    columns = [table.c[name] for name in names] + [table.c.image_path, table.c.audio_path]
+    conditions = [table.c.timestamp < until]
+    if since is not None:
+        conditions.append(table.c.timestamp >= since)
+    for rows in _stream(engine, table, columns, batch_size, *conditions):
+        for month, group in _by_month(rows, lambda row: row.timestamp.strftime("%Y-%m")).items():
+            data = _columns(group, names)
+            data["has_image"] = [bool(row.image_path) for row in group]
+            data["has_audio"] = [bool(row.audio_path) for row in group]
+            writers.write(month, data)
+
+
+def _load_state(out: str) -> dict:
+    path = os.path.join(out, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(out: str, state: dict):
+    path = os.path.join(out, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def run_export(out: str, tables, file_format: str = "parquet", incremental: bool = False,
+               batch_size: int = EXPORT_BATCH_SIZE, settle_minutes: float = 60, with_payloads: bool = False,
+               db_path: str = SQLITE_PATH) -> dict:
+    pa = _require_pyarrow()
+    meal_schema, log_schema = _schemas(pa, with_payloads)
+    state = _load_state(out) if incremental else {}
+    run_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    engine = make_engine(db_path, readonly=True, pool_size=1, max_overflow=0)
+    summary = {}
+    try:
+        if "meals" in tables:
+            started = time.perf_counter()
+            writers = PartitionWriters(pa, os.path.join(out, "meals"), meal_schema, file_format, run_id)
+            try:
+                state["meals_version"] = export_meals(engine, writers, batch_size, state.get("meals_version", -1))
+            finally:
+                writers.close()
+            summary["meals"] = writers.rows
+            logger.info("[Export] meals: %s rows in %.1fs", writers.rows, time.perf_counter() - started)
+        if "analysis_logs" in tables:
+            started = time.perf_counter()
+            since = state.get("analysis_logs_until")
+            until = datetime.utcnow() - timedelta(minutes=settle_minutes)
+            writers = PartitionWriters(pa, os.path.join(out, "analysis_logs"), log_schema, file_format, run_id)
+            try:
+                export_analysis_logs(engine, writers, batch_size, datetime.fromisoformat(since) if since else None,
+                                     until, with_payloads)
+            finally:
+                writers.close()
+            state["analysis_logs_until"] = until.isoformat()
+            summary["analysis_logs"] = writers.rows
+            logger.info("[Export] analysis_logs: %s rows in %.1fs", writers.rows, time.perf_counter() - started)
+    finally:
+        engine.dispose()
+    os.makedirs(out, exist_ok=True)
+    _save_state(out, state)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    parser.add_argument("--tables", default="meals,analysis_logs")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--settle-minutes", type=float, default=60)
+    parser.add_argument("--with-payloads", action="store_true")
+    parser.add_argument("--db", default=SQLITE_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    tables = [name.strip() for name in args.tables.split(",") if name.strip()]
+    unknown = set(tables) - {"meals", "analysis_logs"}
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    print(run_export(args.out, tables, args.format, args.incremental, args.batch_size,
+                     args.settle_minutes, args.with_payloads, args.db))
+
+
+if __name__ == "__main__":
+    main()
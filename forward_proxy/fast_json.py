@@ -0,0 +1,37 @@
+"""
+JSON encoding for the list endpoints.
+
+Handlers that build plain dicts/tuples return ``FastJSONResponse`` directly,
+which skips FastAPI's response-model validation and ``jsonable_encoder`` pass.
+orjson encodes straight to bytes; without it the stdlib produces the same
+JSON, just slower.
+"""
+import json
+from datetime import date, datetime
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload, default=None) -> bytes:
+    """``default`` handles types neither encoder knows (dates are built in)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=default)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=default or _default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
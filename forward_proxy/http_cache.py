@@ -0,0 +1,157 @@
+"""
+Cache validators, conditional GETs and byte ranges for media responses.
+
+Meal media is content-addressed (blob_store.py) and never changes after
+upload, so it is served with a strong ETag derived from the content hash
+and a long-lived ``immutable`` Cache-Control. Mutable files (the profile
+picture) get the same validators but must be revalidated. ``Range`` requests
+are answered with 206 so audio playback can seek without downloading the
+whole note.
+"""
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from uploads import file_sha256
+
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SHA256_NAME_RE = re.compile(r"^([0-9a-f]{64})(?:\.([a-z]+))?\.[A-Za-z0-9]+$")
+
+# (path, mtime_ns, size) -> sha256 for files whose name isn't their hash
+_etag_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_etag_lock = threading.Lock()
+_ETAG_CACHE_SIZE = 4096
+
+
+def file_etag(path: str, stat: os.stat_result) -> str:
+    """Strong ETag for ``path``.
+
+    Blob-store files are named after their SHA-256 so the tag comes for
+    free; other files are hashed once per (mtime, size).
+    """
+    match = _SHA256_NAME_RE.match(os.path.basename(path))
+    if match:
+        digest, variant = match.groups()
+        return f'"{digest}-{variant}"' if variant else f'"{digest}"'
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        digest = _etag_cache.get(key)
+        if digest is not None:
+            _etag_cache.move_to_end(key)
+            return f'"{digest}"'
+    digest = file_sha256(path)
+    with _etag_lock:
+        _etag_cache[key] = digest
+        while len(_etag_cache) > _ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return f'"{digest}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison is fine for If-None-Match on GET
+    tags = [t.strip() for t in header.split(",")]
+    return any(t == etag or t == f"W/{etag}" for t in tags)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Returns inclusive (start, end), or None if the range can't be satisfied.
+
+    Raises ValueError for syntax we don't support (multiple ranges), in which
+    case the caller serves the full file as RFC 9110 allows.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        raise ValueError(header)
+    start_s, end_s = match.groups()
+    if not start_s and not end_s:
+        raise ValueError(header)
+    if not start_s:
+        # Suffix range: last N bytes
+        length = int(end_s)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def media_response(request: Request, path: str, immutable: bool = True, media_type: Optional[str] = None) -> Response:
+    """FileResponse with ETag/Last-Modified, 304 handling and single byte ranges."""
+    stat = os.stat(path)
+    etag = file_etag(path, stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: only honour the range if the client's copy is still current
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            byte_range = (0, stat.st_size - 1)
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return Response(status_code=416, headers=headers)
+        start, end = byte_range
+        if start > 0 or end < stat.st_size - 1:
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=206,
+                headers=headers,
+                media_type=media_type or mimetypes.guess_type(path)[0] or "application/octet-stream",
+            )
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat)
@@ -0,0 +1,199 @@
+"""
+Perceptual-hash near-duplicate detection for meal photos.
+
+Byte hashes (see vlm_cache.py) miss re-takes of the same plate and
+recompressed gallery copies. A 64-bit difference hash (dHash) survives
+resizing and JPEG re-encoding, so two photos of the same meal end up a few
+bits apart. Each user's recent hashes live in a BK-tree so lookups by
+Hamming distance don't have to scan every earlier upload.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from database import ImageFingerprint
+from metrics import cache_lookup
+
+logger = logging.getLogger("forward_proxy")
+
+PHASH_ENABLED = os.getenv("PHASH_ENABLED", "1") == "1"
+# Max Hamming distance (out of 64 bits) that still counts as the same photo
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+# Only reuse analyses from this many hours back
+PHASH_WINDOW_HOURS = float(os.getenv("PHASH_WINDOW_HOURS", "24"))
+# Number of per-user trees kept in memory
+PHASH_INDEX_USERS = int(os.getenv("PHASH_INDEX_USERS", "1024"))
+
+_HASH_SIZE = 8
+
+
+def dhash(image_path: str) -> int:
+    """64-bit difference hash of an image file."""
+    with Image.open(image_path) as img:
+        # Let the JPEG decoder downscale while decoding; we only need 9x8 pixels
+        img.draft("L", (_HASH_SIZE * 8, _HASH_SIZE * 8))
+        small = img.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_signed(value: int) -> int:
+    # SQLite INTEGER is signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance."""
+
+    def __init__(self):
+        self._root = None  # (hash, payload, {distance: child})
+        self.size = 0
+
+    def add(self, value: int, payload):
+        node = (value, payload, {})
+        self.size += 1
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            d = hamming(value, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, object]]:
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node_value, payload, children = stack.pop()
+            d = hamming(value, node_value)
+            if d <= max_distance:
+                results.append((d, payload))
+            # Triangle inequality: only subtrees within [d - r, d + r] can match
+            for child_d, child in children.items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        return results
+
+
+class _UserIndex:
+    def __init__(self):
+        self.tree = BKTree()
+        self.last_id = 0
+        self.oldest = None
+
+
+class FingerprintIndex:
+    """Per-user BK-trees, lazily loaded from and kept in sync with the DB."""
+
+    def __init__(self, max_users: int = PHASH_INDEX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self, user_id: int, db: Session) -> _UserIndex:
+        window_start = datetime.utcnow() - timedelta(hours=PHASH_WINDOW_HOURS)
+        with self._lock:
+            index = self._users.get(user_id)
+            # Rebuild once the tree is mostly stale entries; reloading one window is cheap
+            if index is not None and index.oldest is not None and index.oldest < window_start - timedelta(hours=PHASH_WINDOW_HOURS):
+                index = None
+            if index is None:
+                index = _UserIndex()
+                self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+        # Pick up rows written since the last sync (possibly by another worker)
+        rows = (
+            db.query(ImageFingerprint)
+            .filter(
+                ImageFingerprint.user_id == user_id,
+                ImageFingerprint.id > index.last_id,
+                ImageFingerprint.created_at >= window_start,
+            )
+            .order_by(ImageFingerprint.id)
+            .all()
+        )
+        with self._lock:
+            for row in rows:
+                if row.id <= index.last_id:
+                    continue
+                index.tree.add(to_unsigned(row.dhash), (row.analysis_id, row.context_hash, row.created_at))
+                index.last_id = row.id
+                if index.oldest is None:
+                    index.oldest = row.created_at
+        return index
+
+    def find(self, user_id: int, value: int, context_hash: str, db: Session) -> Optional[Tuple[str, int]]:
+        """Closest earlier analysis of a near-identical photo with the same context.
+
+        Returns ``(analysis_id, distance)`` or None.
+        """
+        index = self._sync(user_id, db)
+        window_start = datetime.utcnow() - timedelta(hours=PHASH_WINDOW_HOURS)
+        with self._lock:
+            candidates = index.tree.search(value, PHASH_MAX_DISTANCE)
+        candidates = [
+            (d, payload) for d, payload in candidates
+            if payload[1] == context_hash and payload[2] >= window_start
+        ]
+        if not candidates:
+            self.misses += 1
+            cache_lookup("fingerprint", False)
+            return None
+        # Prefer the closest, then the most recent
+        d, payload = min(candidates, key=lambda c: (c[0], -c[1][2].timestamp()))
+        self.hits += 1
+        cache_lookup("fingerprint", True)
+        return payload[0], d
+
+    def add(self, user_id: int, analysis_id: str, value: int, context_hash: str, db: Session):
+        db.add(ImageFingerprint(
+            user_id=user_id,
+            analysis_id=analysis_id,
+            dhash=to_signed(value),
+            context_hash=context_hash,
+        ))
+        db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": PHASH_ENABLED,
+            "indexed_users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+fingerprints = FingerprintIndex()
@@ -0,0 +1,107 @@
+"""
+Bounded in-process worker pool for asynchronous meal analyses.
+
+``POST /api/analyze?mode=async`` only ingests the upload and enqueues the
+``analysis_id``; a fixed number of workers then drive the Whisper + VLM
+chain and update the ``AnalysisLog`` status. Waiters (SSE streams) are woken
+when a job in this process finishes; other processes fall back to polling
+the database.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("forward_proxy")
+
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+ANALYSIS_JOB_QUEUE_SIZE = int(os.getenv("ANALYSIS_JOB_QUEUE_SIZE", "100"))
+
+JobHandler = Callable[[str, Optional[dict]], Awaitable[None]]
+
+
+class AnalysisJobQueue:
+    def __init__(self, workers: int = ANALYSIS_JOB_WORKERS, max_queue: int = ANALYSIS_JOB_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._handler: Optional[JobHandler] = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self, handler: JobHandler):
+        if self._tasks:
+            return
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("[Jobs] Started %s analysis workers (queue size %s)", self.workers, self.max_queue)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, analysis_id: str, payload: Optional[dict] = None) -> bool:
+        """Enqueue a job; returns False when the queue is full or not running."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((analysis_id, payload))
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            analysis_id, payload = await self._queue.get()
+            self.running += 1
+            try:
+                await self._handler(analysis_id, payload)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error("[Jobs] Worker %s failed on %s: %s", index, analysis_id, e, exc_info=True)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+                self._notify(analysis_id)
+
+    def _notify(self, analysis_id: str):
+        event = self._events.pop(analysis_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, analysis_id: str, timeout: float) -> bool:
+        """Waits until the job finishes in this process; False on timeout."""
+        event = self._events.setdefault(analysis_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def forget(self, analysis_id: str):
+        self._events.pop(analysis_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+analysis_jobs = AnalysisJobQueue()
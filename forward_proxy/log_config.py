@@ -0,0 +1,186 @@
+"""
+Logging pipeline for the proxy.
+
+Records are handed to a ``QueueHandler`` and written by a ``QueueListener``
+thread, so request handlers never format messages or block on stdout. The
+queue keeps the record's ``msg`` and ``args`` and formatting happens on the
+listener thread. Log calls should therefore use lazy ``%s`` arguments, and
+must not pass objects that are mutated after the call.
+
+  * ``LOG_LEVEL``        WARNING by default
+  * ``LOG_FORMAT``       ``json`` (one object per line) or ``text``
+  * ``LOG_SAMPLE``       access-log sampling per route, e.g.
+                         ``GET /meals=0.1,/health*=0,*=1``; the first match wins
+  * ``LOG_SLOW_MS``      slower requests are always logged
+
+Every record carries the current request id (``X-Request-ID``, propagated
+through contextvars into sync handlers run in the threadpool).
+
+Forked children (the media process pool) have no listener thread, so they
+switch to writing records directly; see ``configure_child_logging``.
+"""
+import atexit
+import fnmatch
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from fast_json import dumps
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "/health*=0,/metrics=0,*=1")
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "1000"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the request id on records while still on the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records unformatted, and drops them rather than block when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "pid": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry, default=str).decode("utf-8")
+
+
+class RouteSampler:
+    """Keep-probability per route, from rules like ``GET /meals=0.1`` or ``/health*=0``."""
+
+    def __init__(self, spec: str = LOG_SAMPLE):
+        self.rules: List[Tuple[Optional[str], str, float]] = []
+        for rule in filter(None, (part.strip() for part in spec.split(","))):
+            pattern, _, rate = rule.rpartition("=")
+            method, _, path = pattern.strip().rpartition(" ")
+            self.rules.append((method.upper() or None, path, float(rate)))
+
+    def rate(self, method: str, route: str) -> float:
+        for rule_method, pattern, rate in self.rules:
+            if (rule_method is None or rule_method == method) and fnmatch.fnmatchcase(route, pattern):
+                return rate
+        return 1.0
+
+    def keep(self, method: str, route: str) -> bool:
+        rate = self.rate(method, route)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+queue_handler: Optional[DeferredQueueHandler] = None
+
+
+def _stream_handler() -> logging.Handler:
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"))
+    return stream
+
+
+def _set_root_handler(handler: logging.Handler):
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.WARNING))
+
+
+def configure_logging() -> logging.Logger:
+    """Routes the root logger through the queue; safe to call more than once."""
+    global _listener, queue_handler
+    if _listener is None:
+        queue_handler = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        queue_handler.addFilter(RequestIdFilter())
+        _set_root_handler(queue_handler)
+        _listener = logging.handlers.QueueListener(queue_handler.queue, _stream_handler(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    logging.getLogger().setLevel(getattr(logging, LOG_LEVEL, logging.WARNING))
+    return logging.getLogger("forward_proxy")
+
+
+def configure_child_logging():
+    """Writes records directly from a child process.
+
+    Runs after every fork and as the media pool's worker initializer (which
+    also covers spawned workers). A forked child inherits the queue but not
+    the listener thread, so records left on the queue would never be written,
+    and the queue's lock may have been held by another thread at fork time.
+    """
+    global _listener, queue_handler
+    _listener = None
+    queue_handler = None
+    stream = _stream_handler()
+    stream.addFilter(RequestIdFilter())
+    _set_root_handler(stream)
+
+
+def _after_fork_in_child():
+    if _listener is not None:
+        configure_child_logging()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def stop_logging():
+    """Flushes the queue; called at shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_stats() -> dict:
+    return {
+        "level": LOG_LEVEL,
+        "format": LOG_FORMAT,
+        "queued": queue_handler.queue.qsize() if queue_handler else 0,
+        "dropped": queue_handler.dropped if queue_handler else 0,
+    }
@@ -1,18 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime
 from typing import Optional, List
-from collections import defaultdict
 from contextlib import asynccontextmanager
-import httpx
+import argparse
+import asyncio
 import os
 import base64
 import json
 import logging
+import mimetypes
+import re
 import sys
 import time
 import uuid
@@ -27,46 +32,92 @@ import os, json, logging
 from datetime import date
 
 
-from database import get_db, init_db, User, Meal, AnalysisLog, AnalysisStatus
-from PIL import Image
-from pydub import AudioSegment
-import io
+from database import (
+    get_db, get_read_db, pool_stats, init_db, SessionLocal, User, Meal, AnalysisLog, AnalysisStatus, DailyTotal,
+    MEAL_RESPONSE_COLUMNS,
+)
 from auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
+    password_stats,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    purge_refresh_tokens,
     create_access_token,
     decode_access_token,
+    sign_media_path,
+    verify_media_signature,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 from pydantic import BaseModel
+from upstream import upstreams, OPENROUTER, WHISPER
+from vlm_cache import vlm_cache, cache_key, context_digest
+from image_fingerprint import fingerprints, dhash, PHASH_ENABLED
+from jobs import analysis_jobs
+from media_pool import media_pool, MediaPoolBusy
+from media_ops import prepare_vlm_image, convert_audio_to_wav, generate_image_derivatives, derivative_path, IMAGE_DERIVATIVES
+from uploads import store_upload, upload_extension, file_sha256, scratch_dir
+from blob_store import store_blob, add_ref, drop_ref, swap_ref, apply_ref_deltas
+from http_cache import media_response
+from user_cache import user_cache
+from daily_totals import TotalsDelta
+from fast_json import FastJSONResponse
+import metrics
+from metrics import REQUESTS_IN_FLIGHT, observe_request, track_upstream
+from log_config import configure_logging, request_id_var, RouteSampler, log_stats, LOG_LEVEL, LOG_FORMAT, LOG_SLOW_MS
+from rate_limit import rate_limiter, enforce_quota, ENDPOINT_POLICIES
+from sync import (
+    next_version, next_versions, current_version, purged_through, mark_deleted, purge_tombstones,
+    encode_sync_token, decode_sync_token, SYNC_PAGE_SIZE, SYNC_PAGE_MAX,
+)
 
 load_dotenv()
 
-# Rate limiting globals
-MAX_REQUESTS_PER_MINUTE = 5
-MAX_REQUESTS_PER_DAY = 5
-
-# In-memory store for minute rate limiting
-# Map user_id -> list of timestamps
-user_request_timestamps = defaultdict(list)
-
-# Configure logging
-# Allow overriding via env var, e.g. LOG_LEVEL=WARNING or LOG_LEVEL=INFO
-_log_level_str = os.getenv("LOG_LEVEL", "WARNING").upper()
-_log_level = getattr(logging, _log_level_str, logging.WARNING)
-logging.basicConfig(
-    level=_log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-logger = logging.getLogger("forward_proxy")
-logger.warning(f"[Logging] LOG_LEVEL={_log_level_str} (numeric={_log_level})")
+# Vision model used for meal analysis (also part of the VLM cache key)
+VLM_MODEL = os.getenv("VLM_MODEL", "qwen/qwen3-vl-235b-a22b-instruct")
+
+# Async analysis jobs
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+# A claimed job still PENDING after this long is considered orphaned (Whisper 30s + VLM 60s + slack)
+ANALYSIS_JOB_STALE_SECONDS = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "300"))
+ANALYSIS_SSE_POLL_SECONDS = 15.0
+ANALYSIS_SSE_MAX_SECONDS = 300.0
+
+# GET /meals page sizes
+MEALS_PAGE_DEFAULT = int(os.getenv("MEALS_PAGE_DEFAULT", "200"))
+MEALS_PAGE_MAX = int(os.getenv("MEALS_PAGE_MAX", "1000"))
+# GET /stats/daily range limit
+STATS_DAILY_MAX_DAYS = int(os.getenv("STATS_DAILY_MAX_DAYS", "366"))
+# POST /meals/batch: items per request, and ids per IN (...) lookup (SQLite caps bound parameters)
+MEALS_BATCH_MAX = int(os.getenv("MEALS_BATCH_MAX", "500"))
+_ID_CHUNK = 500
+
+# Set by the `python main.py` launcher once the schema is in place, so forked
+# workers don't all race to create tables / run ALTERs
+SCHEMA_READY_ENV = "FORWARD_PROXY_SCHEMA_READY"
+
+# Logging goes through a background queue (see log_config.py)
+logger = configure_logging()
+logger.warning("[Logging] LOG_LEVEL=%s format=%s", LOG_LEVEL, LOG_FORMAT)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Starting up...")
+    logger.info("Starting up worker pid=%s...", os.getpid())
+    if os.getenv(SCHEMA_READY_ENV) != "1":
+        init_db()
+    media_pool.start()
+    upstreams.start()
+    # The health checks go through the shared pools, so they also warm up the connections
     await health_check_external_services()
+    analysis_jobs.start(run_analysis_job)
+    recover_pending_analyses()
+    purge_expired_rows()
     yield
+    await analysis_jobs.stop()
+    await upstreams.close()
+    media_pool.shutdown()
+    metrics.worker_exit()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -76,44 +127,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "X-Request-ID"],
 )
 
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+access_sampler = RouteSampler()
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    if request.url.path == "/health":
-        return await call_next(request)
-
-    start_time = time.time()
-    request_id = f"{time.time()}-{os.urandom(4).hex()}"
-    
-    logger.info(f"[{request_id}] Incoming request: {request.method} {request.url}")
-    
-    # Log headers (be careful with sensitive info like Authorization)
-    headers = dict(request.headers)
-    if "authorization" in headers:
-        headers["authorization"] = "Bearer ***"
-    logger.info(f"[{request_id}] Headers: {headers}")
-
+    # Reuse the caller's id (e.g. from a load balancer) so log lines can be joined across hops
+    request_id = request.headers.get("x-request-id", "")
+    if not _REQUEST_ID_RE.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    start_time = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
     try:
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        logger.info(f"[{request_id}] Response status: {response.status_code} - Took: {process_time:.4f}s")
+        if logger.isEnabledFor(logging.DEBUG):
+            headers = {k: ("***" if k in ("authorization", "cookie") else v) for k, v in request.headers.items()}
+            logger.debug("Incoming request: %s %s headers=%s", request.method, request.url.path, headers)
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            logger.error("Request failed: %s %s: %s", request.method, request.url.path, e, exc_info=True)
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": "Internal Server Error", "error": str(e)}
+            )
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        response.headers["X-Request-ID"] = request_id
+        # Route templates keep label cardinality bounded; unmatched paths share one label
+        route_obj = request.scope.get("route")
+        observe_request(request.method, route_obj.path if route_obj else "unmatched", response.status_code,
+                        duration_ms / 1000)
+        if response.status_code >= 500 or duration_ms >= LOG_SLOW_MS:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+        if logger.isEnabledFor(level):
+            route = route_obj.path if route_obj else request.url.path
+            if level > logging.INFO or access_sampler.keep(request.method, route):
+                logger.log(level, "%s %s -> %s in %.1fms", request.method, route, response.status_code, duration_ms,
+                           extra={"method": request.method, "route": route, "status": response.status_code,
+                                  "duration_ms": round(duration_ms, 1)})
         return response
-    except Exception as e:
-        process_time = time.time() - start_time
-        logger.error(f"[{request_id}] Request failed: {str(e)} - Took: {process_time:.4f}s", exc_info=True)
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal Server Error", "error": str(e)}
-        )
-
-# Initialize DB
-init_db()
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        request_id_var.reset(token)
+
+@app.exception_handler(MediaPoolBusy)
+async def media_pool_busy_handler(request: Request, exc: MediaPoolBusy):
+    logger.warning("[MediaPool] Rejected %s %s: %s", request.method, request.url.path, exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy processing media, try again shortly"},
+        headers={"Retry-After": "5"}
+    )
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/health/logging")
+def logging_stats():
+    return log_stats()
+
+@app.get("/health/upstreams")
+def upstream_stats():
+    return upstreams.stats()
+
+@app.get("/health/media")
+def media_stats():
+    return media_pool.stats()
+
+@app.get("/health/jobs")
+def job_stats():
+    return analysis_jobs.stats()
+
+@app.get("/health/auth")
+def auth_stats():
+    return password_stats()
+
+@app.get("/health/ratelimit")
+def rate_limit_stats():
+    return rate_limiter.stats()
+
+@app.get("/health/db")
+def db_stats():
+    return pool_stats()
+
+@app.get("/health/cache")
+def cache_stats():
+    return {"vlm": vlm_cache.stats(), "near_duplicates": fingerprints.stats(), "users": user_cache.stats()}
+
 async def health_check_external_services():
     # Whisper Check
     whisper_url = os.getenv("WHISPER_API_URL", "http://pangolin.7cc.xyz:10303/transcribe")
@@ -123,37 +234,39 @@ async def health_check_external_services():
         base_url = whisper_url.rsplit('/', 1)[0]
         health_url = f"{base_url}/health"
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-             try:
-                 resp = await client.get(health_url)
-                 if resp.status_code == 200:
-                     logger.info(f"External services: Whisper ONLINE ({health_url}) - Status: {resp.status_code}")
-                 else:
-                     logger.warning(f"External services: Whisper ONLINE but returned {resp.status_code} ({health_url})")
-             except Exception as e:
-                 logger.error(f"External services: Whisper OFFLINE or Unreachable ({health_url}) - {e}")
+        client = upstreams.client(WHISPER)
+        try:
+            resp = await client.get(health_url, timeout=5.0)
+            if resp.status_code == 200:
+                logger.info("External services: Whisper ONLINE (%s) - Status: %s", health_url, resp.status_code)
+            else:
+                logger.warning("External services: Whisper ONLINE but returned %s (%s)", resp.status_code, health_url)
+        except Exception as e:
+            logger.error("External services: Whisper OFFLINE or Unreachable (%s) - %s", health_url, e)
     except Exception as e:
-        logger.error(f"External services: Whisper Check Error ({e})")
+        logger.error("External services: Whisper Check Error (%s)", e)
 
     openrouter_base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
     openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
 
     if openrouter_base_url and openrouter_api_key:
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                headers = {"Authorization": f"Bearer {openrouter_api_key}"}
-                # Try listing models as a lightweight check
-                resp = await client.get(f"{openrouter_base_url}/models", headers=headers)
-                if resp.status_code == 200:
-                    logger.info("External services: OpenRouter ONLINE")
-                else:
-                    logger.error(f"External services: OpenRouter Check Failed with status {resp.status_code}")
+            client = upstreams.client(OPENROUTER)
+            headers = {"Authorization": f"Bearer {openrouter_api_key}"}
+            # Try listing models as a lightweight check
+            resp = await client.get(f"{openrouter_base_url}/models", headers=headers, timeout=5.0)
+            if resp.status_code == 200:
+                logger.info("External services: OpenRouter ONLINE")
+            else:
+                logger.error("External services: OpenRouter Check Failed with status %s", resp.status_code)
         except Exception as e:
-            logger.error(f"External services: OpenRouter Check Error ({e})")
+            logger.error("External services: OpenRouter Check Error (%s)", e)
     else:
         logger.warning("External services: OpenRouter Check Skipped (Missing Env Vars)")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# /static accepts either a signed URL or a bearer token
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -203,6 +316,11 @@ class UserProfileUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class NutritionInfoModel(BaseModel):
     calories: int
@@ -228,7 +346,24 @@ class MealCreate(BaseModel):
     mealQuality: MealQualityModel
 
 class MealResponse(MealCreate):
-    pass
+    # Signed /static URLs for image/audio; fetchable without an Authorization header
+    imageUrl: Optional[str] = None
+    audioUrl: Optional[str] = None
+
+class DailyTotalResponse(NutritionInfoModel):
+    date: date
+    mealCount: int
+
+class MealBatchRequest(BaseModel):
+    meals: List[MealCreate]
+
+class MealBatchItemResult(BaseModel):
+    id: str
+    status: str  # created | updated | superseded (a later item has the same id) | conflict (id owned by another user)
+    version: Optional[int] = None
+
+class MealBatchResponse(BaseModel):
+    results: List[MealBatchItemResult]
 
 class MealTrackResponse(BaseModel):
     success: bool
@@ -237,6 +372,23 @@ class MealTrackResponse(BaseModel):
 
 # Dependency to get current user
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return resolve_user(token, db)
+
+def resolve_user(token: str, db: Session) -> User:
+    user_id = user_cache.user_id_for_token(token)
+    if user_id is None:
+        user_id = _decode_user_id(token)
+    user = user_cache.get_user(user_id, db)
+    if user is not None:
+        return user
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_cache.remember_user(user)
+    return user
+
+def _decode_user_id(token: str) -> int:
     payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(
@@ -259,82 +411,42 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             detail="Invalid token subject",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
-
-async def enforce_rate_limit(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    now = time.time()
-    
-    # 1. Daily Check and Reset
-    today = date.today()
-    # If last_reset_date is None (legacy users), treat as today or reset
-    if user.last_reset_date is None or user.last_reset_date != today:
-        user.quota_count = 0
-        user.last_reset_date = today
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        
-    if user.quota_count >= MAX_REQUESTS_PER_DAY:
-        raise HTTPException(
-            status_code=429,
-            detail="Daily limit reached"
-        )
-        
-    # 2. Minute Check
-    timestamps = user_request_timestamps[user.id]
-    valid_timestamps = [t for t in timestamps if now - t < 60]
-    user_request_timestamps[user.id] = valid_timestamps
-    
-    if len(valid_timestamps) >= MAX_REQUESTS_PER_MINUTE:
-        raise HTTPException(
-            status_code=429,
-            detail="Minute limit reached"
-        )
-        
-    # Increment
-    user.quota_count += 1
-    db.add(user)
-    db.commit()
-    
-    user_request_timestamps[user.id].append(now)
-    return True
+    user_cache.remember_token(token, user_id, payload.get("exp"))
+    return user_id
 
 @app.get("/user/limits")
 async def check_limits(user: User = Depends(get_current_user)):
-    now = time.time()
-    
-    # Check Daily
-    daily_remaining = MAX_REQUESTS_PER_DAY - user.quota_count
-    if user.last_reset_date != date.today():
-         daily_remaining = MAX_REQUESTS_PER_DAY
-         
-    # Check Minute
-    timestamps = user_request_timestamps[user.id]
-    valid_timestamps = [t for t in timestamps if now - t < 60]
-    minute_remaining = MAX_REQUESTS_PER_MINUTE - len(valid_timestamps)
+    remaining = rate_limiter.remaining(f"user:{user.id}", ENDPOINT_POLICIES["track_meal"])
+    daily_remaining = remaining["day"]
+    minute_remaining = remaining["minute"]
     
     is_allowed = daily_remaining > 0 and minute_remaining > 0
     
     return {
         "allowed": is_allowed,
-        "daily_remaining": max(0, daily_remaining),
-        "minute_remaining": max(0, minute_remaining)
+        "daily_remaining": daily_remaining,
+        "minute_remaining": minute_remaining
     }
 
-@app.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = get_password_hash(user.password)
+def issue_tokens(user_id: int, db: Session, refresh_token: Optional[str] = None) -> dict:
+    """Access + refresh token pair; starts a new refresh family unless one is passed in."""
+    if refresh_token is None:
+        refresh_token = issue_refresh_token(user_id, db)
+        db.commit()
+    access_token = create_access_token(
+        data={"sub": str(user_id)}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def _user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def _create_user(user: UserCreate, hashed_password: str, db: Session) -> dict:
     new_user = User(
         email=user.email,
         password_hash=hashed_password,
@@ -364,11 +476,17 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(new_user)
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(new_user.id)}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(new_user.id, db)
+
+# Async for the bounded bcrypt pool; the DB work goes to the threadpool so a
+# busy database can't stall the event loop
+@app.post("/signup", response_model=Token)
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(_user_by_email, db, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await get_password_hash_async(user.password)
+    return await run_in_threadpool(_create_user, user, hashed_password, db)
 
 @app.put("/profile")
 def update_profile(profile: UserProfileUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -391,12 +509,17 @@ def update_profile(profile: UserProfileUpdate, current_user: User = Depends(get_
     if profile.custom_carbs is not None: current_user.custom_carbs = profile.custom_carbs
     if profile.custom_fat is not None: current_user.custom_fat = profile.custom_fat
     if profile.is_custom_goals is not None: current_user.is_custom_goals = 1 if profile.is_custom_goals else 0
+    current_user.sync_version = next_version(db)
     
     db.commit()
+    user_cache.invalidate(current_user.id)
     return {"message": "Profile updated successfully"}
 
 @app.get("/profile")
 def get_profile(current_user: User = Depends(get_current_user)):
+    return profile_payload(current_user)
+
+def profile_payload(current_user: User) -> dict:
     return {
         "email": current_user.email,
         "name": current_user.name,
@@ -426,45 +549,50 @@ async def upload_profile_image(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Ensure directory exists
-    os.makedirs("data/images", exist_ok=True)
-    
     file_path = f"data/images/{current_user.id}.jpg"
-    
-    with open(file_path, "wb") as buffer:
-        content = await image.read()
-        buffer.write(content)
-        
+    await store_upload(image, file_path, "profile_image")
+
     current_user.profile_image_path = file_path
+    current_user.sync_version = next_version(db)
     db.commit()
+    user_cache.invalidate(current_user.id)
     
     return {"message": "Profile image uploaded successfully"}
 
 @app.get("/profile/image")
 def get_profile_image(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if not current_user.profile_image_path or not os.path.exists(current_user.profile_image_path):
         raise HTTPException(status_code=404, detail="Profile image not found")
-        
-    return FileResponse(current_user.profile_image_path)
+
+    # Overwritten in place on re-upload, so clients must revalidate (cheap 304 via ETag)
+    return media_response(request, current_user.profile_image_path, immutable=False)
 
 @app.post("/login", response_model=Token)
-def login(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.password_hash):
+async def login(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_user_by_email, db, user.email)
+    if not db_user or not await verify_password_async(user.password, db_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(db_user.id)}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await run_in_threadpool(issue_tokens, db_user.id, db)
+
+@app.post("/token/refresh", response_model=Token)
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    """Rotates the refresh token and issues a new access token; no password check."""
+    user_id, refresh_token = rotate_refresh_token(body.refresh_token, db)
+    return issue_tokens(user_id, db, refresh_token=refresh_token)
+
+@app.post("/token/revoke")
+def revoke_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    revoke_refresh_token(body.refresh_token, db)
+    return {"message": "Token revoked"}
 
 
 @app.post("/meals", response_model=MealResponse)
@@ -478,23 +606,22 @@ def create_meal(meal: MealCreate, current_user: User = Depends(get_current_user)
     """
     
     # Quota Check
-    if not check_quota_and_update(current_user, db):
-        logger.warning(f"User {current_user.id} exceeded daily quota (create_meal)")
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Daily limit reached."
-        )
+    enforce_quota(current_user.id, "meals")
 
-    logger.info(f"[POST /meals] Creating/Updating meal {meal.id} for user {current_user.id} (email: {current_user.email})")
-    logger.debug(f"[POST /meals] Meal data: category={meal.category}, timestamp={meal.timestamp}, name={meal.name}, has_image={bool(meal.image)}, has_audio={bool(meal.audio)}, has_transcription={bool(meal.transcription)}")
+    logger.info("[POST /meals] Creating/Updating meal %s for user %s (email: %s)", meal.id, current_user.id, current_user.email)
+    logger.debug("[POST /meals] Meal data: category=%s, timestamp=%s, name=%s, has_image=%s, has_audio=%s, has_transcription=%s", meal.category, meal.timestamp, meal.name, bool(meal.image), bool(meal.audio), bool(meal.transcription))
 
     # First try: normal read-then-update/insert path.
     # IMPORTANT: Scope to the current user to prevent cross-user overwrites.
     existing_meal = db.query(Meal).filter(Meal.id == meal.id, Meal.user_id == current_user.id).first()
     if existing_meal:
-        logger.info(f"[POST /meals] Updating existing meal {meal.id} for user {current_user.id}")
-        logger.debug(f"[POST /meals] Old meal: category={existing_meal.category}, has_image={bool(existing_meal.image_path)}, has_audio={bool(existing_meal.audio_path)}")
+        logger.info("[POST /meals] Updating existing meal %s for user %s", meal.id, current_user.id)
+        logger.debug("[POST /meals] Old meal: category=%s, has_image=%s, has_audio=%s", existing_meal.category, bool(existing_meal.image_path), bool(existing_meal.audio_path))
 
+        totals = TotalsDelta()
+        totals.remove_meal(existing_meal)
+        swap_ref(db, existing_meal.image_path, meal.image)
+        swap_ref(db, existing_meal.audio_path, meal.audio)
         existing_meal.timestamp = meal.timestamp
         existing_meal.category = meal.category
         existing_meal.name = meal.name
@@ -509,6 +636,10 @@ def create_meal(meal: MealCreate, current_user: User = Depends(get_current_user)
         existing_meal.calorie_density = meal.mealQuality.calorieDensity
         existing_meal.goal_fit_percentage = meal.mealQuality.goalFitPercentage
         existing_meal.meal_quality_score = meal.mealQuality.mealQualityScore
+        existing_meal.deleted_at = None  # re-creating a deleted meal revives it
+        existing_meal.version = next_version(db)
+        totals.add_meal(existing_meal)
+        totals.apply(db)
         db.commit()
         db.refresh(existing_meal)
         return meal
@@ -529,17 +660,23 @@ def create_meal(meal: MealCreate, current_user: User = Depends(get_current_user)
         fat=meal.nutritionInfo.fat,
         calorie_density=meal.mealQuality.calorieDensity,
         goal_fit_percentage=meal.mealQuality.goalFitPercentage,
-        meal_quality_score=meal.mealQuality.mealQualityScore
+        meal_quality_score=meal.mealQuality.mealQualityScore,
+        version=next_version(db)
     )
 
     db.add(db_meal)
+    add_ref(db, meal.image)
+    add_ref(db, meal.audio)
+    totals = TotalsDelta()
+    totals.add_meal(db_meal)
+    totals.apply(db)
     try:
         db.commit()
     except IntegrityError:
         # Race condition safe-guard: another request inserted the same primary key concurrently.
         # Treat as idempotent success by fetching & updating.
         db.rollback()
-        logger.warning(f"[POST /meals] IntegrityError on insert for meal {meal.id}. Falling back to update.")
+        logger.warning("[POST /meals] IntegrityError on insert for meal %s. Falling back to update.", meal.id)
 
         existing_meal = db.query(Meal).filter(Meal.id == meal.id, Meal.user_id == current_user.id).first()
         if not existing_meal:
@@ -547,6 +684,10 @@ def create_meal(meal: MealCreate, current_user: User = Depends(get_current_user)
             # Signal conflict rather than 500.
             raise HTTPException(status_code=409, detail="Meal ID already exists")
 
+        totals = TotalsDelta()
+        totals.remove_meal(existing_meal)
+        swap_ref(db, existing_meal.image_path, meal.image)
+        swap_ref(db, existing_meal.audio_path, meal.audio)
         existing_meal.timestamp = meal.timestamp
         existing_meal.category = meal.category
         existing_meal.name = meal.name
@@ -561,56 +702,299 @@ def create_meal(meal: MealCreate, current_user: User = Depends(get_current_user)
         existing_meal.calorie_density = meal.mealQuality.calorieDensity
         existing_meal.goal_fit_percentage = meal.mealQuality.goalFitPercentage
         existing_meal.meal_quality_score = meal.mealQuality.mealQualityScore
+        existing_meal.deleted_at = None  # re-creating a deleted meal revives it
+        existing_meal.version = next_version(db)
+        totals.add_meal(existing_meal)
+        totals.apply(db)
         db.commit()
         db.refresh(existing_meal)
         return meal
 
     db.refresh(db_meal)
-    logger.info(f"[POST /meals] Meal {meal.id} created successfully for user {current_user.id}")
+    logger.info("[POST /meals] Meal %s created successfully for user %s", meal.id, current_user.id)
     return meal
 
+def meal_row(meal: MealCreate, user_id: int, version: int) -> dict:
+    return {
+        "id": meal.id,
+        "user_id": user_id,
+        "timestamp": meal.timestamp,
+        "category": meal.category,
+        "name": meal.name,
+        "image_path": meal.image,
+        "audio_path": meal.audio,
+        "transcription": meal.transcription,
+        "calories": meal.nutritionInfo.calories,
+        "carbs": meal.nutritionInfo.carbs,
+        "sugar": meal.nutritionInfo.sugar,
+        "protein": meal.nutritionInfo.protein,
+        "fat": meal.nutritionInfo.fat,
+        "calorie_density": meal.mealQuality.calorieDensity,
+        "goal_fit_percentage": meal.mealQuality.goalFitPercentage,
+        "meal_quality_score": meal.mealQuality.mealQualityScore,
+        "deleted_at": None,  # re-creating a deleted meal revives it
+        "version": version,
+    }
+
+@app.post("/meals/batch", response_model=MealBatchResponse)
+def create_meals_batch(batch: MealBatchRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Idempotent create-or-update of many meals in one transaction.
+
+    Used by the client queue when it flushes after reconnecting. Quota is
+    charged once per batch. The last item wins when an id repeats.
+    """
+    if not batch.meals:
+        return MealBatchResponse(results=[])
+    if len(batch.meals) > MEALS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {MEALS_BATCH_MAX} meals per batch")
+
+    enforce_quota(current_user.id, "meals")
+
+    latest = {meal.id: meal for meal in batch.meals}
+    # Allocating versions takes SQLite's write lock first, so the rows read below can't change under us
+    versions = dict(zip(latest, next_versions(db, len(latest))))
+
+    existing = {}
+    ids = list(latest)
+    for start in range(0, len(ids), _ID_CHUNK):
+        for row in db.query(
+            Meal.id, Meal.user_id, Meal.image_path, Meal.audio_path, Meal.timestamp, Meal.deleted_at,
+            Meal.calories, Meal.carbs, Meal.sugar, Meal.protein, Meal.fat,
+        ).filter(
+            Meal.id.in_(ids[start:start + _ID_CHUNK])
+        ):
+            existing[row.id] = row
+
+    rows, ref_deltas, statuses = [], {}, {}
+    totals = TotalsDelta()
+    for meal_id, meal in latest.items():
+        old = existing.get(meal_id)
+        if old is not None and old.user_id != current_user.id:
+            statuses[meal_id] = "conflict"
+            continue
+        for old_path, new_path in ((old and old.image_path, meal.image), (old and old.audio_path, meal.audio)):
+            if old_path != new_path:
+                if old_path:
+                    ref_deltas[old_path] = ref_deltas.get(old_path, 0) - 1
+                if new_path:
+                    ref_deltas[new_path] = ref_deltas.get(new_path, 0) + 1
+        if old is not None:
+            totals.remove_meal(old)
+        nutrition = meal.nutritionInfo
+        totals.add_values(current_user.id, meal.timestamp,
+                          [nutrition.calories, nutrition.carbs, nutrition.sugar, nutrition.protein, nutrition.fat])
+        rows.append(meal_row(meal, current_user.id, versions[meal_id]))
+        statuses[meal_id] = "updated" if old is not None else "created"
+
+    if rows:
+        stmt = sqlite_insert(Meal)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Meal.id],
+            set_={key: stmt.excluded[key] for key in rows[0] if key not in ("id", "user_id")},
+            # Never overwrite another user's meal, even if one appeared since the lookup
+            where=Meal.user_id == stmt.excluded.user_id,
+        )
+        db.execute(stmt, rows)
+        apply_ref_deltas(db, ref_deltas)
+        totals.apply(db)
+    db.commit()
+
+    results = []
+    for meal in batch.meals:
+        if latest[meal.id] is not meal:
+            results.append(MealBatchItemResult(id=meal.id, status="superseded"))
+            continue
+        item_status = statuses[meal.id]
+        version = versions[meal.id] if item_status != "conflict" else None
+        results.append(MealBatchItemResult(id=meal.id, status=item_status, version=version))
+
+    conflicts = sum(1 for value in statuses.values() if value == "conflict")
+    logger.info("[POST /meals/batch] Upserted %s meals for user %s (%s conflicts)", len(rows), current_user.id, conflicts)
+    return MealBatchResponse(results=results)
+
+def signed_static_url(path: Optional[str], user_id: int) -> Optional[str]:
+    if not path:
+        return None
+    params = sign_media_path(path, user_id)
+    return f"/static/{path}?uid={params['uid']}&exp={params['exp']}&sig={params['sig']}"
+
+# The columns behind MealResponse; list endpoints select these rather than whole entities
+def meal_payload(m, user_id: int) -> dict:
+    """A MealResponse as a plain dict (same keys, same order) from a row of MEAL_RESPONSE_COLUMNS."""
+    return {
+        "id": m.id,
+        "timestamp": m.timestamp,
+        "category": m.category,
+        "name": m.name,
+        "image": m.image_path,
+        "audio": m.audio_path,
+        "transcription": m.transcription,
+        "nutritionInfo": {
+            "calories": m.calories,
+            "carbs": m.carbs,
+            "sugar": m.sugar,
+            "protein": m.protein,
+            "fat": m.fat,
+        },
+        "mealQuality": {
+            "calorieDensity": m.calorie_density,
+            "goalFitPercentage": m.goal_fit_percentage,
+            "mealQualityScore": m.meal_quality_score,
+        },
+        "imageUrl": signed_static_url(m.image_path, user_id),
+        "audioUrl": signed_static_url(m.audio_path, user_id),
+    }
+
+def encode_meal_cursor(m: Meal) -> str:
+    return base64.urlsafe_b64encode(json.dumps([m.timestamp, m.id]).encode("utf-8")).decode("ascii")
+
+def decode_meal_cursor(cursor: str):
+    try:
+        timestamp, meal_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(timestamp), str(meal_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/meals", response_model=List[MealResponse])
-def get_meals(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    logger.info(f"[GET /meals] Fetching meals for user {current_user.id} (email: {current_user.email})")
-    meals = db.query(Meal).filter(Meal.user_id == current_user.id).all()
-    logger.info(f"[GET /meals] Found {len(meals)} meals for user {current_user.id}")
-    if meals:
-        logger.debug(f"[GET /meals] Meal IDs: {[m.id for m in meals]}")
-    return [
-        MealResponse(
-            id=m.id,
-            timestamp=m.timestamp,
-            category=m.category,
-            name=m.name,
-            image=m.image_path,
-            audio=m.audio_path,
-            transcription=m.transcription,
-            nutritionInfo=NutritionInfoModel(
-                calories=m.calories,
-                carbs=m.carbs,
-                sugar=m.sugar,
-                protein=m.protein,
-                fat=m.fat
-            ),
-            mealQuality=MealQualityModel(
-                calorieDensity=m.calorie_density,
-                goalFitPercentage=m.goal_fit_percentage,
-                mealQualityScore=m.meal_quality_score
-            )
-        ) for m in meals
-    ]
+def get_meals(
+    from_ts: Optional[int] = Query(None, alias="from", description="Unix seconds, inclusive"),
+    to_ts: Optional[int] = Query(None, alias="to", description="Unix seconds, exclusive"),
+    limit: int = Query(MEALS_PAGE_DEFAULT, ge=1, le=MEALS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """The user's meals, newest first, one page at a time.
+
+    Pages are keyset-paginated on ``(timestamp, id)`` (served by
+    ix_meals_user_timestamp). When more meals match, the ``X-Next-Cursor``
+    header carries the ``cursor`` for the next page.
+    """
+    logger.info("[GET /meals] Fetching meals for user %s (from=%s, to=%s, limit=%s)", current_user.id, from_ts, to_ts, limit)
+    query = db.query(*MEAL_RESPONSE_COLUMNS).filter(Meal.user_id == current_user.id, Meal.deleted_at.is_(None))
+    if from_ts is not None:
+        query = query.filter(Meal.timestamp >= from_ts)
+    if to_ts is not None:
+        query = query.filter(Meal.timestamp < to_ts)
+    if cursor:
+        query = query.filter(tuple_(Meal.timestamp, Meal.id) < decode_meal_cursor(cursor))
+    # One extra row tells us whether there is another page
+    meals = query.order_by(Meal.timestamp.desc(), Meal.id.desc()).limit(limit + 1).all()
+
+    headers = {}
+    if len(meals) > limit:
+        meals = meals[:limit]
+        headers["X-Next-Cursor"] = encode_meal_cursor(meals[-1])
+    logger.info("[GET /meals] Returning %s meals for user %s", len(meals), current_user.id)
+    return FastJSONResponse([meal_payload(m, current_user.id) for m in meals], headers=headers)
+
+@app.get("/stats/daily", response_model=List[DailyTotalResponse])
+def get_daily_stats(
+    from_day: date = Query(..., alias="from", description="First day (YYYY-MM-DD), inclusive"),
+    to_day: date = Query(..., alias="to", description="Last day (YYYY-MM-DD), inclusive"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Nutrition totals per day with at least one meal, oldest first (server-local days)."""
+    if to_day < from_day:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_day - from_day).days >= STATS_DAILY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {STATS_DAILY_MAX_DAYS} days per request")
+    rows = db.query(
+        DailyTotal.calories, DailyTotal.carbs, DailyTotal.sugar, DailyTotal.protein, DailyTotal.fat,
+        DailyTotal.day, DailyTotal.meal_count,
+    ).filter(
+        DailyTotal.user_id == current_user.id,
+        DailyTotal.day >= from_day,
+        DailyTotal.day <= to_day,
+        DailyTotal.meal_count > 0,
+    ).order_by(DailyTotal.day).all()
+    return FastJSONResponse([
+        {
+            "calories": row.calories, "carbs": row.carbs, "sugar": row.sugar, "protein": row.protein,
+            "fat": row.fat, "date": row.day.isoformat(), "mealCount": row.meal_count,
+        }
+        for row in rows
+    ])
+
+@app.get("/sync")
+def sync_changes(
+    since: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_PAGE_MAX),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Meals and profile changed since the sync token ``since``.
+
+    Without a token (or with ``reset: true`` in the reply, when the token
+    predates purged tombstones) the reply is the full state. Store ``token``
+    and pass it as ``since`` next time; keep calling while ``hasMore``.
+    """
+    since_version = decode_sync_token(since)
+    reset = since_version < 0
+    if not reset and since_version < purged_through(db):
+        since_version, reset = -1, True
+
+    # Read the counter first: every version up to it is committed (see sync.py)
+    upto = current_version(db)
+    rows = (
+        db.query(*MEAL_RESPONSE_COLUMNS, Meal.version, Meal.deleted_at)
+        .filter(Meal.user_id == current_user.id, Meal.version > since_version, Meal.version <= upto)
+        .order_by(Meal.version)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+        upto = rows[-1].version
+
+    # The cached user may lag behind another worker's profile write
+    user = db.query(User).filter(User.id == current_user.id).first()
+    profile = None
+    if user.sync_version is not None and since_version < user.sync_version <= upto:
+        profile = profile_payload(user)
+
+    logger.info("[GET /sync] User %s: %s meal changes since %s (reset=%s)", current_user.id, len(rows), since_version, reset)
+    return FastJSONResponse({
+        "token": encode_sync_token(max(upto, since_version)),
+        "hasMore": has_more,
+        "reset": reset,
+        "meals": [meal_payload(m, current_user.id) for m in rows if m.deleted_at is None],
+        "deleted": [m.id for m in rows if m.deleted_at is not None],
+        "profile": profile,
+    })
+
+def purge_expired_rows():
+    """Startup maintenance: old tombstones and spent refresh tokens."""
+    db = SessionLocal()
+    try:
+        for label, purge in (("[Sync] Tombstone", purge_tombstones), ("[Auth] Refresh token", purge_refresh_tokens)):
+            try:
+                purge(db)
+            except Exception as e:
+                logger.warning("%s purge failed: %s", label, e)
+                db.rollback()
+    finally:
+        db.close()
 
 @app.delete("/meals/{meal_id}")
 def delete_meal(meal_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    logger.info(f"[DELETE /meals/{meal_id}] Deleting meal for user {current_user.id} (email: {current_user.email})")
-    meal = db.query(Meal).filter(Meal.id == meal_id, Meal.user_id == current_user.id).first()
+    logger.info("[DELETE /meals/%s] Deleting meal for user %s (email: %s)", meal_id, current_user.id, current_user.email)
+    meal = db.query(Meal).filter(Meal.id == meal_id, Meal.user_id == current_user.id, Meal.deleted_at.is_(None)).first()
     if not meal:
-        logger.warning(f"[DELETE /meals/{meal_id}] Meal not found for user {current_user.id}")
+        logger.warning("[DELETE /meals/%s] Meal not found for user %s", meal_id, current_user.id)
         raise HTTPException(status_code=404, detail="Meal not found")
-    logger.debug(f"[DELETE /meals/{meal_id}] Deleting meal with image_path={meal.image_path}, audio_path={meal.audio_path}")
-    db.delete(meal)
+    logger.debug("[DELETE /meals/%s] Deleting meal with image_path=%s, audio_path=%s", meal_id, meal.image_path, meal.audio_path)
+    drop_ref(db, meal.image_path)
+    drop_ref(db, meal.audio_path)
+    totals = TotalsDelta()
+    totals.remove_meal(meal)
+    totals.apply(db)
+    # Keep a tombstone so /sync can report the delete
+    mark_deleted(db, meal)
     db.commit()
-    logger.info(f"[DELETE /meals/{meal_id}] Meal deleted successfully for user {current_user.id}")
+    logger.info("[DELETE /meals/%s] Meal deleted successfully for user %s", meal_id, current_user.id)
     return {"message": "Meal deleted"}
 
 @app.post("/meals/image")
@@ -619,20 +1003,14 @@ async def upload_meal_image(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    logger.info(f"[POST /meals/image] Uploading meal image for user {current_user.id} (email: {current_user.email})")
-    logger.debug(f"[POST /meals/image] File: {image.filename}, content_type: {image.content_type}")
-    os.makedirs("data/meal_images", exist_ok=True)
-    file_ext = image.filename.split(".")[-1] if "." in image.filename else "jpg"
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    relative_path = f"meal_images/{file_name}"
-    file_path = f"data/{relative_path}"
-    
-    with open(file_path, "wb") as buffer:
-        content = await image.read()
-        buffer.write(content)
-    
-    logger.info(f"[POST /meals/image] Image saved to {file_path} ({len(content)} bytes)")
-    return {"image_path": relative_path}
+    logger.info("[POST /meals/image] Uploading meal image for user %s (email: %s)", current_user.id, current_user.email)
+    logger.debug("[POST /meals/image] File: %s, content_type: %s", image.filename, image.content_type)
+    stored = await store_blob(image, "image", upload_extension(image, "jpg"), db)
+    db.commit()
+    await generate_derivatives(f"data/{stored.path}")
+
+    logger.info("[POST /meals/image] Image saved to %s (%s bytes)", stored.path, stored.size)
+    return {"image_path": stored.path}
 
 @app.post("/meals/audio")
 async def upload_meal_audio(
@@ -640,102 +1018,132 @@ async def upload_meal_audio(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    logger.info(f"[POST /meals/audio] Uploading meal audio for user {current_user.id} (email: {current_user.email})")
-    logger.debug(f"[POST /meals/audio] File: {audio.filename}, content_type: {audio.content_type}")
-    os.makedirs("data/meal_audios", exist_ok=True)
-    file_ext = audio.filename.split(".")[-1] if "." in audio.filename else "m4a"
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    relative_path = f"meal_audios/{file_name}"
-    file_path = f"data/{relative_path}"
-
-    with open(file_path, "wb") as buffer:
-        content = await audio.read()
-        buffer.write(content)
+    logger.info("[POST /meals/audio] Uploading meal audio for user %s (email: %s)", current_user.id, current_user.email)
+    logger.debug("[POST /meals/audio] File: %s, content_type: %s", audio.filename, audio.content_type)
+    stored = await store_blob(audio, "audio", upload_extension(audio, "m4a"), db)
+    db.commit()
 
-    logger.info(f"[POST /meals/audio] Audio saved to {file_path} ({len(content)} bytes)")
-    return {"audio_path": relative_path}
+    logger.info("[POST /meals/audio] Audio saved to %s (%s bytes)", stored.path, stored.size)
+    return {"audio_path": stored.path}
 
 @app.get("/static/{file_path:path}")
-def get_static_file(file_path: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_static_file(
+    request: Request,
+    file_path: str,
+    size: Optional[str] = None,
+    uid: Optional[int] = None,
+    exp: Optional[int] = None,
+    sig: Optional[str] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_read_db)
+):
     """Serve static files only if they belong to the authenticated user.
 
-    Currently we only store meal images under data/meal_images/ and audios under data/meal_audios/.
+    Signed URLs from ``GET /meals`` (``uid``/``exp``/``sig``) are verified with
+    an HMAC and need no database access; otherwise a bearer token is required
+    and ownership is checked against the user's meals.
+
+    ``?size=thumb|medium`` serves the downscaled JPEG generated at ingest
+    instead of the original image. Supports ETag/If-None-Match (304) and
+    single byte ranges (206).
+
+    Meal media lives in the content-addressed store under data/blobs/; legacy
+    uploads may still be under data/meal_images/ and data/meal_audios/.
     """
-    logger.info(f"[GET /static/{file_path}] Serving static file for user {current_user.id} (email: {current_user.email})")
-    
     # Prevent directory traversal
     if ".." in file_path or file_path.startswith("/"):
-        logger.warning(f"[GET /static/{file_path}] Directory traversal attempt detected for user {current_user.id}")
+        logger.warning("[GET /static/%s] Directory traversal attempt detected", file_path)
         raise HTTPException(status_code=400, detail="Invalid path")
 
     # Only allow access to meal images + audios via this endpoint
-    if not (file_path.startswith("meal_images/") or file_path.startswith("meal_audios/")):
-        logger.warning(f"[GET /static/{file_path}] Unauthorized file type access attempt for user {current_user.id}")
+    if not file_path.startswith(("blobs/", "meal_images/", "meal_audios/")) or file_path.startswith("blobs/tmp/"):
+        logger.warning("[GET /static/%s] Unauthorized file type access attempt", file_path)
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    # Authorization: ensure this file_path belongs to one of the user's meals
-    meal = db.query(Meal).filter(
-        Meal.user_id == current_user.id,
-        (Meal.image_path == file_path) | (Meal.audio_path == file_path)
-    ).first()
-    if not meal:
-        logger.warning(f"[GET /static/{file_path}] File not found or not owned by user {current_user.id}")
-        raise HTTPException(status_code=404, detail="File not found")
+    if sig is not None and uid is not None and exp is not None and verify_media_signature(file_path, uid, exp, sig):
+        user_id = uid
+    elif token is not None:
+        current_user = resolve_user(token, db)
+        user_id = current_user.id
+        # Authorization: ensure this file_path belongs to one of the user's meals
+        meal = db.query(Meal.id).filter(
+            Meal.user_id == current_user.id,
+            (Meal.image_path == file_path) | (Meal.audio_path == file_path)
+        ).first()
+        if not meal:
+            logger.warning("[GET /static/%s] File not found or not owned by user %s", file_path, current_user.id)
+            raise HTTPException(status_code=404, detail="File not found")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    logger.debug("[GET /static/%s] Serving static file for user %s", file_path, user_id)
 
     full_path = os.path.join("data", file_path)
     if not os.path.exists(full_path):
-        logger.error(f"[GET /static/{file_path}] File exists in DB but not on disk for user {current_user.id}")
+        logger.error("[GET /static/%s] File exists in DB but not on disk for user %s", file_path, user_id)
         raise HTTPException(status_code=404, detail="File not found")
 
-    logger.debug(f"[GET /static/{file_path}] Serving file successfully for user {current_user.id}")
-    return FileResponse(full_path)
-
-def check_quota_and_update(user: User, db: Session) -> bool:
-    now = time.time()
-    today = date.today()
-    
-    # 1. Check if we need to reset for a new day
-    if user.last_reset_date != today:
-        user.quota_count = 0
-        user.last_reset_date = today
-        # We don't return here, we proceed to check limits (it will be 0)
-        
-    # 2. Check Daily Limit
-    if user.quota_count >= MAX_REQUESTS_PER_DAY:
-        return False # Denied
-        
-    # 3. Check Minute Limit
-    timestamps = user_request_timestamps[user.id]
-    valid_timestamps = [t for t in timestamps if now - t < 60]
-    user_request_timestamps[user.id] = valid_timestamps # Cleanup
-    
-    if len(valid_timestamps) >= MAX_REQUESTS_PER_MINUTE:
-        return False # Denied
-
-    # 4. Increment request
-    user.quota_count += 1
-    db.commit()
-    
-    user_request_timestamps[user.id].append(now)
-    return True
-    return True # Allowed
+    if size is not None:
+        if size not in ("thumb", "medium"):
+            raise HTTPException(status_code=400, detail="size must be 'thumb' or 'medium'")
+        if (mimetypes.guess_type(full_path)[0] or "").startswith("image/"):
+            variant_path = derivative_path(full_path, size)
+            if not os.path.exists(variant_path):
+                # Uploaded before derivatives existed; build them once now
+                try:
+                    generate_image_derivatives(full_path)
+                except Exception as e:
+                    logger.warning("[GET /static/%s] Could not build %s derivative: %s", file_path, size, e)
+            if os.path.exists(variant_path):
+                full_path = variant_path
+
+    # Meal media never changes after upload: strong ETag + immutable caching, Range for audio seeking
+    return media_response(request, full_path)
+
+async def generate_derivatives(image_path: str, variants=tuple(IMAGE_DERIVATIVES)):
+    """Builds the VLM/medium/thumb JPEGs for a freshly ingested image.
+
+    Best effort: if the upload can't be decoded we keep serving the original.
+    """
+    try:
+        await media_pool.run(generate_image_derivatives, image_path, variants)
+    except MediaPoolBusy:
+        raise
+    except Exception as e:
+        logger.warning("[Derivatives] Could not generate %s for %s: %s", variants, image_path, e)
 
 @app.post("/api/track-meal")
 async def track_meal(
     image: UploadFile = File(...),
     audio: Optional[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    work_dir: str = Depends(scratch_dir)
 ):
-    logger.info(f"Processing track_meal for user {current_user.id}")
-    
-    # Quota Check
-    if not check_quota_and_update(current_user, db):
-        logger.warning(f"User {current_user.id} exceeded daily quota")
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Daily limit reached."
-        )
+    logger.info("Processing track_meal for user %s", current_user.id)
+
+    stored_image = await store_upload(image, os.path.join(work_dir, f"image.{upload_extension(image, 'jpg')}"), "image")
+    stored_audio = None
+    if audio:
+        stored_audio = await store_upload(audio, os.path.join(work_dir, f"audio.{upload_extension(audio, 'm4a')}"), "audio")
+    user_goal_info = get_user_goal_context(current_user)
+
+    # Retries of the same upload are served from the cache without touching quota
+    vlm_cache_key = cache_key(
+        stored_image.sha256, VLM_MODEL, user_goal_info,
+        audio_sha256=stored_audio.sha256 if stored_audio else None
+    )
+    cached = await run_in_threadpool(vlm_cache.get, vlm_cache_key, db)
+    if cached is not None:
+        logger.info("[VlmCache] Hit for track_meal (user %s)", current_user.id)
+        return cached["structured_meal"]
+
+    # Quota Check (the SQLite backend reads and commits; keep it off the event loop)
+    await run_in_threadpool(enforce_quota, current_user.id, "track_meal")
 
     transcript = ""
     
@@ -746,28 +1154,28 @@ async def track_meal(
         whisper_key = os.getenv("WHISPER_API_KEY", "1234")
         
         try:
-            audio_content = await audio.read()
-            files = {'file': (audio.filename, audio_content, audio.content_type)}
             headers = {"X-API-Key": whisper_key}
-            
-            logger.info(f"Calling Whisper API at {whisper_url}")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(whisper_url, headers=headers, files=files, data={"language": "en"})
-                
+
+            logger.info("Calling Whisper API at %s", whisper_url)
+            with open(stored_audio.path, "rb") as audio_file, track_upstream(WHISPER, "whisper") as call:
+                files = {'file': (audio.filename, audio_file, audio.content_type)}
+                response = await upstreams.client(WHISPER).post(whisper_url, headers=headers, files=files, data={"language": "en"})
+                call.status(response.status_code)
+
             if response.status_code == 200:
                 result = response.json()
                 transcript = result.get("text", "")
-                logger.info(f"Transcription successful: {transcript[:50]}...")
+                logger.info("Transcription successful: %.50s...", transcript)
             else:
-                logger.error(f"Whisper API Error: {response.status_code} - {response.text}")
+                logger.error("Whisper API Error: %s - %s", response.status_code, response.text)
                 # We continue even if whisper fails, just without transcript
         except Exception as e:
-            logger.error(f"Whisper Exception: {e}", exc_info=True)
+            logger.error("Whisper Exception: %s", e, exc_info=True)
 
     # 2. Handle Image (VLM)
     api_key = os.getenv("OPENROUTER_API_KEY")
     base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
-    model = "qwen/qwen3-vl-235b-a22b-instruct"
+    model = VLM_MODEL
     
     if not api_key or not base_url:
          logger.critical("Missing OpenRouter credentials")
@@ -775,8 +1183,8 @@ async def track_meal(
 
     try:
         logger.info("Processing image for VLM analysis")
-        image_content = await image.read()
-        base64_image = base64.b64encode(image_content).decode('utf-8')
+        await generate_derivatives(stored_image.path, ("vlm",))
+        base64_image = await media_pool.run(prepare_vlm_image, stored_image.path)
         
         json_schema_template = """
         {
@@ -823,7 +1231,6 @@ RULES:
 
 Return *only* the JSON object and nothing else."""
 
-        user_goal_info = get_user_goal_context(current_user)
         if user_goal_info:
             prompt_text += f"\n\nUser Profile & Goals:\n{user_goal_info}"
 
@@ -864,12 +1271,13 @@ Return *only* the JSON object and nothing else."""
             "max_tokens": 2048
         }
         
-        logger.info(f"Calling VLM API at {base_url}")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{base_url}/chat/completions", headers=headers, json=payload, timeout=60.0)
-            
+        logger.info("Calling VLM API at %s", base_url)
+        with track_upstream(OPENROUTER, model) as call:
+            response = await upstreams.client(OPENROUTER).post(f"{base_url}/chat/completions", headers=headers, json=payload)
+            call.status(response.status_code)
+
         if response.status_code != 200:
-             logger.error(f"AI Provider Error: {response.status_code} - {response.text}")
+             logger.error("AI Provider Error: %s - %s", response.status_code, response.text)
              raise HTTPException(status_code=500, detail=f"AI Provider Error: {response.text}")
              
         ai_result = response.json()
@@ -881,11 +1289,13 @@ Return *only* the JSON object and nothing else."""
             content = content.split("```json")[1].split("```")[0].strip()
         elif "```" in content:
             content = content.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(content)
+
+        structured_meal = json.loads(content)
+        run_in_background(_cache_vlm_result, vlm_cache_key, structured_meal, transcript)
+        return structured_meal
 
     except Exception as e:
-        logger.error(f"VLM Exception: {e}", exc_info=True)
+        logger.error("VLM Exception: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 async def transcribe_audio(audio_path: str, content_type: str = "audio/wav"):
@@ -897,46 +1307,52 @@ async def transcribe_audio(audio_path: str, content_type: str = "audio/wav"):
     is_converted = False
     if not audio_path.lower().endswith(".wav"):
         try:
-            logger.info(f"Converting {audio_path} to WAV")
-            audio = AudioSegment.from_file(audio_path)
-            # Set to 16kHz, mono, 16-bit as recommended by Whisper
-            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-            wav_path = os.path.splitext(audio_path)[0] + ".wav"
-            audio.export(wav_path, format="wav")
+            logger.info("Converting %s to WAV", audio_path)
+            # Convert into scratch space so the blob store only holds uploads
+            os.makedirs("data/temp/whisper", exist_ok=True)
+            wav_path = await media_pool.run(convert_audio_to_wav, audio_path, f"data/temp/whisper/{uuid.uuid4().hex}.wav")
             is_converted = True
-            logger.info(f"Converted to {wav_path}")
+            logger.info("Converted to %s", wav_path)
         except Exception as e:
-            logger.error(f"Failed to convert audio: {e}")
+            logger.error("Failed to convert audio: %s", e)
             # Fallback to original file if conversion fails
             pass
 
     start_time = time.time()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Determine correct mime type
-            mime_type = "audio/wav" if is_converted or wav_path.lower().endswith(".wav") else content_type
-            
-            with open(wav_path, "rb") as f:
-                files = {'file': (os.path.basename(wav_path), f, mime_type)}
-                headers = {"X-API-Key": whisper_key}
-                
-                logger.info(f"[ExternalAPI] Calling Whisper API at {whisper_url} with mime_type={mime_type}")
+        client = upstreams.client(WHISPER)
+        # Determine correct mime type
+        mime_type = "audio/wav" if is_converted or wav_path.lower().endswith(".wav") else content_type
+
+        with open(wav_path, "rb") as f:
+            files = {'file': (os.path.basename(wav_path), f, mime_type)}
+            headers = {"X-API-Key": whisper_key}
+
+            logger.info("[ExternalAPI] Calling Whisper API at %s with mime_type=%s", whisper_url, mime_type)
+            with track_upstream(WHISPER, "whisper") as call:
                 response = await client.post(whisper_url, headers=headers, files=files, data={"language": "en"})
+                call.status(response.status_code)
                 
         duration = time.time() - start_time
-        logger.info(f"[ExternalAPI] Whisper took {duration:.2f}s")
+        logger.info("[ExternalAPI] Whisper took %.2fs", duration)
         
         if response.status_code == 200:
             result = response.json()
             return result.get("text", ""), result
         else:
-            logger.error(f"Whisper API Error: {response.status_code} - {response.text}")
+            logger.error("Whisper API Error: %s - %s", response.status_code, response.text)
             return "", {"error": response.text, "status_code": response.status_code}
             
     except Exception as e:
         duration = time.time() - start_time
-        logger.error(f"[ExternalAPI] Whisper failed after {duration:.2f}s: {e}")
+        logger.error("[ExternalAPI] Whisper failed after %.2fs: %s", duration, e)
         return "", {"error": str(e)}
+    finally:
+        if is_converted:
+            try:
+                os.remove(wav_path)
+            except OSError:
+                pass
 
 def get_user_goal_context(user: User) -> str:
     context_parts = []
@@ -954,34 +1370,17 @@ def get_user_goal_context(user: User) -> str:
          
     return "\n".join(context_parts)
 
-async def analyze_image_vlm(image_path: str, context: str = "", user_goal_info: str = ""):
+async def analyze_image_vlm(image_path: str, context: str = "", user_goal_info: str = "", base64_image: Optional[str] = None):
     api_key = os.getenv("OPENROUTER_API_KEY")
     base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
-    model = "qwen/qwen3-vl-235b-a22b-instruct"
+    model = VLM_MODEL
 
     if not api_key or not base_url:
          raise Exception("Missing OpenRouter credentials")
 
-    # Resize image if needed
-    try:
-        file_size = os.path.getsize(image_path)
-        if file_size > 2 * 1024 * 1024: # 2MB
-            logger.info(f"Image size {file_size} bytes > 2MB. Resizing...")
-            with Image.open(image_path) as img:
-                img.thumbnail((1024, 1024))
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=85)
-                image_content = buffer.getvalue()
-        else:
-            with open(image_path, "rb") as f:
-                image_content = f.read()
-    except Exception as e:
-        logger.warning(f"Image processing failed: {e}. Using original file.")
-        with open(image_path, "rb") as f:
-            image_content = f.read()
+    if base64_image is None:
+        base64_image = await media_pool.run(prepare_vlm_image, image_path)
 
-    base64_image = base64.b64encode(image_content).decode('utf-8')
-    
     json_schema_template = """
     {
       "success": true,
@@ -1066,19 +1465,20 @@ Return *only* the JSON object and nothing else."""
         "max_tokens": 2048
     }
     
-    logger.info(f"[ExternalAPI] Calling VLM API at {base_url}")
-    logger.info(f"Prompt (truncated): {prompt_text[:500]}...")
-    logger.debug(f"Full Prompt: {prompt_text}")
+    logger.info("[ExternalAPI] Calling VLM API at %s", base_url)
+    logger.info("Prompt (truncated): %.500s...", prompt_text)
+    logger.debug("Full Prompt: %s", prompt_text)
     
     start_time = time.time()
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(f"{base_url}/chat/completions", headers=headers, json=payload)
+    with track_upstream(OPENROUTER, model) as call:
+        response = await upstreams.client(OPENROUTER).post(f"{base_url}/chat/completions", headers=headers, json=payload)
+        call.status(response.status_code)
     
     duration = time.time() - start_time
-    logger.info(f"[ExternalAPI] VLM took {duration:.2f}s")
+    logger.info("[ExternalAPI] VLM took %.2fs", duration)
         
     if response.status_code != 200:
-         logger.error(f"AI Provider Error: {response.status_code} - {response.text}")
+         logger.error("AI Provider Error: %s - %s", response.status_code, response.text)
          return {"error": response.text}, response.json() if response.headers.get("content-type") == "application/json" else response.text, prompt_text
          
     ai_result = response.json()
@@ -1097,96 +1497,437 @@ Return *only* the JSON object and nothing else."""
         logger.info("[Parser] Successfully extracted JSON")
         return json_obj, ai_result, prompt_text
     except Exception as e:
-        logger.error(f"[Parser] Failed to parse JSON: {e}")
-        logger.debug(f"Raw content: {content}")
+        logger.error("[Parser] Failed to parse JSON: %s", e)
+        logger.debug("Raw content: %s", content)
         return {"error": "Failed to parse JSON", "raw": content}, ai_result, prompt_text
 
+def _reuse_analysis(log_entry: AnalysisLog, db: Session, request_start_time: float, transcription: str, structured_meal: str, raw_note: dict) -> dict:
+    """Completes ``log_entry`` with an earlier result (cache hit / near-duplicate)."""
+    log_entry.transcription_text = transcription
+    log_entry.vlm_raw_response = json.dumps(raw_note)
+    log_entry.structured_meal = structured_meal
+    log_entry.status = AnalysisStatus.SUCCESS.value
+    log_entry.attempts = (log_entry.attempts or 0) + 1
+    log_entry.processing_duration_ms = int((time.time() - request_start_time) * 1000)
+    db.commit()
+    return {
+        "analysis_id": log_entry.id,
+        "transcription": transcription or "",
+        "structured_meal": json.loads(structured_meal)
+    }
+
+async def find_reusable_analysis(
+    log_entry: AnalysisLog,
+    user: User,
+    db: Session,
+    image_sha256: str,
+    audio_sha256: Optional[str],
+    request_start_time: float
+):
+    """Checks the VLM cache and the near-duplicate index for ``log_entry``.
+
+    Returns ``(result, keys)``: ``result`` is the finished response when an
+    earlier analysis could be reused (the log is already marked SUCCESS),
+    otherwise None. ``keys`` are needed to record the new result afterwards.
+    """
+    user_goal_info = get_user_goal_context(user)
+    context_text = log_entry.context_text
+    keys = {
+        "cache_key": cache_key(image_sha256, VLM_MODEL, user_goal_info, context_text, audio_sha256),
+        "context_hash": context_digest(VLM_MODEL, user_goal_info, context_text, audio_sha256),
+        "dhash": None,
+    }
+
+    cached = await run_in_threadpool(vlm_cache.get, keys["cache_key"], db)
+    if cached is not None:
+        logger.info("[VlmCache] Hit for analysis %s (user %s)", log_entry.id, user.id)
+        result = await run_in_threadpool(
+            _reuse_analysis, log_entry, db, request_start_time, cached["transcription"],
+            json.dumps(cached["structured_meal"]), {"cache_hit": True, "cache_key": keys["cache_key"]}
+        )
+        return result, keys
+
+    # Near-duplicate photo (re-take / recompressed copy) with the same context?
+    if PHASH_ENABLED:
+        try:
+            keys["dhash"] = await media_pool.run(dhash, log_entry.image_path)
+        except Exception as e:
+            logger.warning("[Fingerprint] Could not hash image for analysis %s: %s", log_entry.id, e)
+
+    if keys["dhash"] is not None:
+        match, source = await run_in_threadpool(_near_duplicate_source, user.id, keys, db)
+        if source is not None and source.structured_meal:
+            logger.info("[Fingerprint] Analysis %s reuses %s (distance=%s)", log_entry.id, source.id, match[1])
+            result = await run_in_threadpool(
+                _reuse_analysis, log_entry, db, request_start_time, source.transcription_text,
+                source.structured_meal, {"near_duplicate_of": source.id, "distance": match[1]}
+            )
+            return result, keys
+
+    return None, keys
+
+def _near_duplicate_source(user_id: int, keys: dict, db: Session):
+    """(match, finished AnalysisLog or None) for the closest earlier photo of this user."""
+    match = fingerprints.find(user_id, keys["dhash"], keys["context_hash"], db)
+    if not match:
+        return None, None
+    source = db.query(AnalysisLog).filter(
+        AnalysisLog.id == match[0],
+        AnalysisLog.user_id == user_id,
+        AnalysisLog.status == AnalysisStatus.SUCCESS.value
+    ).first()
+    return match, source
+
+_background_tasks = set()
+
+def run_in_background(func, *args):
+    """Runs a blocking ``func`` in a thread without holding up the response."""
+    task = asyncio.create_task(asyncio.to_thread(func, *args))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def _timed(timings: dict, stage: str, awaitable):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = int((time.perf_counter() - start) * 1000)
+
+def _cache_vlm_result(key: str, structured_meal: dict, transcript: str):
+    """Stores a track_meal result in the VLM cache after the response has gone out."""
+    db = SessionLocal()
+    try:
+        vlm_cache.put(key, VLM_MODEL, structured_meal, transcript, db)
+    except Exception as e:
+        logger.warning("Failed to cache track_meal result %s: %s", key[:12], e)
+    finally:
+        db.close()
+
+def _record_analysis_result(user_id: int, analysis_id: str, keys: dict, structured_meal: dict, transcript: str):
+    """Fills the VLM cache / fingerprint index; not needed for the response itself."""
+    db = SessionLocal()
+    try:
+        vlm_cache.put(keys["cache_key"], VLM_MODEL, structured_meal, transcript, db)
+        if keys["dhash"] is not None:
+            fingerprints.add(user_id, analysis_id, keys["dhash"], keys["context_hash"], db)
+    except Exception as e:
+        logger.warning("Failed to record analysis %s for reuse: %s", analysis_id, e)
+    finally:
+        db.close()
+
+async def prepare_analysis_image(image_path: str) -> str:
+    """Builds only the ``vlm`` derivative and returns it base64-encoded.
+
+    thumb/medium are left to ``GET /static?size=`` so they stay off the analysis path.
+    """
+    await generate_derivatives(image_path, ("vlm",))
+    return await media_pool.run(prepare_vlm_image, image_path)
+
+async def execute_analysis(
+    log_entry: AnalysisLog,
+    user: User,
+    db: Session,
+    keys: dict,
+    request_start_time: float,
+    audio_content_type: Optional[str] = None
+) -> dict:
+    """Runs Whisper + VLM for an ingested analysis and finalizes its log entry.
+
+    Transcription and image preparation run concurrently since only the VLM
+    call needs the transcript, so latency is ~max(transcribe, image prep) + VLM.
+    Per-stage timings are returned in ``timings_ms``.
+
+    Marks the log as FAILURE and re-raises on unexpected errors.
+    """
+    timings = {}
+    try:
+        # 2. Transcribe || prepare image
+        transcript = ""
+        raw_whisper = None
+        image_task = asyncio.create_task(
+            _timed(timings, "image_prep", prepare_analysis_image(log_entry.image_path))
+        )
+        if log_entry.audio_path:
+            try:
+                transcript, raw_whisper = await _timed(
+                    timings, "transcribe", transcribe_audio(log_entry.audio_path, audio_content_type or "audio/wav")
+                )
+            except BaseException:
+                image_task.cancel()
+                raise
+        base64_image = await image_task
+
+        # 3. VLM Analysis
+        full_context = ""
+        if transcript:
+            full_context += f"Additional Context from Audio Note: {transcript}\n"
+        if log_entry.context_text:
+            full_context += f"Additional Context from User Description: {log_entry.context_text}\n"
+
+        user_goal_info = get_user_goal_context(user)
+        vlm_response, raw_vlm, prompt_used = await _timed(
+            timings, "vlm", analyze_image_vlm(log_entry.image_path, full_context, user_goal_info, base64_image)
+        )
+
+        # 4. Finalize (single commit, run off the event loop)
+        if log_entry.audio_path:
+            log_entry.transcription_text = transcript
+            log_entry.transcription_raw_response = json.dumps(raw_whisper) if raw_whisper else None
+        log_entry.vlm_request_prompt = prompt_used
+        log_entry.vlm_raw_response = json.dumps(raw_vlm) if raw_vlm else None
+        if "error" in vlm_response:
+             log_entry.status = AnalysisStatus.FAILURE.value
+        else:
+             log_entry.status = AnalysisStatus.SUCCESS.value
+             log_entry.structured_meal = json.dumps(vlm_response)
+
+        log_entry.processing_duration_ms = int((time.time() - request_start_time) * 1000)
+        await _timed(timings, "persist", asyncio.to_thread(db.commit))
+        timings["total"] = int((time.time() - request_start_time) * 1000)
+        logger.info("[Analysis] %s stage timings (ms): %s", log_entry.id, timings)
+
+        if "error" not in vlm_response:
+            run_in_background(_record_analysis_result, user.id, log_entry.id, keys, vlm_response, transcript)
+        
+        return {
+            "analysis_id": log_entry.id,
+            "transcription": transcript,
+            "structured_meal": vlm_response,
+            "timings_ms": timings
+        }
+        
+    except Exception as e:
+        logger.error("Analysis %s failed: %s", log_entry.id, e, exc_info=True)
+        db.rollback()
+        log_entry.status = AnalysisStatus.FAILURE.value
+        log_entry.processing_duration_ms = int((time.time() - request_start_time) * 1000)
+        db.commit()
+        raise
+
+def claim_analysis(db: Session, log_entry: AnalysisLog) -> bool:
+    """Atomically bumps ``attempts`` so only one worker/process runs an analysis."""
+    seen = log_entry.attempts or 0
+    claimed = db.query(AnalysisLog).filter(
+        AnalysisLog.id == log_entry.id,
+        AnalysisLog.status == AnalysisStatus.PENDING.value,
+        func.coalesce(AnalysisLog.attempts, 0) == seen
+    ).update({AnalysisLog.attempts: seen + 1}, synchronize_session=False)
+    db.commit()
+    db.refresh(log_entry)
+    return claimed == 1
+
+async def run_analysis_job(analysis_id: str, payload: Optional[dict] = None):
+    """Job-queue handler: runs one queued (or recovered) analysis with its own session."""
+    db = SessionLocal()
+    try:
+        log_entry = db.query(AnalysisLog).filter(AnalysisLog.id == analysis_id).first()
+        if log_entry is None or log_entry.status != AnalysisStatus.PENDING.value:
+            return
+        if (log_entry.attempts or 0) >= ANALYSIS_JOB_MAX_ATTEMPTS:
+            logger.error("[Jobs] Analysis %s exceeded %s attempts, giving up", analysis_id, ANALYSIS_JOB_MAX_ATTEMPTS)
+            log_entry.status = AnalysisStatus.FAILURE.value
+            db.commit()
+            return
+        if not claim_analysis(db, log_entry):
+            logger.info("[Jobs] Analysis %s already claimed elsewhere", analysis_id)
+            return
+
+        user = db.query(User).filter(User.id == log_entry.user_id).first()
+        if user is None:
+            log_entry.status = AnalysisStatus.FAILURE.value
+            db.commit()
+            return
+
+        # Measure from ingest so queueing time shows up in processing_duration_ms
+        start_time = (log_entry.timestamp - datetime(1970, 1, 1)).total_seconds() if log_entry.timestamp else time.time()
+        payload = payload or {}
+        keys = payload.get("keys")
+        if keys is None:
+            # Recovered job: rebuild the cache keys from the stored files
+            image_sha256 = await asyncio.to_thread(file_sha256, log_entry.image_path)
+            audio_sha256 = None
+            if log_entry.audio_path:
+                audio_sha256 = await asyncio.to_thread(file_sha256, log_entry.audio_path)
+            result, keys = await find_reusable_analysis(log_entry, user, db, image_sha256, audio_sha256, start_time)
+            if result is not None:
+                return
+
+        audio_content_type = payload.get("audio_content_type")
+        if audio_content_type is None and log_entry.audio_path:
+            audio_content_type = mimetypes.guess_type(log_entry.audio_path)[0]
+        try:
+            await execute_analysis(log_entry, user, db, keys, start_time, audio_content_type)
+        except Exception:
+            # Already logged and recorded as FAILURE
+            pass
+    finally:
+        db.close()
+
+def recover_pending_analyses():
+    """Re-enqueues analyses left PENDING by a crash/restart."""
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=ANALYSIS_JOB_STALE_SECONDS)
+        pending = db.query(AnalysisLog.id).filter(
+            AnalysisLog.status == AnalysisStatus.PENDING.value,
+            # Never started, or started long enough ago that the worker must be gone
+            (func.coalesce(AnalysisLog.attempts, 0) == 0) | (AnalysisLog.timestamp < stale_before)
+        ).order_by(AnalysisLog.timestamp).all()
+        recovered = sum(1 for (analysis_id,) in pending if analysis_jobs.submit(analysis_id))
+        if pending:
+            logger.warning("[Jobs] Recovered %s/%s pending analyses", recovered, len(pending))
+    finally:
+        db.close()
+
+def _insert_analysis_log(db: Session, log_entry: AnalysisLog):
+    db.add(log_entry)
+    add_ref(db, log_entry.image_path)
+    add_ref(db, log_entry.audio_path)
+    db.commit()
+
 @app.post("/api/analyze")
 async def analyze_meal(
     image: UploadFile = File(...),
     audio: Optional[UploadFile] = File(None),
     context_text: Optional[str] = Form(None),
     client_timestamp: Optional[str] = Form(None),
+    mode: str = "sync",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Analyze a meal photo (+ optional voice note).
+
+    ``mode=sync`` (default) answers with the result. ``mode=async`` returns
+    ``202`` right after ingest; poll ``GET /api/analyze/{analysis_id}`` or
+    stream ``GET /api/analyze/{analysis_id}/events`` for the result.
+    """
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
+
     request_start_time = time.time()
     analysis_id = str(uuid.uuid4())
     
-    # 1. Ingest & Store
-    # Save files
-    os.makedirs(f"data/temp/{current_user.id}", exist_ok=True)
-    
-    image_ext = image.filename.split(".")[-1] if "." in image.filename else "jpg"
-    image_path = f"data/temp/{current_user.id}/{analysis_id}.{image_ext}"
-    
-    with open(image_path, "wb") as buffer:
-        content = await image.read()
-        buffer.write(content)
-        
+    # 1. Ingest & Store (streamed into the blob store, hashed on the way)
+    stored_image = await store_blob(image, "image", upload_extension(image, "jpg"), db)
+    image_path = f"data/{stored_image.path}"
+
     audio_path = None
+    stored_audio = None
     if audio:
-        audio_ext = audio.filename.split(".")[-1] if "." in audio.filename else "mp3"
-        audio_path = f"data/temp/{current_user.id}/{analysis_id}.{audio_ext}"
-        with open(audio_path, "wb") as buffer:
-            audio_content = await audio.read()
-            buffer.write(audio_content)
-            
+        stored_audio = await store_blob(audio, "audio", upload_extension(audio, "mp3"), db)
+        audio_path = f"data/{stored_audio.path}"
+
+
     # Create Log
     log_entry = AnalysisLog(
         id=analysis_id,
         user_id=current_user.id,
         image_path=image_path,
         audio_path=audio_path,
+        context_text=context_text,
         status=AnalysisStatus.PENDING.value
     )
-    db.add(log_entry)
-    db.commit()
-    
+    # Like the persist step, the writes (and their wait for the write lock) run off the event loop
+    await asyncio.to_thread(_insert_analysis_log, db, log_entry)
+
+    result, keys = await find_reusable_analysis(
+        log_entry, current_user, db, stored_image.sha256,
+        stored_audio.sha256 if stored_audio else None, request_start_time
+    )
+
+    if mode == "async":
+        if result is None and not analysis_jobs.submit(analysis_id, {
+            "keys": keys,
+            "audio_content_type": audio.content_type if audio else None
+        }):
+            log_entry.status = AnalysisStatus.FAILURE.value
+            await asyncio.to_thread(db.commit)
+            raise HTTPException(status_code=503, detail="Analysis queue is full, try again later")
+        return JSONResponse(status_code=202, content=analysis_status_payload(log_entry))
+
+    if result is not None:
+        return result
+
+    # Keep startup recovery from picking this one up while we run it inline
+    await asyncio.to_thread(claim_analysis, db, log_entry)
     try:
-        # 2. Transcribe
-        transcript = ""
-        if audio_path:
-            transcript, raw_whisper = await transcribe_audio(audio_path, audio.content_type if audio else "audio/wav")
-            log_entry.transcription_text = transcript
-            log_entry.transcription_raw_response = json.dumps(raw_whisper) if raw_whisper else None
-            db.commit()
-            
-        # 3. VLM Analysis
-        full_context = ""
-        if transcript:
-            full_context += f"Additional Context from Audio Note: {transcript}\n"
-        if context_text:
-            full_context += f"Additional Context from User Description: {context_text}\n"
-            
-        user_goal_info = get_user_goal_context(current_user)
-        vlm_response, raw_vlm, prompt_used = await analyze_image_vlm(image_path, full_context, user_goal_info)
-        
-        log_entry.vlm_request_prompt = prompt_used
-        log_entry.vlm_raw_response = json.dumps(raw_vlm) if raw_vlm else None
-        
-        # 4. Finalize
-        if "error" in vlm_response:
-             log_entry.status = AnalysisStatus.FAILURE.value
-        else:
-             log_entry.status = AnalysisStatus.SUCCESS.value
-             
-        log_entry.processing_duration_ms = int((time.time() - request_start_time) * 1000)
-        db.commit()
-        
-        return {
-            "analysis_id": analysis_id,
-            "transcription": transcript,
-            "structured_meal": vlm_response
-        }
-        
+        return await execute_analysis(
+            log_entry, current_user, db, keys, request_start_time,
+            audio.content_type if audio else None
+        )
     except Exception as e:
-        logger.error(f"Analysis failed: {e}", exc_info=True)
-        log_entry.status = AnalysisStatus.FAILURE.value
-        log_entry.processing_duration_ms = int((time.time() - request_start_time) * 1000)
-        db.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
+def analysis_status_payload(log_entry: AnalysisLog) -> dict:
+    payload = {
+        "analysis_id": log_entry.id,
+        "status": log_entry.status,
+        "status_url": f"/api/analyze/{log_entry.id}",
+        "events_url": f"/api/analyze/{log_entry.id}/events",
+    }
+    if log_entry.status != AnalysisStatus.PENDING.value:
+        payload["transcription"] = log_entry.transcription_text or ""
+        payload["structured_meal"] = json.loads(log_entry.structured_meal) if log_entry.structured_meal else None
+        payload["processing_duration_ms"] = log_entry.processing_duration_ms
+    return payload
+
+def get_user_analysis(analysis_id: str, user_id: int, db: Session) -> AnalysisLog:
+    log_entry = db.query(AnalysisLog).filter(
+        AnalysisLog.id == analysis_id,
+        AnalysisLog.user_id == user_id
+    ).first()
+    if log_entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return log_entry
+
+@app.get("/api/analyze/{analysis_id}")
+def get_analysis(analysis_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    return analysis_status_payload(get_user_analysis(analysis_id, current_user.id, db))
+
+def _authorize_analysis_stream(token: str, analysis_id: str) -> int:
+    """Resolves the user and checks ownership; the session is closed before streaming starts."""
+    db = SessionLocal()
+    try:
+        user_id = resolve_user(token, db).id
+        get_user_analysis(analysis_id, user_id, db)
+        return user_id
+    finally:
+        db.close()
+
+@app.get("/api/analyze/{analysis_id}/events")
+async def stream_analysis(analysis_id: str, token: str = Depends(oauth2_scheme)):
+    """Server-sent events: one ``status`` event now, another when the analysis finishes.
+
+    Holds no database session while streaming; each poll opens a short one.
+    """
+    user_id = await run_in_threadpool(_authorize_analysis_stream, token, analysis_id)
+
+    async def events():
+        deadline = time.time() + ANALYSIS_SSE_MAX_SECONDS
+        while True:
+            poll_db = SessionLocal()
+            try:
+                log_entry = get_user_analysis(analysis_id, user_id, poll_db)
+                payload = analysis_status_payload(log_entry)
+            finally:
+                poll_db.close()
+
+            yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            if payload["status"] != AnalysisStatus.PENDING.value or time.time() > deadline:
+                analysis_jobs.forget(analysis_id)
+                return
+
+            # Woken immediately if the job runs in this process; otherwise re-poll the DB
+            finished = await analysis_jobs.wait(analysis_id, ANALYSIS_SSE_POLL_SECONDS)
+            if not finished:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 
@@ -1232,13 +1973,11 @@ async def suggest_meals(
         user_id = current_user.id
         today = date.today()
 
-        logger.info(f"[Meal Suggestion] User={user_id} (type={type(user_id).__name__}) Date={today}")
-        logger.info(f"[Meal Suggestion] Request: calories={request.remaining_calories}, "
-                   f"protein={request.remaining_protein}, carbs={request.remaining_carbs}, "
-                   f"fat={request.remaining_fat}, last_meal={request.last_meal}")
+        logger.info("[Meal Suggestion] User=%s (type=%s) Date=%s", user_id, type(user_id).__name__, today)
+        logger.info("[Meal Suggestion] Request: calories=%s, protein=%s, carbs=%s, fat=%s, last_meal=%s", request.remaining_calories, request.remaining_protein, request.remaining_carbs, request.remaining_fat, request.last_meal)
 
         # 1️⃣ Check if today's suggestions already exist
-        logger.info(f"[Meal Suggestion] Querying DB for existing suggestions...")
+        logger.info("[Meal Suggestion] Querying DB for existing suggestions...")
         existing = (
             db.query(DailyMealSuggestion)
             .filter(DailyMealSuggestion.user_id == user_id,
@@ -1247,7 +1986,7 @@ async def suggest_meals(
         )
 
         if existing:
-            logger.info(f"[Meal Suggestion] Found {len(existing)} cached suggestions")
+            logger.info("[Meal Suggestion] Found %s cached suggestions", len(existing))
 
             def build(meal_type):
                 m = next(x for x in existing if x.meal_type == meal_type)
@@ -1268,19 +2007,19 @@ async def suggest_meals(
                 "lunch": build("lunch"),
                 "dinner": build("dinner"),
             }
-            logger.info(f"[Meal Suggestion] Returning cached suggestions: {[m['name'] for m in result.values()]}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("[Meal Suggestion] Returning cached suggestions: %s", [m['name'] for m in result.values()])
             return result
 
         # 2️⃣ Generate suggestions via LLM (OpenRouter Gateway)
-        logger.info(f"[Meal Suggestion] No cached suggestions found, generating new ones...")
+        logger.info("[Meal Suggestion] No cached suggestions found, generating new ones...")
         openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
         openrouter_base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
         if not openrouter_api_key or not openrouter_base_url:
             logger.error(
-                "[Meal Suggestion] Missing environment variables: "
-                f"OPENROUTER_API_KEY={bool(openrouter_api_key)}, "
-                f"OPENROUTER_BASE_URL={bool(openrouter_base_url)}"
+                "[Meal Suggestion] Missing environment variables: OPENROUTER_API_KEY=%s, OPENROUTER_BASE_URL=%s",
+                bool(openrouter_api_key), bool(openrouter_base_url),
             )
             raise HTTPException(status_code=500, detail="Server misconfiguration")
 
@@ -1360,40 +2099,41 @@ Output format:
         }
 
         try:
-            logger.info(f"[Meal Suggestion] Calling LLM API...")
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(f"{openrouter_base_url}/chat/completions",
-                                             headers=headers, json=payload)
+            logger.info("[Meal Suggestion] Calling LLM API...")
+            with track_upstream(OPENROUTER, payload["model"]) as call:
+                response = await upstreams.client(OPENROUTER).post(f"{openrouter_base_url}/chat/completions",
+                                                                   headers=headers, json=payload, timeout=30.0)
+                call.status(response.status_code)
 
-            logger.info(f"[Meal Suggestion] LLM API response status: {response.status_code}")
+            logger.info("[Meal Suggestion] LLM API response status: %s", response.status_code)
             if response.status_code != 200:
-                logger.error(f"[Meal Suggestion] LLM API error: {response.text}")
+                logger.error("[Meal Suggestion] LLM API error: %s", response.text)
                 raise HTTPException(status_code=500, detail="LLM API error")
 
             content = response.json()["choices"][0]["message"]["content"]
-            logger.info(f"[Meal Suggestion] LLM raw response (first 200 chars): {content[:200]}")
+            logger.info("[Meal Suggestion] LLM raw response (first 200 chars): %.200s", content)
 
             # Remove code fences if present
             if "```" in content:
                 content = content.split("```")[-2].strip()
-                logger.info(f"[Meal Suggestion] Removed code fences from LLM response")
+                logger.info("[Meal Suggestion] Removed code fences from LLM response")
 
             suggestions: Dict[str, Dict] = json.loads(content)
-            logger.info(f"[Meal Suggestion] Parsed suggestions: {list(suggestions.keys())}")
+            logger.info("[Meal Suggestion] Parsed suggestions: %s", list(suggestions.keys()))
 
         except json.JSONDecodeError as e:
-            logger.error(f"[Meal Suggestion] JSON parsing failed: {e}. Content: {content}", exc_info=True)
+            logger.error("[Meal Suggestion] JSON parsing failed: %s. Content: %s", e, content, exc_info=True)
             raise HTTPException(status_code=500, detail="Failed to parse LLM response")
         except Exception as e:
-            logger.error(f"[Meal Suggestion] LLM generation failed: {e}", exc_info=True)
+            logger.error("[Meal Suggestion] LLM generation failed: %s", e, exc_info=True)
             raise HTTPException(status_code=500, detail="Failed to generate suggestions")
 
         # 3️⃣ Save suggestions to DB
-        logger.info(f"[Meal Suggestion] Saving suggestions to database...")
+        logger.info("[Meal Suggestion] Saving suggestions to database...")
         for meal_type in ["breakfast", "lunch", "dinner"]:
             meal = suggestions.get(meal_type)
             if not meal:
-                logger.warning(f"[Meal Suggestion] Missing {meal_type} in suggestions")
+                logger.warning("[Meal Suggestion] Missing %s in suggestions", meal_type)
                 continue
 
             # Safe defaults in case keys are missing
@@ -1406,7 +2146,7 @@ Output format:
             fat = nutrition.get("fat", 0)
             recipe = meal.get("recipe", "")
 
-            logger.info(f"[Meal Suggestion] Adding {meal_type}: {name} (cal={calories}, p={protein}, c={carbs}, f={fat})")
+            logger.info("[Meal Suggestion] Adding %s: %s (cal=%s, p=%s, c=%s, f=%s)", meal_type, name, calories, protein, carbs, fat)
             db.add(DailyMealSuggestion(
                 user_id=user_id,
                 date=today,
@@ -1428,7 +2168,7 @@ Output format:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"[Meal Suggestion] Unexpected error: {e}", exc_info=True)
+        logger.error("[Meal Suggestion] Unexpected error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
@@ -1443,20 +2183,48 @@ Output format:
 
 @app.delete("/meals/{meal_id}")
 def delete_meal(meal_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    logger.info(f"[DELETE /meals/{meal_id}] Deleting meal for user {current_user.id}")
+    logger.info("[DELETE /meals/%s] Deleting meal for user %s", meal_id, current_user.id)
     
-    meal = db.query(Meal).filter(Meal.id == meal_id, Meal.user_id == current_user.id).first()
+    meal = db.query(Meal).filter(Meal.id == meal_id, Meal.user_id == current_user.id, Meal.deleted_at.is_(None)).first()
     if not meal:
         raise HTTPException(status_code=404, detail="Meal not found")
         
-    db.delete(meal)
+    drop_ref(db, meal.image_path)
+    drop_ref(db, meal.audio_path)
+    totals = TotalsDelta()
+    totals.remove_meal(meal)
+    totals.apply(db)
+    # Keep a tombstone so /sync can report the delete
+    mark_deleted(db, meal)
     db.commit()
     
-    logger.info(f"[DELETE /meals/{meal_id}] Meal deleted successfully")
+    logger.info("[DELETE /meals/%s] Meal deleted successfully", meal_id)
     return {"message": "Meal deleted successfully"}
 
+def _worker_count(value: str) -> int:
+    if value == "auto":
+        return os.cpu_count() or 1
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("workers must be >= 1 or 'auto'")
+    return count
+
 if __name__ == "__main__":
     import uvicorn
+
+    parser = argparse.ArgumentParser(description="Nutri AI forward proxy")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "7770")))
+    parser.add_argument(
+        "--workers", type=_worker_count, default=_worker_count(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes, or 'auto' for one per core (env WEB_CONCURRENCY). "
+             "Send SIGHUP to the launcher to gracefully restart all workers."
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30")),
+        help="Seconds a stopping worker waits for in-flight requests"
+    )
+    args = parser.parse_args()
     
     # Force SSL as requested
     if not os.path.exists("key.pem"):
@@ -1467,11 +2235,22 @@ if __name__ == "__main__":
         logger.critical("SSL Error: cert.pem not found in application directory. Please ensure cert.pem is present.")
         sys.exit(1)
 
-    logger.info("Starting server with SSL enabled")
-    uvicorn.run(app, host="0.0.0.0", port=7770, ssl_keyfile="key.pem", ssl_certfile="cert.pem")
-
-
-
-
-
-
+    # Schema init runs once, before any worker starts
+    init_db()
+    os.environ[SCHEMA_READY_ENV] = "1"
+    # Workers inherit this and size their per-process pools to their share of the cores
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    if args.workers > 1:
+        # Must be set before the workers import prometheus_client
+        metrics.prepare_multiprocess_dir(args.port)
+
+    logger.info("Starting server with SSL enabled (%s worker(s))", args.workers)
+    uvicorn.run(
+        "main:app" if args.workers > 1 else app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        ssl_keyfile="key.pem",
+        ssl_certfile="cert.pem",
+    )
@@ -0,0 +1,115 @@
+"""
+CPU-bound / blocking media transformations.
+
+Everything here is a plain top-level function taking and returning picklable
+values so it can run in the media process pool (see media_pool.py). Keep this
+module free of app state and heavy imports.
+"""
+import base64
+import io
+import logging
+import os
+import uuid
+
+from PIL import Image, ImageOps
+from pydub import AudioSegment
+
+logger = logging.getLogger("forward_proxy")
+
+# Derivatives generated once at ingest: variant -> (max side in px, JPEG quality)
+#   vlm:    what we send to the vision model
+#   medium: meal detail screen
+#   thumb:  meal list / history rows
+IMAGE_DERIVATIVES = {
+    "vlm": (1024, 85),
+    "medium": (1080, 80),
+    "thumb": (320, 70),
+}
+
+
+def derivative_path(image_path: str, variant: str) -> str:
+    """``.../<sha>.jpg`` -> ``.../<sha>.<variant>.jpg`` (stored next to the original)."""
+    return f"{os.path.splitext(image_path)[0]}.{variant}.jpg"
+
+
+def generate_image_derivatives(image_path: str, variants=tuple(IMAGE_DERIVATIVES)) -> dict:
+    """Decodes the original once and writes every missing derivative.
+
+    Returns ``{variant: path}``. Files are written to a temp name and renamed
+    so concurrent requests never see a half-written JPEG.
+    """
+    targets = {v: derivative_path(image_path, v) for v in variants}
+    missing = {v: p for v, p in targets.items() if not os.path.exists(p)}
+    if not missing:
+        return targets
+
+    largest = max(IMAGE_DERIVATIVES[v][0] for v in missing)
+    with Image.open(image_path) as img:
+        # Let the JPEG decoder downscale while decoding (no-op for other formats)
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        # Largest first so each smaller variant resizes an already-shrunk image
+        for variant in sorted(missing, key=lambda v: -IMAGE_DERIVATIVES[v][0]):
+            max_side, quality = IMAGE_DERIVATIVES[variant]
+            img.thumbnail((max_side, max_side))
+            # Unique per writer: a lazy /static build can race the analysis job
+            tmp_path = f"{missing[variant]}.{uuid.uuid4().hex}.part"
+            try:
+                img.save(tmp_path, format="JPEG", quality=quality, optimize=True, progressive=True)
+                os.replace(tmp_path, missing[variant])
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    return targets
+
+
+def encode_base64(content: bytes) -> str:
+    return base64.b64encode(content).decode('utf-8')
+
+
+def encode_file_base64(path: str) -> str:
+    with open(path, "rb") as f:
+        return encode_base64(f.read())
+
+
+def prepare_vlm_image(image_path: str) -> str:
+    """Loads (and shrinks if needed) the meal image and returns it base64-encoded.
+
+    Uses the pre-shrunk ``vlm`` derivative when it was generated at ingest.
+    """
+    vlm_path = derivative_path(image_path, "vlm")
+    if os.path.exists(vlm_path):
+        return encode_file_base64(vlm_path)
+
+    # Resize image if needed
+    try:
+        file_size = os.path.getsize(image_path)
+        if file_size > 2 * 1024 * 1024: # 2MB
+            logger.info("Image size %s bytes > 2MB. Resizing...", file_size)
+            with Image.open(image_path) as img:
+                img.thumbnail((1024, 1024))
+                buffer = io.BytesIO()
+                img.save(buffer, format="JPEG", quality=85)
+                image_content = buffer.getvalue()
+        else:
+            with open(image_path, "rb") as f:
+                image_content = f.read()
+    except Exception as e:
+        logger.warning("Image processing failed: %s. Using original file.", e)
+        with open(image_path, "rb") as f:
+            image_content = f.read()
+
+    return encode_base64(image_content)
+
+
+def convert_audio_to_wav(audio_path: str, wav_path: str) -> str:
+    """Converts an audio note to 16kHz mono 16-bit WAV (shells out to ffmpeg).
+
+    Returns ``wav_path``; raises if the conversion fails.
+    """
+    audio = AudioSegment.from_file(audio_path)
+    # Set to 16kHz, mono, 16-bit as recommended by Whisper
+    audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    audio.export(wav_path, format="wav")
+    return wav_path
@@ -0,0 +1,131 @@
+"""
+Executor for CPU-bound media work (see media_ops.py).
+
+PIL decode/resize/encode, ffmpeg conversions and base64 of multi-MB images
+would otherwise run on the event loop and stall every other request on the
+worker. Jobs go to a process pool by default; if one can't be created (or
+MEDIA_POOL=thread) a thread pool is used instead. The number of jobs in
+flight is capped so a burst of uploads gets a fast 503 instead of an
+unbounded backlog.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from log_config import configure_child_logging
+
+logger = logging.getLogger("forward_proxy")
+
+MEDIA_POOL = os.getenv("MEDIA_POOL", "process")  # process | thread
+# Default to this server worker's share of the cores so N workers don't oversubscribe the host
+_WEB_CONCURRENCY = os.getenv("WEB_CONCURRENCY", "1")
+_SERVER_WORKERS = (os.cpu_count() or 1) if _WEB_CONCURRENCY == "auto" else max(1, int(_WEB_CONCURRENCY))
+MEDIA_POOL_WORKERS = int(os.getenv("MEDIA_POOL_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // _SERVER_WORKERS)))))
+# Jobs allowed to be running or waiting in the pool at once
+MEDIA_POOL_MAX_PENDING = int(os.getenv("MEDIA_POOL_MAX_PENDING", "32"))
+
+
+class MediaPoolBusy(Exception):
+    """Raised when the media pool already has MEDIA_POOL_MAX_PENDING jobs."""
+
+
+class MediaPool:
+    def __init__(self, kind: str = MEDIA_POOL, workers: int = MEDIA_POOL_WORKERS, max_pending: int = MEDIA_POOL_MAX_PENDING):
+        self.requested_kind = kind
+        self.kind = None
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._durations = {}  # fn name -> [count, total seconds]
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.requested_kind == "process":
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=configure_child_logging)
+                self.kind = "process"
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning("[MediaPool] Process pool unavailable (%s), falling back to threads", e)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+            self.kind = "thread"
+        logger.info("[MediaPool] Started %s pool with %s workers (max pending %s)", self.kind, self.workers, self.max_pending)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _fallback_to_threads(self):
+        logger.error("[MediaPool] Process pool broke, switching to a thread pool")
+        broken = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+        self.kind = "thread"
+        broken.shutdown(wait=False)
+
+    async def run(self, fn, *args):
+        """Runs ``fn(*args)`` in the pool. Raises MediaPoolBusy when saturated."""
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise MediaPoolBusy(f"media pool saturated ({self.pending} jobs pending)")
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            try:
+                result = await loop.run_in_executor(self._executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge image); retry once on threads
+                if self.kind == "process":
+                    self._fallback_to_threads()
+                result = await loop.run_in_executor(self._executor, fn, *args)
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.pending -= 1
+                entry = self._durations.setdefault(fn.__name__, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "pending": self.pending,
+                "peak_pending": self.peak_pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_ms": {
+                    name: round(total / count * 1000, 2)
+                    for name, (count, total) in self._durations.items() if count
+                },
+            }
+
+
+media_pool = MediaPool()
@@ -0,0 +1,104 @@
+"""
+Prometheus metrics, served at GET /metrics.
+
+With several workers (``python main.py --workers N``) every worker writes its
+samples to files in ``PROMETHEUS_MULTIPROC_DIR`` and a scrape of any worker
+aggregates all of them. The launcher sets the directory up before the
+workers start. A single process just uses the default registry.
+
+Cache hit ratios are left to PromQL, e.g.
+``sum by (cache) (rate(proxy_cache_lookups_total{result="hit"}[5m]))
+/ sum by (cache) (rate(proxy_cache_lookups_total[5m]))``.
+"""
+import glob
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+MULTIPROC_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# VLM calls routinely take tens of seconds
+_UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+REQUEST_LATENCY = Histogram(
+    "proxy_request_duration_seconds", "Request latency by route template and status",
+    ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "proxy_requests_in_flight", "Requests being handled", multiprocess_mode="livesum",
+)
+UPSTREAM_LATENCY = Histogram(
+    "proxy_upstream_request_duration_seconds", "Latency of calls to Whisper and OpenRouter models",
+    ["upstream", "model", "outcome"], buckets=_UPSTREAM_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "proxy_upstream_in_flight", "Upstream calls in progress", ["upstream"], multiprocess_mode="livesum",
+)
+DB_CONNECTION_WAIT = Histogram(
+    "proxy_db_connection_wait_seconds", "Time for a request's session to get a pooled connection",
+    ["pool"], buckets=_WAIT_BUCKETS,
+)
+UPLOAD_BYTES = Counter("proxy_upload_bytes_total", "Bytes received in media uploads", ["kind"])
+CACHE_LOOKUPS = Counter("proxy_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(seconds)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class _UpstreamCall:
+    outcome = "error"  # until the caller records a status
+
+    def status(self, status_code: int):
+        self.outcome = f"{status_code // 100}xx"
+
+
+@contextmanager
+def track_upstream(upstream: str, model: str):
+    """Times an upstream call; set the response status with ``call.status(code)``."""
+    call = _UpstreamCall()
+    gauge = UPSTREAM_IN_FLIGHT.labels(upstream)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        gauge.dec()
+        UPSTREAM_LATENCY.labels(upstream, model, call.outcome).observe(time.perf_counter() - start)
+
+
+def render() -> tuple:
+    """(body, content type) for the /metrics response."""
+    if os.getenv(MULTIPROC_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def prepare_multiprocess_dir(port: int) -> str:
+    """Called by the launcher before forking workers: picks and empties the shared directory."""
+    path = os.getenv(MULTIPROC_ENV) or os.path.join(tempfile.gettempdir(), f"forward_proxy_metrics_{port}")
+    os.makedirs(path, exist_ok=True)
+    # Files left by a previous run would be summed into this one
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ[MULTIPROC_ENV] = path
+    return path
+
+
+def worker_exit():
+    """Drops this worker's live gauges from the shared directory."""
+    if os.getenv(MULTIPROC_ENV):
+        multiprocess.mark_process_dead(os.getpid())
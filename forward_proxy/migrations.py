@@ -0,0 +1,239 @@
+"""
+Versioned schema migrations for the SQLite database.
+
+``Base.metadata.create_all`` only creates missing tables, so anything added to
+an existing table (columns, indexes) goes here as a numbered migration.
+Applied versions are recorded in ``schema_migrations``. Migrations must be
+idempotent because databases created before this table existed get every
+migration replayed once.
+
+    python migrations.py status        # applied / pending versions
+    python migrations.py upgrade       # apply pending migrations
+    python migrations.py check-plans   # EXPLAIN QUERY PLAN for the hot queries; exit 1 on a full scan
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import func, select, text, tuple_
+
+logger = logging.getLogger("forward_proxy")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _add_columns(conn, table: str, columns: dict):
+    existing = _columns(conn, table)
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+def _meal_media_columns(conn):
+    _add_columns(conn, "meals", {"audio_path": "VARCHAR", "name": "VARCHAR"})
+
+
+def _analysis_log_columns(conn):
+    _add_columns(conn, "analysis_logs", {
+        "structured_meal": "TEXT",
+        "context_text": "TEXT",
+        "attempts": "INTEGER DEFAULT 0",
+    })
+
+
+def _hot_path_indexes(conn):
+    for ddl in (
+        # GET /meals (per user, newest first) and keyset pagination on (timestamp, id)
+        "CREATE INDEX IF NOT EXISTS ix_meals_user_timestamp ON meals (user_id, timestamp, id)",
+        # /static ownership check: user_id AND (image_path = ? OR audio_path = ?)
+        "CREATE INDEX IF NOT EXISTS ix_meals_user_image_path ON meals (user_id, image_path)",
+        "CREATE INDEX IF NOT EXISTS ix_meals_user_audio_path ON meals (user_id, audio_path)",
+        "CREATE INDEX IF NOT EXISTS ix_analysis_logs_user_timestamp ON analysis_logs (user_id, timestamp)",
+        # Startup recovery of PENDING analyses
+        "CREATE INDEX IF NOT EXISTS ix_analysis_logs_status_timestamp ON analysis_logs (status, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_daily_meal_suggestions_user_date ON daily_meal_suggestions (user_id, date, meal_type)",
+    ):
+        conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _sync_versions(conn):
+    _add_columns(conn, "meals", {"version": "INTEGER DEFAULT 0", "deleted_at": "INTEGER"})
+    _add_columns(conn, "users", {"sync_version": "INTEGER DEFAULT 0"})
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_meals_user_version ON meals (user_id, version)")
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS sync_counters (name VARCHAR PRIMARY KEY, value INTEGER)"
+    )
+    conn.exec_driver_sql("INSERT OR IGNORE INTO sync_counters (name, value) VALUES ('changes', 0), ('purged_through', 0)")
+    # Existing meals need distinct versions or a page boundary could split a tie
+    conn.exec_driver_sql("UPDATE meals SET version = rowid WHERE version IS NULL OR version = 0")
+    conn.exec_driver_sql(
+        "UPDATE sync_counters SET value = (SELECT COALESCE(MAX(version), 0) FROM meals) "
+        "WHERE name = 'changes' AND value = 0"
+    )
+
+
+def _daily_totals(conn):
+    # create_all made the table; backfill it from the existing meals (same as daily_totals.rebuild)
+    conn.exec_driver_sql("DELETE FROM daily_totals")
+    conn.exec_driver_sql(
+        "INSERT INTO daily_totals (user_id, day, meal_count, calories, carbs, sugar, protein, fat) "
+        "SELECT user_id, date(timestamp, 'unixepoch', 'localtime'), COUNT(*), "
+        "COALESCE(SUM(calories), 0), COALESCE(SUM(carbs), 0), COALESCE(SUM(sugar), 0), "
+        "COALESCE(SUM(protein), 0), COALESCE(SUM(fat), 0) "
+        "FROM meals WHERE deleted_at IS NULL GROUP BY user_id, date(timestamp, 'unixepoch', 'localtime')"
+    )
+
+
+MIGRATIONS = [
+    Migration(1, "meal_media_columns", _meal_media_columns),
+    Migration(2, "analysis_log_columns", _analysis_log_columns),
+    Migration(3, "hot_path_indexes", _hot_path_indexes),
+    Migration(4, "sync_versions", _sync_versions),
+    Migration(5, "daily_totals", _daily_totals),
+]
+
+
+def _ensure_version_table(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+    )
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.exec_driver_sql("SELECT version FROM schema_migrations")}
+
+
+def run_migrations(engine) -> List[int]:
+    """Applies pending migrations in order; returns the versions applied."""
+    applied = []
+    done = applied_versions(engine)
+    for migration in MIGRATIONS:
+        if migration.version in done:
+            continue
+        with engine.begin() as conn:
+            # Another process may have applied it since we looked
+            if conn.execute(text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": migration.version}).first():
+                continue
+            migration.apply(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": migration.version, "n": migration.name, "t": datetime.utcnow()},
+            )
+        logger.warning("[Migrations] Applied %03d_%s", migration.version, migration.name)
+        applied.append(migration.version)
+    return applied
+
+
+def hot_queries():
+    """(label, statement) for the queries behind the request hot paths."""
+    from database import (
+        MEAL_RESPONSE_COLUMNS, AnalysisLog, DailyMealSuggestion, DailyTotal, ImageFingerprint, Meal, RefreshToken,
+        User, VlmCacheEntry,
+    )
+    now = datetime.utcnow()
+    return [
+        ("get_current_user", select(User).where(User.id == 1)),
+        ("login", select(User).where(User.email == "a@example.com")),
+        # Same projection and filters as the handlers in main.py
+        ("GET /meals", select(*MEAL_RESPONSE_COLUMNS).where(
+            Meal.user_id == 1, Meal.deleted_at.is_(None),
+        ).order_by(Meal.timestamp.desc(), Meal.id.desc()).limit(201)),
+        ("GET /meals?from&to&cursor", select(*MEAL_RESPONSE_COLUMNS).where(
+            Meal.user_id == 1, Meal.deleted_at.is_(None), Meal.timestamp >= 0, Meal.timestamp < 10,
+            tuple_(Meal.timestamp, Meal.id) < (5, "m"),
+        ).order_by(Meal.timestamp.desc(), Meal.id.desc()).limit(201)),
+        ("GET /sync", select(*MEAL_RESPONSE_COLUMNS, Meal.version, Meal.deleted_at).where(
+            Meal.user_id == 1, Meal.version > 5, Meal.version <= 10,
+        ).order_by(Meal.version).limit(501)),
+        ("POST|DELETE /meals/{id}", select(Meal).where(Meal.id == "m", Meal.user_id == 1)),
+        ("/static ownership", select(Meal.id).where(
+            Meal.user_id == 1, (Meal.image_path == "blobs/x") | (Meal.audio_path == "blobs/x"))),
+        ("GET /api/analyze/{id}", select(AnalysisLog).where(AnalysisLog.id == "a", AnalysisLog.user_id == 1)),
+        ("recover_pending_analyses", select(AnalysisLog.id).where(
+            AnalysisLog.status == "PENDING",
+            (func.coalesce(AnalysisLog.attempts, 0) == 0) | (AnalysisLog.timestamp < now),
+        ).order_by(AnalysisLog.timestamp)),
+        ("meal suggestions", select(DailyMealSuggestion).where(
+            DailyMealSuggestion.user_id == 1, DailyMealSuggestion.date == date.today())),
+        ("fingerprint sync", select(ImageFingerprint).where(
+            ImageFingerprint.user_id == 1, ImageFingerprint.id > 0, ImageFingerprint.created_at >= now,
+        ).order_by(ImageFingerprint.id)),
+        ("vlm cache lookup", select(VlmCacheEntry).where(VlmCacheEntry.key == "k")),
+        ("GET /stats/daily", select(DailyTotal).where(
+            DailyTotal.user_id == 1, DailyTotal.day >= date.today(), DailyTotal.day <= date.today(),
+        ).order_by(DailyTotal.day)),
+        ("refresh token lookup", select(RefreshToken).where(RefreshToken.token_hash == "h")),
+    ]
+
+
+# "SCAN meals" is a full table scan; "SCAN meals USING INDEX ..." walks an index instead
+_FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+
+def check_query_plans(engine) -> List[str]:
+    """Runs EXPLAIN QUERY PLAN for every hot query; returns a list of failures."""
+    failures = []
+    with engine.connect() as conn:
+        for label, stmt in hot_queries():
+            compiled = stmt.compile(dialect=engine.dialect)
+            params = tuple(compiled.params[name] for name in compiled.positiontup)
+            plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+            scans = [detail for detail in plan if _FULL_SCAN_RE.match(detail)]
+            status = "FULL SCAN" if scans else "ok"
+            print(f"[{status:>9}] {label}")
+            for detail in plan:
+                print(f"            {detail}")
+            if scans:
+                failures.append(f"{label}: {', '.join(scans)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("status", "upgrade", "check-plans"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "check-plans":
+        # Fresh database built the same way production ones are
+        from database import Base, make_engine
+        with tempfile.TemporaryDirectory() as workdir:
+            engine = make_engine(os.path.join(workdir, "plans.db"))
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+            failures = check_query_plans(engine)
+            engine.dispose()
+        if failures:
+            print("\nFull table scans:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        return
+
+    from database import engine
+    if args.command == "upgrade":
+        from database import init_db
+        init_db()
+    done = applied_versions(engine)
+    for migration in MIGRATIONS:
+        state = "applied" if migration.version in done else "pending"
+        print(f"{migration.version:03d}_{migration.name}: {state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Rate limits and daily quotas shared by every worker.
+
+Each policy is a counter per (policy, subject, window). Sliding policies use
+the sliding-window-counter approximation: the previous fixed window's count,
+weighted by how much of it still overlaps the sliding window, plus the current
+count. That is O(1) per check, unlike keeping a timestamp list per user. Fixed
+policies (the daily quota) reset at local midnight.
+
+Counters live in a pluggable backend:
+  * ``sqlite``  the ``rate_limit_counters`` table (default; shared by workers)
+  * ``redis``   any Redis-protocol server (``RATE_LIMIT_REDIS_URL``)
+  * ``memory``  a bounded in-process LRU (single worker / development)
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+
+from database import engine
+
+logger = logging.getLogger("forward_proxy")
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MEMORY_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_KEYS", "100000"))
+
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "5"))
+MAX_REQUESTS_PER_DAY = int(os.getenv("MAX_REQUESTS_PER_DAY", "5"))
+
+# Purge expired SQLite counters every N increments
+_PURGE_EVERY = 500
+
+
+class RatePolicy(NamedTuple):
+    name: str
+    limit: int
+    window_seconds: int
+    sliding: bool = True
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    policy: Optional[RatePolicy] = None  # the policy that denied the request
+    retry_after: int = 0
+
+
+MINUTE = RatePolicy("minute", MAX_REQUESTS_PER_MINUTE, 60)
+DAY = RatePolicy("day", MAX_REQUESTS_PER_DAY, 24 * 3600, sliding=False)
+
+# Endpoints sharing a policy share its counter: meal logging and tracking draw on one quota
+ENDPOINT_POLICIES: Dict[str, List[RatePolicy]] = {
+    "meals": [MINUTE, DAY],
+    "track_meal": [MINUTE, DAY],
+}
+
+
+class MemoryBackend:
+    """Bounded LRU of counters; per process only."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self._counts: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, window: int, expires_at: int, amount: int = 1) -> int:
+        with self._lock:
+            count, _ = self._counts.get((key, window), (0, expires_at))
+            count += amount
+            self._counts[(key, window)] = (count, expires_at)
+            self._counts.move_to_end((key, window))
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+            return count
+
+    def get(self, key: str, window: int) -> int:
+        with self._lock:
+            entry = self._counts.get((key, window))
+            return entry[0] if entry else 0
+
+
+class SqliteBackend:
+    """Counters in the shared SQLite database; atomic per increment."""
+
+    def __init__(self):
+        self._increments = 0
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, window: int, expires_at: int, amount: int = 1) -> int:
+        with engine.begin() as conn:
+            # The upsert takes the write lock, so the read below sees our own increment
+            conn.execute(text(
+                "INSERT INTO rate_limit_counters (key, window_index, count, expires_at) "
+                "VALUES (:key, :window_index, :amount, :expires_at) "
+                "ON CONFLICT(key, window_index) DO UPDATE SET count = count + :amount"
+            ), {"key": key, "window_index": window, "amount": amount, "expires_at": expires_at})
+            count = conn.execute(text(
+                "SELECT count FROM rate_limit_counters WHERE key = :key AND window_index = :window_index"
+            ), {"key": key, "window_index": window}).scalar()
+
+            with self._lock:
+                self._increments += 1
+                purge = self._increments % _PURGE_EVERY == 0
+            if purge:
+                conn.execute(text("DELETE FROM rate_limit_counters WHERE expires_at < :now"), {"now": int(time.time())})
+        return count
+
+    def get(self, key: str, window: int) -> int:
+        with engine.connect() as conn:
+            count = conn.execute(text(
+                "SELECT count FROM rate_limit_counters WHERE key = :key AND window_index = :window_index"
+            ), {"key": key, "window_index": window}).scalar()
+        return count or 0
+
+
+class RedisBackend:
+    """INCRBY + EXPIREAT on a Redis-protocol server."""
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        self._client = redis.Redis.from_url(url)
+
+    def incr(self, key: str, window: int, expires_at: int, amount: int = 1) -> int:
+        name = f"ratelimit:{key}:{window}"
+        pipe = self._client.pipeline()
+        pipe.incrby(name, amount)
+        pipe.expireat(name, expires_at)
+        count, _ = pipe.execute()
+        return int(count)
+
+    def get(self, key: str, window: int) -> int:
+        value = self._client.get(f"ratelimit:{key}:{window}")
+        return int(value) if value else 0
+
+
+def _make_backend(name: str):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name == "sqlite":
+        return SqliteBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {name!r}")
+
+
+def _utc_offset(now: float) -> int:
+    return time.localtime(now).tm_gmtoff
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else _make_backend(RATE_LIMIT_BACKEND)
+        self.allowed = 0
+        self.denied = 0
+
+    def _window(self, policy: RatePolicy, now: float):
+        # Fixed windows align to local time so the daily quota resets at midnight
+        shifted = now if policy.sliding else now + _utc_offset(now)
+        index = int(shifted // policy.window_seconds)
+        elapsed = shifted - index * policy.window_seconds
+        return index, elapsed
+
+    def _estimate(self, policy: RatePolicy, key: str, index: int, elapsed: float, current: int) -> float:
+        if not policy.sliding:
+            return current
+        previous = self.backend.get(key, index - 1)
+        return previous * (1 - elapsed / policy.window_seconds) + current
+
+    def _retry_after(self, policy: RatePolicy, elapsed: float) -> int:
+        return max(1, math.ceil(policy.window_seconds - elapsed))
+
+    def hit(self, subject: str, policies: List[RatePolicy], now: Optional[float] = None) -> RateDecision:
+        """Counts one request against every policy; a denied request consumes nothing."""
+        now = time.time() if now is None else now
+        consumed = []
+        for policy in policies:
+            key = f"{policy.name}:{subject}"
+            index, elapsed = self._window(policy, now)
+            # Keep the window around long enough to serve as the "previous" window
+            expires_at = int(now - elapsed + 2 * policy.window_seconds)
+            count = self.backend.incr(key, index, expires_at)
+            consumed.append((key, index, expires_at))
+            if self._estimate(policy, key, index, elapsed, count) > policy.limit:
+                for undo_key, undo_index, undo_expires in consumed:
+                    self.backend.incr(undo_key, undo_index, undo_expires, amount=-1)
+                self.denied += 1
+                return RateDecision(False, policy, self._retry_after(policy, elapsed))
+        self.allowed += 1
+        return RateDecision(True)
+
+    def remaining(self, subject: str, policies: List[RatePolicy], now: Optional[float] = None) -> Dict[str, int]:
+        now = time.time() if now is None else now
+        result = {}
+        for policy in policies:
+            key = f"{policy.name}:{subject}"
+            index, elapsed = self._window(policy, now)
+            used = self._estimate(policy, key, index, elapsed, self.backend.get(key, index))
+            result[policy.name] = max(0, policy.limit - math.ceil(used))
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "denied": self.denied,
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def enforce_quota(user_id: int, endpoint: str):
+    """Raises 429 (with Retry-After) when ``endpoint``'s policies deny the user."""
+    decision = rate_limiter.hit(f"user:{user_id}", ENDPOINT_POLICIES[endpoint])
+    if decision.allowed:
+        return
+    logger.warning("[RateLimit] User %s hit the %s limit on %s", user_id, decision.policy.name, endpoint)
+    detail = "Daily limit reached." if decision.policy.name == DAY.name else "Minute limit reached."
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(decision.retry_after)},
+    )
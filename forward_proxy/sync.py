@@ -0,0 +1,93 @@
+"""
+Change versions and tombstones for delta sync (GET /sync).
+
+Every write to a meal or to the profile takes the next value of one global
+counter and stores it on the row. Deletes keep the row as a tombstone
+(``deleted_at`` set, media cleared). A client's sync token is the highest
+version it has seen, so a sync only returns rows with a higher version.
+
+SQLite has a single writer: the counter UPDATE takes the write lock and holds
+it until commit, so versions become visible in the order they were handed
+out and a client reading up to version N can never skip a lower one.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Meal
+
+logger = logging.getLogger("forward_proxy")
+
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_PAGE_MAX = int(os.getenv("SYNC_PAGE_MAX", "2000"))
+# Tombstones older than this are purged; clients that haven't synced since get a full reset
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+
+CHANGES = "changes"
+PURGED = "purged_through"  # highest version of any purged tombstone
+
+
+def _counter(db: Session, name: str) -> int:
+    return db.execute(text("SELECT value FROM sync_counters WHERE name = :name"), {"name": name}).scalar() or 0
+
+
+def next_versions(db: Session, count: int) -> range:
+    """Allocates ``count`` consecutive change versions inside the caller's (write) transaction."""
+    db.execute(text("UPDATE sync_counters SET value = value + :n WHERE name = :name"), {"n": count, "name": CHANGES})
+    last = _counter(db, CHANGES)
+    return range(last - count + 1, last + 1)
+
+
+def next_version(db: Session) -> int:
+    return next_versions(db, 1)[0]
+
+
+def current_version(db: Session) -> int:
+    return _counter(db, CHANGES)
+
+
+def purged_through(db: Session) -> int:
+    return _counter(db, PURGED)
+
+
+def encode_sync_token(version: int) -> str:
+    return f"v1.{version}"
+
+
+def decode_sync_token(token: Optional[str]) -> int:
+    """Version the token stands for; -1 (everything) when there is no token."""
+    if not token:
+        return -1
+    prefix, _, value = token.partition(".")
+    if prefix != "v1" or not value.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return int(value)
+
+
+def mark_deleted(db: Session, meal: Meal):
+    """Turns ``meal`` into a tombstone; the caller releases its media refs and commits."""
+    meal.image_path = None
+    meal.audio_path = None
+    meal.deleted_at = int(time.time())
+    meal.version = next_version(db)
+
+
+def purge_tombstones(db: Session) -> int:
+    cutoff = int(time.time()) - SYNC_TOMBSTONE_DAYS * 24 * 3600
+    expired = db.query(Meal.version).filter(Meal.deleted_at.isnot(None), Meal.deleted_at < cutoff)
+    newest = max((version for (version,) in expired), default=None)
+    if newest is None:
+        return 0
+    deleted = db.query(Meal).filter(Meal.deleted_at.isnot(None), Meal.deleted_at < cutoff).delete(synchronize_session=False)
+    db.execute(
+        text("UPDATE sync_counters SET value = MAX(value, :v) WHERE name = :name"),
+        {"v": newest, "name": PURGED},
+    )
+    db.commit()
+    logger.info("[Sync] Purged %s tombstones (through version %s)", deleted, newest)
+    return deleted
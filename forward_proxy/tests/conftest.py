@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The proxy modules are imported flat, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_DATA_DIR = tempfile.mkdtemp(prefix="forward_proxy_tests_")
+os.environ.setdefault("SQLITE_PATH", os.path.join(_DATA_DIR, "data", "users.db"))
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("MEDIA_POOL", "thread")
+# Media and blobs are written under ./data
+os.chdir(_DATA_DIR)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from database import init_db
+    init_db()
+    import main
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    # Not entered as a context manager: the lifespan would call the real upstreams
+    return TestClient(app)
+
+
+@pytest.fixture
+def signup(client):
+    """Creates a fresh user; returns (user_id, headers)."""
+    from auth import decode_access_token
+
+    def make():
+        response = client.post("/signup", json={"email": f"{uuid.uuid4().hex}@example.com", "password": "secret123"})
+        assert response.status_code == 200, response.text
+        token = response.json()["access_token"]
+        return int(decode_access_token(token)["sub"]), {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def meal():
+    """Builds a POST /meals body; keyword arguments override top-level fields."""
+    def make(**fields):
+        body = {
+            "id": uuid.uuid4().hex,
+            "timestamp": 1_700_000_000,
+            "category": "lunch",
+            "nutritionInfo": {"calories": 500, "carbs": 60, "sugar": 10, "protein": 30, "fat": 15},
+            "mealQuality": {"calorieDensity": 1.5, "goalFitPercentage": 0.8, "mealQualityScore": 7},
+        }
+        body.update(fields)
+        return body
+    return make
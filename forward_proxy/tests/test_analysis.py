@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+import database
+from database import AnalysisLog, AnalysisStatus, SessionLocal
+
+
+def _add_analysis(user_id: int, status: str = AnalysisStatus.PENDING.value) -> str:
+    analysis_id = str(uuid.uuid4())
+    db = SessionLocal()
+    db.add(AnalysisLog(id=analysis_id, user_id=user_id, image_path="data/none.jpg", status=status))
+    db.commit()
+    db.close()
+    return analysis_id
+
+
+def _checked_out() -> int:
+    pools = [database.engine.pool] + ([database._read_engine.pool] if database._read_engine else [])
+    return sum(pool.checkedout() for pool in pools)
+
+
+def test_event_stream_holds_no_connection_between_polls(client, signup, monkeypatch):
+    import main
+    user_id, headers = signup()
+    analysis_id = _add_analysis(user_id)
+    held = []
+
+    async def wait(_analysis_id, _timeout):
+        held.append(_checked_out())
+        await asyncio.sleep(0.1)  # past the stream deadline
+        return False
+
+    monkeypatch.setattr(main.analysis_jobs, "wait", wait)
+    monkeypatch.setattr(main, "ANALYSIS_SSE_MAX_SECONDS", 0.05)
+
+    response = client.get(f"/api/analyze/{analysis_id}/events", headers=headers)
+    assert response.status_code == 200
+    assert response.text.count("event: status") == 2
+    assert held == [0]
+
+
+def test_event_stream_checks_ownership(client, signup):
+    owner, _ = signup()
+    _, other_headers = signup()
+    analysis_id = _add_analysis(owner, AnalysisStatus.SUCCESS.value)
+    assert client.get(f"/api/analyze/{analysis_id}/events", headers=other_headers).status_code == 404
+
+
+def _wait_for_terminal(client, analysis_id: str, headers: dict, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get(f"/api/analyze/{analysis_id}", headers=headers).json()
+        if body["status"] != AnalysisStatus.PENDING.value or time.monotonic() > deadline:
+            return body
+        time.sleep(0.02)
+
+
+def test_async_analysis_returns_202_and_finishes(app, signup, monkeypatch):
+    import main
+
+    async def no_health_check():
+        pass
+
+    async def prepare_image(image_path):
+        return "aW1hZ2U="
+
+    async def vlm(image_path, context, goal_info, base64_image):
+        return {"success": True, "items": []}, {"id": "fake"}, "prompt"
+
+    monkeypatch.setattr(main, "health_check_external_services", no_health_check)
+    monkeypatch.setattr(main, "prepare_analysis_image", prepare_image)
+    monkeypatch.setattr(main, "analyze_image_vlm", vlm)
+    _, headers = signup()
+
+    # Entered so the lifespan starts the job workers
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/analyze?mode=async", headers=headers,
+            files={"image": ("meal.jpg", os.urandom(64), "image/jpeg")},
+        )
+        assert response.status_code == 202
+        accepted = response.json()
+        assert accepted["status"] == AnalysisStatus.PENDING.value
+
+        done = _wait_for_terminal(client, accepted["analysis_id"], headers)
+    assert done["status"] == AnalysisStatus.SUCCESS.value
+    assert done["structured_meal"] == {"success": True, "items": []}
+
+
+def test_async_analysis_failure_is_terminal(app, signup, monkeypatch):
+    import main
+
+    async def no_health_check():
+        pass
+
+    async def prepare_image(image_path):
+        raise RuntimeError("decoder crashed")
+
+    monkeypatch.setattr(main, "health_check_external_services", no_health_check)
+    monkeypatch.setattr(main, "prepare_analysis_image", prepare_image)
+    _, headers = signup()
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/analyze?mode=async", headers=headers,
+            files={"image": ("meal.jpg", os.urandom(64), "image/jpeg")},
+        )
+        assert response.status_code == 202
+        done = _wait_for_terminal(client, response.json()["analysis_id"], headers)
+    assert done["status"] == AnalysisStatus.FAILURE.value
+
+
+def test_sync_analysis_overlaps_transcription_and_image_prep(client, signup, monkeypatch):
+    import main
+
+    async def transcribe(audio_path, content_type):
+        await asyncio.sleep(0.3)
+        return "two eggs", {"text": "two eggs"}
+
+    async def prepare_image(image_path):
+        await asyncio.sleep(0.3)
+        return "aW1hZ2U="
+
+    async def vlm(image_path, context, goal_info, base64_image):
+        assert "two eggs" in context
+        return {"success": True, "items": []}, {"id": "fake"}, "prompt"
+
+    monkeypatch.setattr(main, "transcribe_audio", transcribe)
+    monkeypatch.setattr(main, "prepare_analysis_image", prepare_image)
+    monkeypatch.setattr(main, "analyze_image_vlm", vlm)
+    _, headers = signup()
+
+    response = client.post("/api/analyze", headers=headers, files={
+        "image": ("meal.jpg", os.urandom(64), "image/jpeg"),
+        "audio": ("note.mp3", os.urandom(64), "audio/mpeg"),
+    })
+    assert response.status_code == 200
+    timings = response.json()["timings_ms"]
+    assert {"transcribe", "image_prep", "vlm", "persist", "total"} <= set(timings)
+    # Roughly max(transcribe, image prep), not their sum
+    assert timings["total"] < 550
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from auth import (
+    REFRESH_TOKEN_REVOKED_RETENTION_DAYS, _refresh_token_hash, issue_refresh_token, purge_refresh_tokens,
+    revoke_refresh_token, rotate_refresh_token,
+)
+from database import Base, RefreshToken, make_engine
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = make_engine(str(tmp_path / "auth.db"))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _token(db, token_hash, expires_in, revoked_ago=None):
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        user_id=1, token_hash=token_hash, family_id=token_hash, expires_at=now + expires_in,
+        revoked_at=now - revoked_ago if revoked_ago is not None else None,
+    ))
+
+
+def test_purge_keeps_live_and_recently_rotated_tokens(db):
+    _token(db, "live", timedelta(days=10))
+    _token(db, "expired", timedelta(seconds=-1))
+    _token(db, "rotated-recently", timedelta(days=10), revoked_ago=timedelta(hours=1))
+    _token(db, "rotated-long-ago", timedelta(days=10),
+           revoked_ago=timedelta(days=REFRESH_TOKEN_REVOKED_RETENTION_DAYS + 1))
+    db.commit()
+
+    assert purge_refresh_tokens(db) == 2
+    assert sorted(h for (h,) in db.query(RefreshToken.token_hash)) == ["live", "rotated-recently"]
+
+
+def test_reuse_is_still_detected_after_purge(db):
+    first = issue_refresh_token(1, db)
+    db.commit()
+    _, second = rotate_refresh_token(first, db)
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _refresh_token_hash(first)).one()
+    row.revoked_at = datetime.utcnow() - timedelta(minutes=5)  # past the retry grace window
+    db.commit()
+
+    purge_refresh_tokens(db)
+    with pytest.raises(HTTPException):
+        rotate_refresh_token(first, db)
+    # Replaying the rotated token revoked the whole family
+    with pytest.raises(HTTPException):
+        rotate_refresh_token(second, db)
+
+
+def test_retry_within_grace_window_gets_a_working_token(db):
+    first = issue_refresh_token(1, db)
+    db.commit()
+    _, lost = rotate_refresh_token(first, db)  # response never reached the client
+
+    user_id, retried = rotate_refresh_token(first, db)
+    assert user_id == 1 and retried != lost
+    # The retried token works; the one from the lost response is dead
+    _, third = rotate_refresh_token(retried, db)
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _refresh_token_hash(lost)).one()
+    assert row.revoked_at is not None
+    assert db.query(RefreshToken).filter(RefreshToken.revoked_at.is_(None)).count() == 1
+
+
+def test_retry_within_grace_window_after_logout_is_rejected(db):
+    first = issue_refresh_token(1, db)
+    db.commit()
+    _, second = rotate_refresh_token(first, db)
+    revoke_refresh_token(second, db)
+
+    with pytest.raises(HTTPException) as exc:
+        rotate_refresh_token(first, db)
+    assert exc.value.status_code == 401
+    assert db.query(RefreshToken).filter(RefreshToken.revoked_at.is_(None)).count() == 0
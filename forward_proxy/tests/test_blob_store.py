@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from blob_store import register_blob
+from database import Base, Blob, make_engine
+
+SHA = "ab" * 32
+PATH = f"blobs/ab/ab/{SHA}.jpg"
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = make_engine(str(tmp_path / "blobs.db"))
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_register_blob_is_idempotent(Session):
+    db = Session()
+    first = register_blob(db, PATH, SHA, 10)
+    assert register_blob(db, PATH, SHA, 10) is first
+    db.commit()
+    assert db.query(Blob).count() == 1
+    db.close()
+
+
+def test_concurrent_register_of_same_blob(Session):
+    # The first upload has registered but not committed when the second one arrives
+    first, second = Session(), Session()
+    register_blob(first, PATH, SHA, 10)
+    errors = []
+
+    def other_upload():
+        try:
+            register_blob(second, PATH, SHA, 10)
+            second.commit()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=other_upload)
+    thread.start()
+    thread.join(0.2)
+    first.commit()
+    thread.join()
+    first.close()
+    second.close()
+
+    assert errors == []
+    db = Session()
+    assert [(b.path, b.ref_count) for b in db.query(Blob)] == [(PATH, 0)]
+    db.close()
+
+
+def test_migrate_legacy_files_bumps_meal_versions(app, signup):
+    import os
+    from blob_store import migrate_legacy_files
+    from database import Meal, SessionLocal
+    from sync import current_version
+
+    user_id, _ = signup()
+    os.makedirs("data/meal_images", exist_ok=True)
+    with open("data/meal_images/legacy.jpg", "wb") as f:
+        f.write(b"legacy image")
+    db = SessionLocal()
+    db.add(Meal(id="legacy-meal", user_id=user_id, timestamp=0, category="lunch",
+                image_path="data/meal_images/legacy.jpg", version=1))
+    db.commit()
+    before = current_version(db)
+
+    assert migrate_legacy_files(db)["rows_rewritten"] == 1
+    meal = db.get(Meal, "legacy-meal")
+    assert meal.image_path.startswith("blobs/")
+    # A new version, so clients that already synced the old path pick up the rewrite
+    assert meal.version == current_version(db) == before + 1
+    db.close()
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+from daily_totals import meal_day, rebuild
+
+DAY1 = 1_700_000_000
+DAY2 = DAY1 + 24 * 3600
+
+
+def _nutrition(calories: int) -> dict:
+    return {"calories": calories, "carbs": 10, "sugar": 1, "protein": 5, "fat": 2}
+
+
+def _totals(client, headers) -> dict:
+    params = {"from": meal_day(DAY1).isoformat(), "to": (meal_day(DAY2) + timedelta(days=1)).isoformat()}
+    response = client.get("/stats/daily", headers=headers, params=params)
+    assert response.status_code == 200
+    return {date.fromisoformat(row["date"]): (row["mealCount"], row["calories"]) for row in response.json()}
+
+
+def test_totals_follow_create_update_delete_and_revive(client, signup, meal, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "enforce_quota", lambda user_id, endpoint: None)
+    user_id, headers = signup()
+    lunch = meal(timestamp=DAY1, nutritionInfo=_nutrition(400))
+    dinner = meal(timestamp=DAY1, nutritionInfo=_nutrition(600))
+
+    client.post("/meals", headers=headers, json=lunch)
+    client.post("/meals/batch", headers=headers, json={"meals": [dinner]})
+    assert _totals(client, headers) == {meal_day(DAY1): (2, 1000)}
+
+    # Editing a meal onto another day moves it between rows
+    client.post("/meals", headers=headers, json={**dinner, "timestamp": DAY2, "nutritionInfo": _nutrition(700)})
+    assert _totals(client, headers) == {meal_day(DAY1): (1, 400), meal_day(DAY2): (1, 700)}
+
+    client.delete(f"/meals/{lunch['id']}", headers=headers)
+    assert _totals(client, headers) == {meal_day(DAY2): (1, 700)}
+
+    # Re-sending a deleted meal (single and batch paths) revives it exactly once
+    client.post("/meals", headers=headers, json=lunch)
+    client.post("/meals/batch", headers=headers, json={"meals": [lunch]})
+    expected = {meal_day(DAY1): (1, 400), meal_day(DAY2): (1, 700)}
+    assert _totals(client, headers) == expected
+
+    # The incrementally maintained rows match a rebuild from the meals table
+    from database import SessionLocal
+    db = SessionLocal()
+    rebuild(db, user_id)
+    db.close()
+    assert _totals(client, headers) == expected
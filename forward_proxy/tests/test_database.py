@@ -0,0 +1,24 @@
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+from database import engine, get_db
+
+
+def _waits() -> float:
+    return REGISTRY.get_sample_value("proxy_db_connection_wait_seconds_count", {"pool": "write"}) or 0.0
+
+
+def test_sessions_check_out_lazily():
+    before = _waits()
+    dependency = get_db()
+    db = next(dependency)
+    # Nothing checked out until the handler actually queries
+    assert engine.pool.checkedout() == 0
+    assert _waits() == before
+
+    db.execute(text("SELECT 1"))
+    assert engine.pool.checkedout() == 1
+    assert _waits() == before + 1
+
+    dependency.close()
+    assert engine.pool.checkedout() == 0
@@ -0,0 +1,46 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+import fast_json
+from fast_json import FastJSONResponse
+
+PAYLOAD = [
+    {
+        "id": "m1", "name": "Crème brûlée 🍮", "transcription": None, "timestamp": 1_700_000_000,
+        "nutritionInfo": {"calories": 350, "carbs": 40, "sugar": 30, "protein": 5, "fat": 18},
+        "mealQuality": {"calorieDensity": 2.75, "goalFitPercentage": 0.1, "mealQualityScore": 3.0},
+        "tags": [], "flags": [True, False],
+    },
+    {"date": date(2024, 2, 29), "at": datetime(2024, 2, 29, 12, 30, 5)},
+]
+
+
+def _stdlib(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=lambda v: v.isoformat()).encode("utf-8")
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_matches_stdlib(monkeypatch, use_orjson):
+    if use_orjson and fast_json.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    assert FastJSONResponse(PAYLOAD).body == _stdlib(PAYLOAD)
+
+
+def test_meal_list_keeps_the_response_schema(client, signup, meal):
+    from main import MealResponse
+
+    _, headers = signup()
+    created = meal(name="Crème brûlée", transcription="note")
+    client.post("/meals", headers=headers, json=created)
+
+    response = client.get("/meals", headers=headers)
+    assert response.headers["content-type"] == "application/json"
+    [item] = response.json()
+    assert MealResponse.model_validate(item).model_dump(exclude={"imageUrl", "audioUrl"}) == {
+        **created, "image": None, "audio": None,
+    }
+    assert list(item) == list(MealResponse.model_fields)
@@ -0,0 +1,56 @@
+import hashlib
+import os
+
+from auth import sign_media_path
+
+AUDIO = bytes(range(256)) * 8
+
+
+def _blob(data: bytes, ext: str = "m4a") -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    path = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+    os.makedirs(os.path.dirname(os.path.join("data", path)), exist_ok=True)
+    with open(os.path.join("data", path), "wb") as f:
+        f.write(data)
+    return path
+
+
+def _url(path: str, user_id: int) -> str:
+    params = sign_media_path(path, user_id)
+    return f"/static/{path}?uid={params['uid']}&exp={params['exp']}&sig={params['sig']}"
+
+
+def test_media_has_strong_etag_and_answers_304(client, signup):
+    user_id, _ = signup()
+    path = _blob(AUDIO)
+    url = _url(path, user_id)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["etag"] == f'"{hashlib.sha256(AUDIO).hexdigest()}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_media_serves_byte_ranges(client, signup):
+    user_id, _ = signup()
+    url = _url(_blob(AUDIO), user_id)
+
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(AUDIO)}"
+    assert response.content == AUDIO[100:200]
+
+    suffix = client.get(url, headers={"Range": "bytes=-10"})
+    assert suffix.status_code == 206
+    assert suffix.content == AUDIO[-10:]
+
+    assert client.get(url, headers={"Range": f"bytes={len(AUDIO)}-"}).status_code == 416
+    # A stale If-Range gets the whole (new) file instead of a slice of it
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == AUDIO
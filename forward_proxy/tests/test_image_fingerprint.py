@@ -0,0 +1,42 @@
+import uuid
+
+from database import AnalysisLog, SessionLocal
+from image_fingerprint import FingerprintIndex
+
+PHOTO = 0x0F0F_F0F0_3C3C_C3C3
+RETAKE = PHOTO ^ 0b101  # two bits apart
+CONTEXT = "ctx-a"
+
+
+def _analysis(db, user_id: int) -> str:
+    analysis_id = str(uuid.uuid4())
+    db.add(AnalysisLog(id=analysis_id, user_id=user_id, image_path="data/none.jpg"))
+    db.commit()
+    return analysis_id
+
+
+def test_near_duplicate_is_found_for_same_user_and_context(signup):
+    index = FingerprintIndex()
+    user_id, _ = signup()
+    db = SessionLocal()
+    analysis_id = _analysis(db, user_id)
+    index.add(user_id, analysis_id, PHOTO, CONTEXT, db)
+
+    assert index.find(user_id, RETAKE, CONTEXT, db) == (analysis_id, 2)
+    db.close()
+
+
+def test_near_duplicate_is_scoped_to_user_and_context(signup):
+    index = FingerprintIndex()
+    owner, _ = signup()
+    other, _ = signup()
+    db = SessionLocal()
+    index.add(owner, _analysis(db, owner), PHOTO, CONTEXT, db)
+
+    # Another user's photo is never reused, even when identical
+    assert index.find(other, PHOTO, CONTEXT, db) is None
+    # Different goals / note / audio change the prompt, so the earlier result doesn't apply
+    assert index.find(owner, RETAKE, "ctx-b", db) is None
+    # Past PHASH_MAX_DISTANCE it's a different photo
+    assert index.find(owner, PHOTO ^ 0xFFFF, CONTEXT, db) is None
+    db.close()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import logging
+import os
+
+import pytest
+
+import log_config
+from media_pool import MediaPool
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    yield
+    log_config.stop_logging()
+    log_config.queue_handler = None
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def _records(output: str, message: str):
+    return [json.loads(line) for line in output.splitlines() if message in line]
+
+
+def _log_from_worker(message: str) -> int:
+    logging.getLogger("forward_proxy").warning("[Test] %s", message)
+    return os.getpid()
+
+
+def test_media_pool_worker_logs_are_written(restore_logging, capfd):
+    log_config.configure_logging()  # here, so the listener writes to the captured stdout
+    pool = MediaPool(kind="process", workers=1)
+    pool.start()
+    try:
+        assert pool.kind == "process"
+        worker_pid = asyncio.run(pool.run(_log_from_worker, "logged in a pool worker"))
+    finally:
+        pool.shutdown()
+
+    records = _records(capfd.readouterr().out, "logged in a pool worker")
+    assert len(records) == 1
+    assert records[0]["pid"] == worker_pid != os.getpid()
+
+
+def test_forked_child_logs_are_written(restore_logging, capfd):
+    logger = log_config.configure_logging()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            logger.warning("[Test] %s", "logged in a forked child")
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    logger.warning("[Test] %s", "logged in the parent")
+    log_config.stop_logging()
+
+    output = capfd.readouterr().out
+    assert [r["pid"] for r in _records(output, "logged in a forked child")] == [pid]
+    assert [r["pid"] for r in _records(output, "logged in the parent")] == [os.getpid()]
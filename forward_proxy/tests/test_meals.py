@@ -0,0 +1,42 @@
+import uuid
+
+
+def _pages(client, headers, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/meals", headers=headers, params=query)
+        assert response.status_code == 200
+        pages.append([m["id"] for m in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_have_no_duplicates_or_gaps_across_equal_timestamps(client, signup, meal):
+    _, headers = signup()
+    # Five meals share one timestamp, so pages must break ties on id
+    prefix = uuid.uuid4().hex
+    meals = [meal(id=f"{prefix}-{i}", timestamp=1_700_000_000 + (0 if i < 5 else i)) for i in range(8)]
+    assert client.post("/meals/batch", headers=headers, json={"meals": meals}).status_code == 200
+
+    pages = _pages(client, headers, limit=2)
+    ids = [meal_id for page in pages for meal_id in page]
+    assert [len(page) for page in pages] == [2, 2, 2, 2]
+    expected = sorted(meals, key=lambda m: (m["timestamp"], m["id"]), reverse=True)
+    assert ids == [m["id"] for m in expected]
+
+
+def test_time_range_filter_is_inclusive_exclusive(client, signup, meal):
+    _, headers = signup()
+    prefix = uuid.uuid4().hex
+    meals = [meal(id=f"{prefix}-{i}", timestamp=1_700_000_000 + i * 100) for i in range(5)]
+    client.post("/meals/batch", headers=headers, json={"meals": meals})
+
+    pages = _pages(client, headers, limit=1, **{"from": 1_700_000_100, "to": 1_700_000_300})
+    assert [meal_id for page in pages for meal_id in page] == [f"{prefix}-2", f"{prefix}-1"]
+
+
+def test_invalid_cursor_is_rejected(client, signup):
+    _, headers = signup()
+    assert client.get("/meals", headers=headers, params={"cursor": "not-a-cursor"}).status_code == 400
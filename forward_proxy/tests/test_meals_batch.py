@@ -0,0 +1,35 @@
+def test_batch_reports_per_item_status(client, signup, meal):
+    _, headers = signup()
+    _, other_headers = signup()
+    existing, foreign, fresh = meal(), meal(), meal()
+    client.post("/meals", headers=headers, json=existing)
+    client.post("/meals", headers=other_headers, json=foreign)
+
+    response = client.post("/meals/batch", headers=headers, json={"meals": [
+        {**fresh, "name": "first try"},
+        {**existing, "name": "edited"},
+        {**foreign, "name": "hijack"},
+        {**fresh, "name": "second try"},
+    ]})
+    assert response.status_code == 200
+    results = [(r["id"], r["status"]) for r in response.json()["results"]]
+    assert results == [
+        (fresh["id"], "superseded"),
+        (existing["id"], "updated"),
+        (foreign["id"], "conflict"),
+        (fresh["id"], "created"),
+    ]
+    assert all(r["version"] is None for r in response.json()["results"] if r["status"] in ("conflict", "superseded"))
+
+    names = {m["id"]: m["name"] for m in client.get("/meals", headers=headers).json()}
+    assert names == {existing["id"]: "edited", fresh["id"]: "second try"}
+    # The other user's meal is untouched
+    assert [m["name"] for m in client.get("/meals", headers=other_headers).json()] == [None]
+
+
+def test_batch_charges_quota_once(client, signup, meal):
+    _, headers = signup()
+    before = client.get("/user/limits", headers=headers).json()["daily_remaining"]
+    response = client.post("/meals/batch", headers=headers, json={"meals": [meal() for _ in range(20)]})
+    assert response.status_code == 200
+    assert client.get("/user/limits", headers=headers).json()["daily_remaining"] == before - 1
@@ -0,0 +1,32 @@
+import os
+import threading
+
+from PIL import Image
+
+from media_ops import IMAGE_DERIVATIVES, derivative_path, generate_image_derivatives
+
+
+def test_concurrent_derivative_builds(tmp_path):
+    original = str(tmp_path / ("ab" * 32 + ".jpg"))
+    Image.new("RGB", (2400, 1800), (200, 120, 40)).save(original, quality=90)
+    barrier = threading.Barrier(6)
+    errors = []
+
+    def build():
+        barrier.wait()
+        try:
+            generate_image_derivatives(original)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    for variant, (max_side, _) in IMAGE_DERIVATIVES.items():
+        with Image.open(derivative_path(original, variant)) as img:
+            assert max(img.size) == max_side
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
@@ -0,0 +1,50 @@
+import os
+from urllib.parse import parse_qs, urlparse
+
+from auth import sign_media_path
+
+DATA = b"signed media"
+PATH = "meal_images/signed.jpg"
+
+
+def _write_media():
+    os.makedirs("data/meal_images", exist_ok=True)
+    with open(os.path.join("data", PATH), "wb") as f:
+        f.write(DATA)
+
+
+def _url(params: dict) -> str:
+    return f"/static/{PATH}?uid={params['uid']}&exp={params['exp']}&sig={params['sig']}"
+
+
+def test_meal_list_carries_signed_urls_that_need_no_token(client, signup, meal):
+    _write_media()
+    _, headers = signup()
+    assert client.post("/meals", headers=headers, json=meal(image=PATH)).status_code == 200
+
+    image_url = client.get("/meals", headers=headers).json()[0]["imageUrl"]
+    assert set(parse_qs(urlparse(image_url).query)) == {"uid", "exp", "sig"}
+    response = client.get(image_url)  # no Authorization header
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_bad_or_expired_signature_is_rejected(client, signup):
+    _write_media()
+    user_id, _ = signup()
+    params = sign_media_path(PATH, user_id)
+
+    assert client.get(_url({**params, "sig": "0" * len(params["sig"])})).status_code == 401
+    # The signature covers the user id and the expiry
+    assert client.get(_url({**params, "uid": user_id + 1})).status_code == 401
+    assert client.get(_url({**params, "exp": params["exp"] + 3600})).status_code == 401
+    expired = sign_media_path(PATH, user_id, now=0)
+    assert client.get(_url(expired)).status_code == 401
+
+
+def test_bad_signature_falls_back_to_ownership_check(client, signup):
+    _write_media()
+    user_id, headers = signup()
+    params = sign_media_path(PATH, user_id)
+    # The token holder has no meal with this file
+    assert client.get(_url({**params, "sig": "0" * 64}), headers=headers).status_code == 404
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+
+import migrations
+from database import Base, Meal, make_engine
+from migrations import MIGRATIONS, applied_versions, check_query_plans, run_migrations
+
+# meals as created before versioned migrations (no name/audio_path, no sync columns)
+LEGACY_MEALS = """
+CREATE TABLE meals (
+    id VARCHAR PRIMARY KEY, user_id INTEGER, timestamp INTEGER, category VARCHAR,
+    image_path VARCHAR, transcription VARCHAR,
+    calories INTEGER, carbs INTEGER, sugar INTEGER, protein INTEGER, fat INTEGER,
+    calorie_density FLOAT, goal_fit_percentage FLOAT, meal_quality_score FLOAT
+)
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(str(tmp_path / "migrations.db"))
+    yield engine
+    engine.dispose()
+
+
+def _migrated(engine):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    return engine
+
+
+def test_fresh_database_applies_every_migration_once(engine):
+    Base.metadata.create_all(bind=engine)
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    assert applied_versions(engine) == {m.version for m in MIGRATIONS}
+    assert run_migrations(engine) == []
+
+
+def test_legacy_database_is_upgraded(engine):
+    ts = int(datetime(2024, 5, 1, 12).timestamp())
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_MEALS)
+        for i, user_id in enumerate((1, 1, 2)):
+            conn.exec_driver_sql(
+                "INSERT INTO meals (id, user_id, timestamp, category, calories, carbs, sugar, protein, fat) "
+                "VALUES (?, ?, ?, 'lunch', 500, 60, 10, 30, 20)", (f"m{i}", user_id, ts + i),
+            )
+    _migrated(engine)
+
+    with engine.connect() as conn:
+        versions = conn.execute(select(Meal.version).order_by(Meal.id)).scalars().all()
+        assert sorted(versions) == [1, 2, 3]  # distinct, so sync pages can't split a tie
+        assert conn.execute(text("SELECT value FROM sync_counters WHERE name = 'changes'")).scalar() == 3
+        totals = conn.execute(text("SELECT user_id, meal_count, calories FROM daily_totals ORDER BY user_id")).all()
+        assert [tuple(row) for row in totals] == [(1, 2, 1000), (2, 1, 500)]
+        indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(meals)")}
+        assert {"ix_meals_user_timestamp", "ix_meals_user_version"} <= indexes
+    assert check_query_plans(engine) == []
+
+
+def test_hot_queries_use_indexes(engine):
+    assert check_query_plans(_migrated(engine)) == []
+
+
+def test_full_scan_of_meals_is_reported(engine, monkeypatch):
+    _migrated(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_meals_user_timestamp")
+        conn.exec_driver_sql("DROP INDEX ix_meals_user_image_path")
+        conn.exec_driver_sql("DROP INDEX ix_meals_user_audio_path")
+        conn.exec_driver_sql("DROP INDEX ix_meals_user_version")
+    failures = check_query_plans(engine)
+    assert any(f.startswith("GET /meals: SCAN meals") for f in failures)
+
+    unindexed = [("meals by name", select(Meal.id).where(Meal.name == "toast"))]
+    monkeypatch.setattr(migrations, "hot_queries", lambda: unindexed)
+    assert check_query_plans(engine) == ["meals by name: SCAN meals"]
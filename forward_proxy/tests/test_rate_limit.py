@@ -0,0 +1,27 @@
+from rate_limit import MemoryBackend, RateLimiter, RatePolicy
+
+MINUTE = RatePolicy("minute", 2, 60)
+
+
+def test_over_quota_returns_429_with_retry_after(client, signup, meal):
+    _, headers = signup()
+    limits = client.get("/user/limits", headers=headers).json()
+    for _ in range(limits["minute_remaining"]):
+        assert client.post("/meals", headers=headers, json=meal()).status_code == 200
+
+    response = client.post("/meals", headers=headers, json=meal())
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 60
+    # The rejected request didn't use up quota of its own
+    assert client.get("/user/limits", headers=headers).json()["daily_remaining"] == limits["daily_remaining"] - limits["minute_remaining"]
+
+
+def test_sliding_window_weights_the_previous_minute():
+    limiter = RateLimiter(MemoryBackend())
+    assert limiter.hit("u", [MINUTE], now=0).allowed
+    assert limiter.hit("u", [MINUTE], now=1).allowed
+    denied = limiter.hit("u", [MINUTE], now=30)
+    assert not denied.allowed and denied.retry_after == 30
+    # 45s into the next minute a quarter of the old window still counts: 0.5 + 1 <= 2
+    assert limiter.hit("u", [MINUTE], now=105).allowed
+    assert not limiter.hit("u", [MINUTE], now=106).allowed
@@ -0,0 +1,60 @@
+from sync import decode_sync_token
+
+
+def _sync(client, headers, **params):
+    response = client.get("/sync", headers=headers, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_sync_returns_changes_and_tombstones_since_token(client, signup, meal):
+    _, headers = signup()
+    kept, dropped = meal(), meal()
+    client.post("/meals/batch", headers=headers, json={"meals": [kept, dropped]})
+
+    full = _sync(client, headers)
+    assert full["reset"] is True
+    assert {m["id"] for m in full["meals"]} == {kept["id"], dropped["id"]}
+
+    client.post("/meals", headers=headers, json={**kept, "name": "renamed"})
+    assert client.delete(f"/meals/{dropped['id']}", headers=headers).status_code == 200
+    client.put("/profile", headers=headers, json={"name": "Alex"})
+
+    delta = _sync(client, headers, since=full["token"])
+    assert delta["reset"] is False
+    assert [(m["id"], m["name"]) for m in delta["meals"]] == [(kept["id"], "renamed")]
+    assert delta["deleted"] == [dropped["id"]]
+    assert delta["profile"]["name"] == "Alex"
+
+    # Nothing changed since: empty delta, same token
+    again = _sync(client, headers, since=delta["token"])
+    assert (again["meals"], again["deleted"], again["profile"]) == ([], [], None)
+    assert again["token"] == delta["token"]
+
+
+def test_sync_pages_stop_at_the_upto_bound(client, signup, meal):
+    from database import SessionLocal
+    from sync import current_version
+
+    _, headers = signup()
+    meals = [meal() for _ in range(3)]
+    client.post("/meals/batch", headers=headers, json={"meals": meals})
+
+    first = _sync(client, headers, limit=2)
+    assert first["hasMore"] is True and len(first["meals"]) == 2
+    second = _sync(client, headers, limit=2, since=first["token"])
+    assert second["hasMore"] is False
+    assert sorted(m["id"] for m in first["meals"] + second["meals"]) == sorted(m["id"] for m in meals)
+
+    # Other users' writes move the counter; the token catches up to it without any rows
+    _, other_headers = signup()
+    client.post("/meals", headers=other_headers, json=meal())
+    idle = _sync(client, headers, since=second["token"])
+    db = SessionLocal()
+    assert idle["meals"] == [] and decode_sync_token(idle["token"]) == current_version(db)
+    db.close()
+
+
+def test_sync_rejects_malformed_token(client, signup):
+    _, headers = signup()
+    assert client.get("/sync", headers=headers, params={"since": "v2.5"}).status_code == 400
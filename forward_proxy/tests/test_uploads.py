@@ -0,0 +1,25 @@
+import asyncio
+import hashlib
+import io
+
+from starlette.datastructures import UploadFile
+
+from uploads import store_upload
+
+
+def test_concurrent_uploads_to_same_destination(tmp_path):
+    dest = str(tmp_path / "profile.jpg")
+    bodies = [bytes([i]) * 300_000 for i in range(4)]
+
+    async def upload_all():
+        return await asyncio.gather(*(
+            store_upload(UploadFile(io.BytesIO(body), filename="p.jpg"), dest, "image") for body in bodies
+        ))
+
+    stored = asyncio.run(upload_all())
+
+    with open(dest, "rb") as f:
+        final = f.read()
+    # Whichever upload renamed last wins, intact
+    assert hashlib.sha256(final).hexdigest() in {s.sha256 for s in stored}
+    assert [p.name for p in tmp_path.iterdir()] == ["profile.jpg"]
@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from upstream import UpstreamPool, UpstreamStats
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def _client():
+    pool = UpstreamPool()
+    stats = pool._stats["test"] = UpstreamStats()
+    config = {"timeout": 5.0, "connect_timeout": 2.0, "max_connections": 2, "max_keepalive": 2,
+              "keepalive_expiry": 60.0, "http2": False}
+    return pool._make_client("test", config), stats
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_pooled_requests_count_as_reuse():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    async def run():
+        client, stats = _client()
+        async with client:
+            for _ in range(3):
+                (await client.get(url)).raise_for_status()
+        return stats.snapshot()
+
+    try:
+        snapshot = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert snapshot["requests"] == 3
+    assert snapshot["new_connections"] == 1
+    assert snapshot["reused_connections"] == 2
+
+
+def test_failed_connect_is_not_a_reuse():
+    url = f"http://127.0.0.1:{_closed_port()}/"
+
+    async def run():
+        client, stats = _client()
+        async with client:
+            with pytest.raises(httpx.ConnectError):
+                await client.get(url)
+        return stats.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert snapshot["requests"] == 1
+    assert snapshot["new_connections"] == 1
+    assert snapshot["failed_connections"] == 1
+    assert snapshot["reused_connections"] == 0
+    assert snapshot["reuse_ratio"] == 0.0
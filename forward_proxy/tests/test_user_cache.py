@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from database import User
+from user_cache import UserCache
+
+
+def _cached_users(cache: UserCache) -> int:
+    return cache.stats()["users"]
+
+
+def _invalidate_in_child(cache: UserCache, conn):
+    cache.invalidate(7)
+    conn.send(_cached_users(cache))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_invalidate_only_clears_the_local_process():
+    # Stands in for a second worker: same cached snapshot, separate memory
+    cache = UserCache()
+    cache.remember_user(User(id=7, email="worker@example.com"))
+    parent_conn, child_conn = multiprocessing.Pipe()
+    child = multiprocessing.get_context("fork").Process(target=_invalidate_in_child, args=(cache, child_conn))
+    child.start()
+    assert parent_conn.recv() == 0
+    child.join()
+
+    # Known limitation: this "worker" still serves its snapshot until the TTL runs out
+    assert _cached_users(cache) == 1
+
+
+@pytest.mark.parametrize("workers, ttl", [("1", 30.0), ("4", 5.0)])
+def test_ttl_is_shorter_with_several_workers(workers, ttl):
+    env = {k: v for k, v in os.environ.items() if k != "USER_CACHE_TTL_SECONDS"}
+    env["WEB_CONCURRENCY"] = workers
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", "import user_cache; print(user_cache.USER_CACHE_TTL_SECONDS)"],
+        env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert float(out) == ttl
+
+
+def test_profile_update_invalidates_the_cached_user(client, signup):
+    from database import SessionLocal
+    from user_cache import user_cache
+
+    user_id, headers = signup()
+    client.get("/profile", headers=headers)
+    hits = user_cache.user_hits
+    assert client.get("/profile", headers=headers).status_code == 200
+    assert user_cache.user_hits == hits + 1
+
+    # A change behind the cache's back is not seen until the snapshot goes away
+    db = SessionLocal()
+    db.get(User, user_id).motivation = "direct write"
+    db.commit()
+    db.close()
+    assert client.get("/profile", headers=headers).json()["motivation"] is None
+
+    assert client.put("/profile", headers=headers, json={"name": "Sam"}).status_code == 200
+    assert client.put("/profile", headers=headers, json={"age": 31}).status_code == 200
+    profile = client.get("/profile", headers=headers).json()
+    assert (profile["name"], profile["age"], profile["motivation"]) == ("Sam", 31, "direct write")
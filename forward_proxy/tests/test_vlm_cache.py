@@ -0,0 +1,41 @@
+import hashlib
+
+from database import SessionLocal, User
+
+IMAGE = b"\xff\xd8 not really a jpeg"
+
+
+def test_track_meal_cache_hit_skips_quota_and_upstream(client, signup, monkeypatch):
+    import main
+    from vlm_cache import cache_key, vlm_cache
+
+    user_id, headers = signup()
+    db = SessionLocal()
+    user = db.get(User, user_id)
+    key = cache_key(hashlib.sha256(IMAGE).hexdigest(), main.VLM_MODEL, main.get_user_goal_context(user))
+    vlm_cache.put(key, main.VLM_MODEL, {"success": True, "items": []}, "", db)
+    db.close()
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("cache hit should not reach this")
+
+    monkeypatch.setattr(main, "enforce_quota", unexpected)
+    monkeypatch.setattr(main.upstreams, "client", unexpected)
+
+    response = client.post("/api/track-meal", headers=headers, files={"image": ("meal.jpg", IMAGE, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "items": []}
+
+
+def test_track_meal_cache_is_keyed_by_image(client, signup, monkeypatch):
+    import main
+
+    _, headers = signup()
+    calls = []
+    monkeypatch.setattr(main, "enforce_quota", lambda user_id, endpoint: calls.append(endpoint))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "")
+
+    # A different image misses the cache and is charged against the quota
+    response = client.post("/api/track-meal", headers=headers, files={"image": ("meal.jpg", IMAGE + b"!", "image/jpeg")})
+    assert response.status_code == 500
+    assert calls == ["track_meal"]
@@ -0,0 +1,117 @@
+"""
+Streaming ingestion of multipart uploads.
+
+Uploads are copied to disk in fixed-size chunks instead of ``await file.read()``
+so peak memory per upload stays at one chunk regardless of file size. The
+SHA-256 and byte count are computed in the same pass, and per-type size
+limits are enforced as early as possible (declared size first, then while
+streaming).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+
+from metrics import UPLOAD_BYTES
+
+logger = logging.getLogger("forward_proxy")
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+_MB = 1024 * 1024
+UPLOAD_LIMITS = {
+    "image": int(os.getenv("MAX_IMAGE_UPLOAD_MB", "15")) * _MB,
+    "audio": int(os.getenv("MAX_AUDIO_UPLOAD_MB", "25")) * _MB,
+    "profile_image": int(os.getenv("MAX_PROFILE_IMAGE_UPLOAD_MB", "5")) * _MB,
+}
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    content_type: Optional[str]
+    filename: Optional[str]
+
+
+def upload_extension(upload: UploadFile, default: str) -> str:
+    filename = upload.filename or ""
+    return filename.split(".")[-1] if "." in filename else default
+
+
+def _too_large(kind: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{kind.replace('_', ' ').capitalize()} too large (max {limit // _MB} MB)"
+    )
+
+
+def _write_chunk(out, hasher, chunk: bytes):
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+async def store_upload(upload: UploadFile, dest_path: str, kind: str) -> StoredUpload:
+    """Streams ``upload`` to ``dest_path`` and returns its size and SHA-256.
+
+    The file is written under a temporary name and renamed into place, so a
+    rejected or interrupted upload never leaves a partial file behind.
+    Raises HTTPException(413) when the upload exceeds the limit for ``kind``.
+    """
+    limit = UPLOAD_LIMITS[kind]
+    # Starlette knows the part size once it has been spooled; reject before copying
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > limit:
+        raise _too_large(kind, limit)
+
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    # Unique so two uploads to the same destination (e.g. a profile image) can't share it
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise _too_large(kind, limit)
+            # File I/O and hashing happen off the event loop
+            await asyncio.to_thread(_write_chunk, out, hasher, chunk)
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+    except BaseException:
+        out.close()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    UPLOAD_BYTES.labels(kind).inc(size)
+    return StoredUpload(dest_path, size, hasher.hexdigest(), upload.content_type, upload.filename)
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file already on disk (blocking; chunked)."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def scratch_dir():
+    """FastAPI dependency: a per-request temp directory removed afterwards."""
+    path = os.path.join("data", "temp", "scratch", uuid.uuid4().hex)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,178 @@
+"""
+Shared, pooled HTTP clients for the upstream services (OpenRouter + Whisper).
+
+The clients are created once in the app lifespan and reused by every request,
+so the TCP + TLS handshake is only paid when the pool has to open a new
+connection instead of on every call.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("forward_proxy")
+
+OPENROUTER = "openrouter"
+WHISPER = "whisper"
+
+try:
+    import h2  # noqa: F401  (only needed to enable HTTP/2 in httpx)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _upstream_config(name: str, default_timeout: float) -> dict:
+    prefix = name.upper()
+    return {
+        "timeout": _env_float(f"{prefix}_TIMEOUT", default_timeout),
+        "connect_timeout": _env_float(f"{prefix}_CONNECT_TIMEOUT", 10.0),
+        "max_connections": _env_int(f"{prefix}_MAX_CONNECTIONS", 20),
+        "max_keepalive": _env_int(f"{prefix}_MAX_KEEPALIVE", 10),
+        "keepalive_expiry": _env_float(f"{prefix}_KEEPALIVE_EXPIRY", 60.0),
+        "http2": os.getenv(f"{prefix}_HTTP2", "1") == "1",
+    }
+
+
+class UpstreamStats:
+    """Counts requests vs. freshly opened connections for one upstream."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.failed_connections = 0
+        self.errors = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def record_connect_failure(self):
+        with self._lock:
+            self.failed_connections += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "failed_connections": self.failed_connections,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+                "errors": self.errors,
+            }
+
+
+class UpstreamPool:
+    """Holds one long-lived ``httpx.AsyncClient`` per upstream service."""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, UpstreamStats] = {}
+        self._config: Dict[str, dict] = {}
+
+    def _make_trace(self, stats: UpstreamStats):
+        # httpcore emits "connection.connect_tcp.*" only when it opens a new
+        # connection; pooled requests skip straight to sending. Attempts are
+        # counted when they start so a failed connect is never taken for a reuse.
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.started":
+                stats.record_connect()
+            elif event_name in ("connection.connect_tcp.failed", "connection.start_tls.failed"):
+                stats.record_connect_failure()
+        return trace
+
+    def _make_client(self, name: str, config: dict) -> httpx.AsyncClient:
+        stats = self._stats[name]
+        trace = self._make_trace(stats)
+
+        async def on_request(request: httpx.Request):
+            stats.record_request()
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            if response.status_code >= 500:
+                stats.record_error()
+
+        http2 = config["http2"] and _HTTP2_AVAILABLE
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config["timeout"], connect=config["connect_timeout"]),
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive"],
+                keepalive_expiry=config["keepalive_expiry"],
+            ),
+            http2=http2,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def start(self):
+        if self._clients:
+            return
+        for name, default_timeout in ((OPENROUTER, 60.0), (WHISPER, 30.0)):
+            config = _upstream_config(name, default_timeout)
+            self._config[name] = config
+            self._stats[name] = UpstreamStats()
+            self._clients[name] = self._make_client(name, config)
+            logger.info(
+                "[Upstream] %s pool ready (max_connections=%s, keepalive=%s, http2=%s)",
+                name, config['max_connections'], config['max_keepalive'], config['http2'] and _HTTP2_AVAILABLE,
+            )
+
+    async def close(self):
+        for name, client in self._clients.items():
+            await client.aclose()
+            logger.info("[Upstream] %s pool closed", name)
+        self._clients.clear()
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        if name not in self._clients:
+            # Allows use outside of the lifespan (e.g. scripts, TestClient without context)
+            self.start()
+        return self._clients[name]
+
+    def _open_connections(self, name: str) -> Optional[int]:
+        # httpx does not expose the pool publicly; degrade gracefully if internals change.
+        try:
+            return len(self._clients[name]._transport._pool.connections)
+        except (AttributeError, KeyError):
+            return None
+
+    def stats(self) -> dict:
+        result = {}
+        for name, stats in self._stats.items():
+            data = stats.snapshot()
+            data["pool_size"] = self._open_connections(name)
+            data["max_connections"] = self._config[name]["max_connections"]
+            data["http2"] = self._config[name]["http2"] and _HTTP2_AVAILABLE
+            result[name] = data
+        return result
+
+
+upstreams = UpstreamPool()
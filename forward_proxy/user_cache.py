@@ -0,0 +1,145 @@
+"""
+In-process cache of authenticated users.
+
+``get_current_user`` runs on every authenticated request. Without a cache each
+call decodes the JWT and SELECTs the user row, even for cheap reads such as
+``/profile`` and ``/user/limits``. Two bounded LRUs with a short TTL sit in
+front of that:
+  * token -> user id (skips ``jwt.decode``; never outlives the token's ``exp``)
+  * user id -> column snapshot (skips the SELECT)
+
+A cached user is rebuilt and attached to the request's session without a
+query, so handlers can still modify and commit it. Code paths that change a
+user call ``invalidate``, which only clears this process's cache: with
+several workers (``python main.py --workers N``) the others keep serving
+their snapshot until it expires. The TTL therefore defaults to 30s for a
+single worker and 5s for several.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from database import User
+from metrics import cache_lookup
+
+logger = logging.getLogger("forward_proxy")
+
+# The launcher sets WEB_CONCURRENCY to the worker count before the workers import this
+_MULTI_WORKER = os.getenv("WEB_CONCURRENCY", "1") not in ("", "1")
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "5" if _MULTI_WORKER else "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "4096"))
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "1") == "1"
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).mapper.column_attrs]
+
+
+class UserCache:
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl_seconds: float = USER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._tokens: "OrderedDict[str, tuple]" = OrderedDict()
+        self._users: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+        self.invalidations = 0
+
+    def _get(self, lru: OrderedDict, key):
+        entry = lru.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del lru[key]
+            return None
+        lru.move_to_end(key)
+        return value
+
+    def _put(self, lru: OrderedDict, key, value, ttl: float):
+        lru[key] = (value, time.monotonic() + ttl)
+        lru.move_to_end(key)
+        while len(lru) > self.max_entries:
+            lru.popitem(last=False)
+
+    def user_id_for_token(self, token: str) -> Optional[int]:
+        if not USER_CACHE_ENABLED:
+            return None
+        with self._lock:
+            user_id = self._get(self._tokens, token)
+            if user_id is None:
+                self.token_misses += 1
+            else:
+                self.token_hits += 1
+        cache_lookup("user_token", user_id is not None)
+        return user_id
+
+    def remember_token(self, token: str, user_id: int, token_exp: Optional[float]):
+        if not USER_CACHE_ENABLED:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._put(self._tokens, token, user_id, ttl)
+
+    def get_user(self, user_id: int, db: Session) -> Optional[User]:
+        """The cached user attached to ``db`` (no SELECT), or None on a miss."""
+        if not USER_CACHE_ENABLED:
+            return None
+        with self._lock:
+            snapshot = self._get(self._users, user_id)
+            if snapshot is None:
+                self.user_misses += 1
+            else:
+                self.user_hits += 1
+        cache_lookup("user", snapshot is not None)
+        if snapshot is None:
+            return None
+        user = User(**snapshot)
+        # Looks like a freshly loaded row, so changes made by the handler are flushed as UPDATEs
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def remember_user(self, user: User):
+        if not USER_CACHE_ENABLED:
+            return
+        snapshot = {key: getattr(user, key) for key in _USER_COLUMNS}
+        with self._lock:
+            self._put(self._users, user.id, snapshot, self.ttl)
+
+    def invalidate(self, user_id: int):
+        """Drops the user's snapshot; call after committing a change to the row."""
+        with self._lock:
+            if self._users.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            token_lookups = self.token_hits + self.token_misses
+            user_lookups = self.user_hits + self.user_misses
+            return {
+                "enabled": USER_CACHE_ENABLED,
+                "ttl_seconds": self.ttl,
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "token_hits": self.token_hits,
+                "token_misses": self.token_misses,
+                "token_hit_ratio": round(self.token_hits / token_lookups, 4) if token_lookups else 0.0,
+                "user_hits": self.user_hits,
+                "user_misses": self.user_misses,
+                "user_hit_ratio": round(self.user_hits / user_lookups, 4) if user_lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+user_cache = UserCache()
@@ -0,0 +1,179 @@
+"""
+Content-addressed cache for VLM meal analyses.
+
+Retries from the mobile sync queue re-send identical image bytes; instead of
+paying for another VLM round trip we look the result up by a hash of
+everything that goes into the prompt.
+
+Two tiers:
+  * an in-process LRU (fast, per worker)
+  * the ``vlm_cache`` SQLite table (survives restarts, shared by workers)
+Both tiers honour the same TTL.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from database import VlmCacheEntry
+from metrics import cache_lookup
+
+logger = logging.getLogger("forward_proxy")
+
+VLM_CACHE_TTL_SECONDS = int(os.getenv("VLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+VLM_CACHE_MAX_ENTRIES = int(os.getenv("VLM_CACHE_MAX_ENTRIES", "512"))
+VLM_CACHE_ENABLED = os.getenv("VLM_CACHE_ENABLED", "1") == "1"
+
+# Purge expired rows from the persistent tier every N writes
+_PURGE_EVERY = 100
+
+
+def context_digest(
+    model: str,
+    goal_context: str = "",
+    context_text: Optional[str] = None,
+    audio_sha256: Optional[str] = None,
+) -> str:
+    """Hash of every non-image input that shapes the VLM prompt.
+
+    The audio note is keyed by its content hash rather than its transcript so
+    a hit also skips the Whisper call.
+    """
+    h = hashlib.sha256()
+    for part in (
+        model.encode("utf-8"),
+        (goal_context or "").strip().encode("utf-8"),
+        (context_text or "").strip().encode("utf-8"),
+        (audio_sha256 or "").encode("ascii"),
+    ):
+        # Length-prefix every field so concatenations can't collide
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def cache_key(
+    image_sha256: str,
+    model: str,
+    goal_context: str = "",
+    context_text: Optional[str] = None,
+    audio_sha256: Optional[str] = None,
+) -> str:
+    """Hash of the image digest plus the prompt context (see ``context_digest``).
+
+    Digests come from the upload ingestion pass (uploads.store_upload).
+    """
+    h = hashlib.sha256(context_digest(model, goal_context, context_text, audio_sha256).encode("ascii"))
+    h.update(image_sha256.encode("ascii"))
+    return h.hexdigest()
+
+
+class VlmResultCache:
+    def __init__(self, max_entries: int = VLM_CACHE_MAX_ENTRIES, ttl_seconds: int = VLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: dict, expires_at: datetime):
+        with self._lock:
+            self._lru[key] = (value, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str, db: Session) -> Optional[dict]:
+        """Returns ``{"structured_meal": ..., "transcription": ...}`` or None."""
+        if not VLM_CACHE_ENABLED:
+            return None
+
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._lru.move_to_end(key)
+                    self.memory_hits += 1
+                    cache_lookup("vlm", True)
+                    return value
+                del self._lru[key]
+
+        row = db.query(VlmCacheEntry).filter(VlmCacheEntry.key == key).first()
+        if row is not None and row.expires_at and row.expires_at > now:
+            try:
+                value = {
+                    "structured_meal": json.loads(row.structured_meal),
+                    "transcription": row.transcription or "",
+                }
+            except ValueError:
+                logger.warning("[VlmCache] Corrupt entry %s, ignoring", key[:12])
+            else:
+                self._remember(key, value, row.expires_at)
+                with self._lock:
+                    self.db_hits += 1
+                cache_lookup("vlm", True)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        cache_lookup("vlm", False)
+        return None
+
+    def put(self, key: str, model: str, structured_meal: dict, transcription: str, db: Session):
+        if not VLM_CACHE_ENABLED:
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        value = {"structured_meal": structured_meal, "transcription": transcription or ""}
+        self._remember(key, value, expires_at)
+
+        try:
+            row = db.query(VlmCacheEntry).filter(VlmCacheEntry.key == key).first()
+            if row is None:
+                row = VlmCacheEntry(key=key)
+                db.add(row)
+            row.model = model
+            row.structured_meal = json.dumps(structured_meal)
+            row.transcription = transcription
+            row.created_at = now
+            row.expires_at = expires_at
+
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % _PURGE_EVERY == 0
+            if purge:
+                deleted = db.query(VlmCacheEntry).filter(VlmCacheEntry.expires_at <= now).delete()
+                logger.info("[VlmCache] Purged %s expired entries", deleted)
+            db.commit()
+        except Exception as e:
+            # The cache is an optimisation; never fail the request because of it
+            db.rollback()
+            logger.warning("[VlmCache] Failed to persist entry %s: %s", key[:12], e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": VLM_CACHE_ENABLED,
+                "memory_entries": len(self._lru),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+vlm_cache = VlmResultCache()
@@ -144,7 +144,7 @@ export default function MealDetailScreen() {
         {/* Parallax Header Image */}
         <Animated.View style={[styles.header, headerAnimatedStyle]}>
           {meal.image ? (
-            <MealImage uri={meal.image} style={styles.image} resizeMode="cover" />
+            <MealImage uri={meal.image} style={styles.image} resizeMode="cover" size="medium" />
           ) : (
             <View style={[styles.placeholderImage, { backgroundColor: isDark ? "#333" : "#f5f5f5" }]}>
               <Ionicons name="restaurant" size={64} color={isDark ? "#555" : "#ccc"} />
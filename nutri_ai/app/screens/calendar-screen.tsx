@@ -228,7 +228,7 @@ const MealCard: React.FC<MealCardProps> = ({
         {/* Meal Image */}
         {meal.image && (
           <View style={styles.mealImageContainer}>
-            <MealImage uri={meal.image} style={styles.mealImage} />
+            <MealImage uri={meal.image} style={styles.mealImage} size="thumb" />
           </View>
         )}
 
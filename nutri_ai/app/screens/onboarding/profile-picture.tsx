@@ -1,5 +1,5 @@
 import { Ionicons } from "@expo/vector-icons";
-import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../../../services/auth";
 import CryptoJS from "crypto-js";
 import * as ImagePicker from "expo-image-picker";
 import { useLocalSearchParams, useRouter } from "expo-router";
@@ -191,7 +191,7 @@ export default function ProfilePicture() {
       }
 
       console.log("[ProfilePicture] Signup successful!");
-      await AsyncStorage.setItem("auth_token", data.access_token);
+      await AuthService.saveTokens(data);
 
       // Upload profile image if selected and save it locally
       if (profileImage) {
@@ -11,7 +11,7 @@ import {
   SafeAreaView,
 } from "react-native";
 import { useSafeAreaInsets } from "react-native-safe-area-context";
-import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import { Colors, Spacing } from "../constants/theme";
 import { API_BASE_URL } from "../constants/values";
 
@@ -79,7 +79,7 @@ export default function SuggestionsScreen() {
           last_meal: lastMeal,
         };
 
-        const token = await AsyncStorage.getItem("auth_token");
+        const token = await AuthService.getAccessToken();
 
         const response = await fetch(`${API_BASE_URL}/api/suggest-meals`, {
           method: "POST",
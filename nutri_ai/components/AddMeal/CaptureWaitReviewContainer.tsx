@@ -38,7 +38,7 @@ import { useSafeAreaInsets } from 'react-native-safe-area-context';
 import * as ImagePicker from 'expo-image-picker';
 import DateTimePicker from '@react-native-community/datetimepicker';
 
-import AsyncStorage from '@react-native-async-storage/async-storage';
+import { AuthService } from "../../services/auth";
 import { Colors, Spacing, BorderRadius, Shadows, Typography } from '../../constants/theme';
 import { useMeals } from '../../context/MealContext';
 import { useNetwork } from '../../context/NetworkContext';
@@ -331,7 +331,7 @@ const CaptureWaitReviewContainer: React.FC<CaptureWaitReviewContainerProps> = ({
     }
 
     try {
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       if (!token) throw new Error("No auth token");
 
       const formData = new FormData();
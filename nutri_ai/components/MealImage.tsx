@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { Image, View, StyleSheet, StyleProp, ImageStyle } from "react-native";
-import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import { Ionicons } from "@expo/vector-icons";
 import { Colors } from "../constants/theme";
 import { useColorScheme } from "@/hooks/use-color-scheme";
@@ -11,13 +11,21 @@ interface MealImageProps {
   style?: StyleProp<ImageStyle>;
   resizeMode?: "cover" | "contain" | "stretch" | "repeat" | "center";
   showPlaceholder?: boolean;
+  /** Server-side derivative to request for remote images (original if omitted). */
+  size?: "thumb" | "medium";
 }
 
+const withSize = (uri: string, size?: "thumb" | "medium") => {
+  if (!size || !uri.includes("/static/")) return uri;
+  return `${uri}${uri.includes("?") ? "&" : "?"}size=${size}`;
+};
+
 export const MealImage: React.FC<MealImageProps> = ({
   uri,
   style,
   resizeMode = "cover",
   showPlaceholder = true,
+  size,
 }) => {
   const { user } = useUser();
   const [token, setToken] = useState<string | null>(null);
@@ -28,7 +36,7 @@ export const MealImage: React.FC<MealImageProps> = ({
 
   useEffect(() => {
     let isMounted = true;
-    AsyncStorage.getItem("auth_token")
+    AuthService.getAccessToken()
       .then((t) => {
         if (!isMounted) return;
         setToken(t);
@@ -100,7 +108,7 @@ export const MealImage: React.FC<MealImageProps> = ({
   const source = isLocal
     ? { uri }
     : {
-        uri,
+        uri: withSize(uri, size),
         headers: token ? { Authorization: `Bearer ${token}` } : undefined,
       };
 
@@ -1,6 +1,6 @@
 import { Ionicons } from "@expo/vector-icons";
 import { useRouter } from "expo-router";
-import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import React, { useState } from "react";
 import {
   LayoutAnimation,
@@ -251,7 +251,7 @@ const DayItem: React.FC<DayItemProps> = ({
 const checkRateLimit = async (isServerReachable: boolean) => {
     if (!isServerReachable) return true;
     try {
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       if (!token) return true;
 
       const response = await fetch(`${API_BASE_URL}/user/limits`, {
@@ -419,7 +419,7 @@ const MealCard: React.FC<MealCardProps> = ({
         {/* Meal Image */}
         {meal.image && (
           <View style={styles.mealImageContainer}>
-            <MealImage uri={meal.image} style={styles.mealImage} />
+            <MealImage uri={meal.image} style={styles.mealImage} size="thumb" />
           </View>
         )}
 
@@ -1,5 +1,5 @@
 import { Ionicons } from "@expo/vector-icons";
-import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import { useRouter } from "expo-router";
 import React, { useState } from "react";
 import {
@@ -71,7 +71,7 @@ const IOSStyleLoginScreen = () => {
 
       // Store token
       console.log("[Login] Storing auth token...");
-      await AsyncStorage.setItem("auth_token", data.access_token);
+      await AuthService.saveTokens(data);
       console.log("[Login] Auth token stored successfully");
 
       // Fetch user profile from server
@@ -1,8 +1,9 @@
 import React, { createContext, useContext, useEffect, useRef, useState } from "react";
 import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import NetInfo from "@react-native-community/netinfo";
 import { StorageService } from "../services/storage";
-import { QueueService } from "../services/queue";
+import { QueueItem, QueueService } from "../services/queue";
 import { MealEntry, parseMealEntry } from "../types/mealEntry";
 import { API_BASE_URL } from "../constants/values";
 import { useUser } from "./UserContext";
@@ -20,6 +21,12 @@ interface MealContextType {
 
 const MealContext = createContext<MealContextType | undefined>(undefined);
 
+const SYNC_PAGE_SIZE = 500;
+// Server caps POST /meals/batch at MEALS_BATCH_MAX (500)
+const MEALS_BATCH_SIZE = 200;
+// Below the server's signed media URL lifetime (MEDIA_URL_TTL_SECONDS, 6h)
+const FULL_SYNC_INTERVAL_MS = 4 * 60 * 60 * 1000;
+
 export function MealProvider({ children }: { children: React.ReactNode }) {
   const { user } = useUser();
   const [meals, setMeals] = useState<MealEntry[]>([]);
@@ -56,17 +63,83 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
       if (queue.length === 0) return;
 
       console.log(`[SyncQueue] Processing queue, length: ${queue.length}`);
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       if (!token) return;
 
+      const markFailed = async (item: QueueItem, e: unknown) => {
+        console.error(`[SyncQueue] Failed to process item ${item.id}`, e);
+        item.retryCount = (item.retryCount || 0) + 1;
+        await QueueService.updateItem(item);
+      };
+
+      // Creates/updates go out together through POST /meals/batch (one transaction, one
+      // quota charge); a delete flushes what's pending first so queue order is kept.
+      let pending: { item: QueueItem; mealData: any }[] = [];
+      // Ids settled (removed or marked failed) during the current flush
+      const settled = new Set<string>();
+      const postBatch = async (batch: { item: QueueItem; mealData: any }[]): Promise<void> => {
+        console.log(`[SyncQueue] Posting ${batch.length} meals in one batch...`);
+        const response = await fetch(`${API_BASE_URL}/meals/batch`, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            "Authorization": `Bearer ${token}`,
+          },
+          body: JSON.stringify({ meals: batch.map((entry) => entry.mealData) }),
+        });
+        // A 4xx other than auth/quota means some item is unacceptable (e.g. a 422 from
+        // validation): bisect so only the bad item is marked failed, not the whole queue.
+        const rejected = response.status >= 400 && response.status < 500
+          && response.status !== 401 && response.status !== 429;
+        if (rejected && batch.length > 1) {
+          const middle = Math.ceil(batch.length / 2);
+          await postBatch(batch.slice(0, middle));
+          await postBatch(batch.slice(middle));
+          return;
+        }
+        if (!response.ok) {
+          const error = new Error(`Meal batch sync failed: ${response.status}`);
+          for (const entry of batch) {
+            settled.add(entry.item.id);
+            await markFailed(entry.item, error);
+          }
+          return;
+        }
+        const { results } = await response.json();
+        for (let i = 0; i < batch.length; i++) {
+          settled.add(batch[i].item.id);
+          if (results[i]?.status === "conflict") {
+            await markFailed(batch[i].item, new Error("Meal ID already exists"));
+          } else {
+            await QueueService.removeFromQueue(batch[i].item.id);
+          }
+        }
+      };
+      const flush = async () => {
+        if (pending.length === 0) return;
+        const batch = pending;
+        pending = [];
+        settled.clear();
+        try {
+          await postBatch(batch);
+        } catch (e) {
+          // Network error: everything left in the batch is retried on the next run
+          for (const entry of batch) {
+            if (!settled.has(entry.item.id)) await markFailed(entry.item, e);
+          }
+        }
+      };
+
       for (const item of queue) {
         try {
           console.log(`[SyncQueue] Processing item ${item.id} (${item.type})`);
-          if (item.type === "CREATE_MEAL") {
-            await syncMeal(item.payload, token);
-          } else if (item.type === "UPDATE_MEAL") {
-            await syncMeal(item.payload, token);
-          } else if (item.type === "DELETE_MEAL") {
+          if (item.type === "CREATE_MEAL" || item.type === "UPDATE_MEAL") {
+            pending.push({ item, mealData: await uploadMealMedia(item.payload, token) });
+            if (pending.length >= MEALS_BATCH_SIZE) await flush();
+            continue;
+          }
+          await flush();
+          if (item.type === "DELETE_MEAL") {
             await fetch(`${API_BASE_URL}/meals/${item.payload}`, {
               method: "DELETE",
               headers: { Authorization: `Bearer ${token}` },
@@ -76,17 +149,17 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
           await QueueService.removeFromQueue(item.id);
           console.log(`[SyncQueue] Item ${item.id} processed successfully`);
         } catch (e) {
-          console.error(`[SyncQueue] Failed to process item ${item.id}`, e);
-          item.retryCount = (item.retryCount || 0) + 1;
-          await QueueService.updateItem(item);
+          await markFailed(item, e);
         }
       }
+      await flush();
     } finally {
       isProcessingQueueRef.current = false;
     }
   };
 
-  const syncMeal = async (meal: MealEntry, token: string) => {
+  // Uploads local media files and returns the meal as POST /meals/batch expects it
+  const uploadMealMedia = async (meal: MealEntry, token: string) => {
       let serverImagePath = undefined;
       let serverAudioPath = undefined;
 
@@ -119,7 +192,7 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
       } else if (meal.image && !meal.image.startsWith("file://")) {
           // Already a server path or remote URL
           if (meal.image.includes("/static/")) {
-              serverImagePath = meal.image.split("/static/")[1];
+              serverImagePath = meal.image.split("/static/")[1].split("?")[0];
           } else {
               serverImagePath = meal.image;
           }
@@ -153,7 +226,7 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
         }
       } else if (meal.audio && !meal.audio.startsWith("file://")) {
           if (meal.audio.includes("/static/")) {
-              serverAudioPath = meal.audio.split("/static/")[1];
+              serverAudioPath = meal.audio.split("/static/")[1].split("?")[0];
           } else {
               serverAudioPath = meal.audio;
           }
@@ -163,19 +236,7 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
       if (serverImagePath) mealData.image = serverImagePath;
       if (serverAudioPath) mealData.audio = serverAudioPath;
 
-      console.log("[SyncQueue] Posting meal data...");
-      const syncResponse = await fetch(`${API_BASE_URL}/meals`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          "Authorization": `Bearer ${token}`,
-        },
-        body: JSON.stringify(mealData),
-      });
-      
-      if (!syncResponse.ok) {
-        throw new Error(`Meal sync failed: ${syncResponse.status}`);
-      }
+      return mealData;
   };
 
   const refreshMeals = async () => {
@@ -188,7 +249,7 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
         return;
       }
 
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       const currentUserId = await AsyncStorage.getItem("user_id");
 
       if (!token || !currentUserId) {
@@ -209,26 +270,56 @@ export function MealProvider({ children }: { children: React.ReactNode }) {
         setMeals(loadedMeals);
       }
 
-      const response = await fetch(`${API_BASE_URL}/meals`, {
-        headers: { "Authorization": `Bearer ${token}` },
-      });
-      
-      if (response.ok) {
-        const serverMealsData = await response.json();
-        const serverMeals = serverMealsData.map((m: any) => {
-          const imageUrl = m.image ? `${API_BASE_URL}/static/${m.image}` : undefined;
-          const audioUrl = m.audio ? `${API_BASE_URL}/static/${m.audio}` : undefined;
-          return parseMealEntry({
-            ...m,
-            image: imageUrl,
-            audio: audioUrl,
-          });
+      // GET /sync returns only meals changed or deleted since our token. Signed media URLs
+      // expire, so a full resync (no token) still runs once they get old.
+      const tokenKey = `meals_sync_token:${currentUserId}`;
+      const syncedAtKey = `meals_synced_at:${currentUserId}`;
+      const syncedAt = Number(await AsyncStorage.getItem(syncedAtKey)) || 0;
+      // Local meals were just cleared on a user switch, so a delta has nothing to apply to
+      let syncToken = currentUserId === lastSyncedUserId && Date.now() - syncedAt < FULL_SYNC_INTERVAL_MS
+        ? await AsyncStorage.getItem(tokenKey)
+        : null;
+      const fullSync = !syncToken;
+
+      const byId = new Map<string, MealEntry>();
+      if (!fullSync) {
+        for (const meal of await StorageService.loadMeals()) byId.set(meal.id, meal);
+      }
+
+      let response: Response;
+      let body: any;
+      do {
+        const query = `limit=${SYNC_PAGE_SIZE}${syncToken ? `&since=${encodeURIComponent(syncToken)}` : ""}`;
+        response = await fetch(`${API_BASE_URL}/sync?${query}`, {
+          headers: { "Authorization": `Bearer ${token}` },
         });
+        if (!response.ok) break;
+        body = await response.json();
+        if (body.reset) byId.clear();
+        for (const id of body.deleted) byId.delete(id);
+        for (const m of body.meals) {
+          // Prefer the signed URLs: they skip token auth and the ownership query server-side
+          const imageUrl = m.imageUrl
+            ? `${API_BASE_URL}${m.imageUrl}`
+            : m.image ? `${API_BASE_URL}/static/${m.image}` : undefined;
+          const audioUrl = m.audioUrl
+            ? `${API_BASE_URL}${m.audioUrl}`
+            : m.audio ? `${API_BASE_URL}/static/${m.audio}` : undefined;
+          byId.set(m.id, parseMealEntry({ ...m, image: imageUrl, audio: audioUrl }));
+        }
+        syncToken = body.token;
+      } while (body.hasMore);
+
+      if (response.ok) {
+        const serverMeals = Array.from(byId.values()).sort((a, b) => b.timestamp - a.timestamp);
         setMeals(serverMeals);
         await StorageService.saveMeals(serverMeals);
+        await AsyncStorage.setItem(tokenKey, syncToken as string);
+        if (fullSync) await AsyncStorage.setItem(syncedAtKey, String(Date.now()));
       } else if (response.status === 401) {
         setMeals([]);
         await StorageService.saveMeals([]);
+        await AsyncStorage.multiRemove([tokenKey, syncedAtKey]);
       }
     } catch (error) {
       console.error("[MealContext] Failed to load meals", error);
@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useState, useEffect, useMemo } from "react";
 import AsyncStorage from "@react-native-async-storage/async-storage";
+import { AuthService } from "../services/auth";
 import { StorageService } from "../services/storage";
 import { User, parseUser } from "../types/user";
 import { calculateGoals, NutritionGoals } from "../lib/utils/goals";
@@ -32,7 +33,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
     setIsLoading(true);
     try {
       // Check if user has a token (is logged in)
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       
       // Only load from storage if we have a token (user is logged in)
       if (token) {
@@ -60,7 +61,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
 
   const fetchUser = async () => {
     try {
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       if (!token) {
         console.log("[UserContext] No auth token found, skipping fetchUser");
         return;
@@ -119,7 +120,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
       
       // Upload to server
       try {
-        const token = await AsyncStorage.getItem("auth_token");
+        const token = await AuthService.getAccessToken();
         if (token) {
           console.log("[UserContext] Uploading profile image to server...");
           const formData = new FormData();
@@ -164,7 +165,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
 
     // Sync with server
     try {
-      const token = await AsyncStorage.getItem("auth_token");
+      const token = await AuthService.getAccessToken();
       if (token) {
         console.log("[UserContext] Syncing profile with server...");
         const profileData = {
@@ -218,7 +219,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
 
   const logout = async () => {
     console.log("[UserContext] Logging out...");
-    await AsyncStorage.removeItem("auth_token");
+    await AuthService.clearTokens();
     await AsyncStorage.removeItem("user_id");
     await StorageService.clearAll();
     setUserState(null);
@@ -0,0 +1,94 @@
+import AsyncStorage from "@react-native-async-storage/async-storage";
+import { API_BASE_URL } from "../constants/values";
+
+const STORAGE_KEYS = {
+  ACCESS_TOKEN: "auth_token",
+  REFRESH_TOKEN: "refresh_token",
+  EXPIRES_AT: "auth_token_expires_at",
+};
+
+// Refresh a little before the server-side expiry
+const REFRESH_MARGIN_MS = 60 * 1000;
+
+export interface TokenResponse {
+  access_token: string;
+  refresh_token?: string | null;
+  expires_in?: number | null;
+}
+
+let refreshInFlight: Promise<string | null> | null = null;
+
+async function refreshTokens(refreshToken: string): Promise<string | null> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!response.ok) {
+      console.warn(`[AuthService] Token refresh failed with status ${response.status}`);
+      if (response.status === 401) {
+        // Rotated elsewhere or revoked: only a new login helps now
+        await AsyncStorage.removeItem(STORAGE_KEYS.REFRESH_TOKEN);
+      }
+      return null;
+    }
+    const data: TokenResponse = await response.json();
+    await AuthService.saveTokens(data);
+    return data.access_token;
+  } catch (e) {
+    console.warn("[AuthService] Token refresh error", e);
+    return null;
+  }
+}
+
+export const AuthService = {
+  async saveTokens(data: TokenResponse): Promise<void> {
+    await AsyncStorage.setItem(STORAGE_KEYS.ACCESS_TOKEN, data.access_token);
+    if (data.refresh_token) {
+      await AsyncStorage.setItem(STORAGE_KEYS.REFRESH_TOKEN, data.refresh_token);
+    }
+    if (data.expires_in) {
+      await AsyncStorage.setItem(
+        STORAGE_KEYS.EXPIRES_AT,
+        String(Date.now() + data.expires_in * 1000),
+      );
+    } else {
+      await AsyncStorage.removeItem(STORAGE_KEYS.EXPIRES_AT);
+    }
+  },
+
+  /**
+   * Returns a usable access token, transparently refreshing it when it is
+   * about to expire. Concurrent callers share a single refresh request.
+   */
+  async getAccessToken(): Promise<string | null> {
+    const [token, expiresAt, refreshToken] = await Promise.all([
+      AsyncStorage.getItem(STORAGE_KEYS.ACCESS_TOKEN),
+      AsyncStorage.getItem(STORAGE_KEYS.EXPIRES_AT),
+      AsyncStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN),
+    ]);
+    const expiring = !token || (expiresAt !== null && Number(expiresAt) - REFRESH_MARGIN_MS < Date.now());
+    if (!expiring || !refreshToken) return token;
+
+    if (!refreshInFlight) {
+      refreshInFlight = refreshTokens(refreshToken).finally(() => {
+        refreshInFlight = null;
+      });
+    }
+    return (await refreshInFlight) ?? token;
+  },
+
+  async clearTokens(): Promise<void> {
+    const refreshToken = await AsyncStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN);
+    if (refreshToken) {
+      // Best effort: revoke server-side so the token can't be replayed
+      fetch(`${API_BASE_URL}/token/revoke`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch((e) => console.warn("[AuthService] Token revoke failed", e));
+    }
+    await AsyncStorage.multiRemove(Object.values(STORAGE_KEYS));
+  },
+};